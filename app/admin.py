@@ -14,7 +14,9 @@ from .models import (
     Quotation,
     Store, 
     SalesAssignment,
-    Rack
+    Rack,
+    DashboardCounter,
+    SKUEvent
 )
 
 admin.site.register(PurchaseOrder)
@@ -31,4 +33,35 @@ admin.site.register(Payment)
 admin.site.register(Quotation)
 admin.site.register(Store)
 admin.site.register(SalesAssignment)
-admin.site.register(Rack)
\ No newline at end of file
+admin.site.register(Rack)
+
+
+class ReadOnlyAdmin(admin.ModelAdmin):
+    """Hanya untuk dilihat: data dikelola oleh sistem (signal/timeline), bukan diedit manual."""
+
+    def get_readonly_fields(self, request, obj=None):
+        return [field.name for field in self.model._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(DashboardCounter)
+class DashboardCounterAdmin(ReadOnlyAdmin):
+    # Diperbarui oleh signal; perbaiki selisih dengan `manage.py rebuild_dashboard_counters`
+    list_display = ('key', 'value', 'updated_at')
+    search_fields = ('key',)
+
+
+@admin.register(SKUEvent)
+class SKUEventAdmin(ReadOnlyAdmin):
+    # Log history SKU hanya ditambah (append-only)
+    list_display = ('sku', 'event_type', 'actor_name', 'occurred_at')
+    list_filter = ('event_type',)
+    list_select_related = ('sku', 'actor')
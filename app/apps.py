@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class InventoryAppConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'app'
+
+    def ready(self):
+        # Daftarkan signal handler (invalidasi cache role, dll.)
+        from . import signals  # noqa: F401
@@ -0,0 +1,117 @@
+"""
+Counter ringkasan dashboard (model DashboardCounter).
+
+Setiap model yang dihitung punya fungsi `*_counter_keys(state)` yang
+mengembalikan himpunan key counter tempat sebuah baris "terhitung".
+Saat baris disimpan/dihapus, selisih antara key lama dan key baru
+diterapkan sebagai increment F() (lihat signals.py), sehingga dashboard
+cukup membaca beberapa baris DashboardCounter.
+
+Hanya key yang dibaca dashboard (DASHBOARD_KEYS) yang dipelihara, dan state
+lama hanya dibaca jika save() bisa mengubah field status. State lama dibaca
+tanpa lock: dua save bersamaan atas baris yang sama bisa menerapkan selisih
+yang sama dua kali. `manage.py rebuild_dashboard_counters --check` (jadwalkan
+berkala) mendeteksi selisih itu, tanpa --check memperbaikinya.
+"""
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+
+from .models import DashboardCounter, PurchaseOrder, SKU
+
+
+# Counter yang dibaca views.dashboard; status lain tidak dihitung
+DASHBOARD_KEYS = ('sku.status.Ready', 'sku.status.Shop', 'po.status.Pending_Approval')
+
+
+def _status_keys(prefix, state):
+    if state is None:
+        return set()
+    key = f"{prefix}.status.{state['status']}"
+    return {key} if key in DASHBOARD_KEYS else set()
+
+
+def sku_counter_keys(state):
+    return _status_keys('sku', state)
+
+
+def po_counter_keys(state):
+    return _status_keys('po', state)
+
+
+# model -> (field yang mempengaruhi counter, fungsi key)
+COUNTED_MODELS = {
+    SKU: (('status',), sku_counter_keys),
+    PurchaseOrder: (('status',), po_counter_keys),
+}
+
+
+def affects_counters(model, update_fields):
+    """False jika save(update_fields=...) tidak menyentuh field counter."""
+    fields, _ = COUNTED_MODELS[model]
+    return update_fields is None or bool(set(fields) & set(update_fields))
+
+
+def get_state(instance):
+    fields, _ = COUNTED_MODELS[type(instance)]
+    return {field: getattr(instance, field) for field in fields}
+
+
+def get_db_state(model, pk):
+    """State baris yang tersimpan di DB (None jika belum ada)."""
+    if pk is None:
+        return None
+    fields, _ = COUNTED_MODELS[model]
+    return model.objects.filter(pk=pk).values(*fields).first()
+
+
+def apply_transition(model, old_state, new_state):
+    """Terapkan perubahan counter dari old_state ke new_state (None = tidak ada baris)."""
+    _, keys_for = COUNTED_MODELS[model]
+    old_keys, new_keys = keys_for(old_state), keys_for(new_state)
+    deltas = {key: -1 for key in old_keys - new_keys}
+    deltas.update({key: 1 for key in new_keys - old_keys})
+    apply_deltas(deltas)
+
+
+def apply_deltas(deltas):
+    """Increment atomik per key; baris counter dibuat jika belum ada."""
+    for key, delta in deltas.items():
+        if not delta:
+            continue
+        updated = DashboardCounter.objects.filter(key=key).update(value=F('value') + delta)
+        if not updated:
+            try:
+                with transaction.atomic():
+                    DashboardCounter.objects.create(key=key, value=delta)
+            except IntegrityError:
+                # Dibuat oleh request lain di antara update dan create
+                DashboardCounter.objects.filter(key=key).update(value=F('value') + delta)
+
+
+def get_counts(*keys):
+    """Baca beberapa counter dalam satu query. Key yang belum ada bernilai 0."""
+    values = dict(DashboardCounter.objects.filter(key__in=keys).values_list('key', 'value'))
+    return {key: values.get(key, 0) for key in keys}
+
+
+def compute_counts():
+    """Hitung ulang semua counter dari tabel sumber."""
+    totals = Counter()
+    for model, (fields, keys_for) in COUNTED_MODELS.items():
+        for row in model.objects.values(*fields).annotate(row_count=Count('pk')).order_by():
+            for key in keys_for(row):
+                totals[key] += row['row_count']
+    return totals
+
+
+@transaction.atomic
+def rebuild_counters():
+    """Ganti seluruh isi DashboardCounter dengan hasil compute_counts()."""
+    totals = compute_counts()
+    DashboardCounter.objects.all().delete()
+    DashboardCounter.objects.bulk_create(
+        DashboardCounter(key=key, value=value) for key, value in totals.items()
+    )
+    return totals
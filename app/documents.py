@@ -0,0 +1,776 @@
+"""
+Layanan render dokumen PDF (label pengiriman, invoice A4, quotation A4).
+
+Alur:
+1. `prepare()` mengambil snapshot data yang dipakai dokumen (`collect_*`,
+   dict nilai biasa) di request thread, lalu menghitung hash konten dari
+   snapshot + versi layout + stempel file logo.
+2. File cache: MEDIA_ROOT/documents/<tipe>/<object_id>/<hash>.pdf. Selama
+   data tidak berubah, hash sama dan file langsung disajikan tanpa render
+   ulang. Versi lama objek yang sama dihapus saat versi baru selesai, tapi
+   hanya yang lebih tua dari settings.DOCUMENT_CACHE_GRACE detik: request lain
+   mungkin baru saja memilih file itu dan akan membukanya.
+3. Jika belum ada, render dikirim ke thread pool lokal (antrian job per
+   proses, job yang sama tidak dirender dua kali). Renderer hanya membaca
+   snapshot, tidak menyentuh database. `get_pdf()` menunggu maksimal
+   settings.DOCUMENT_RENDER_WAIT detik (default 1, render kecil selesai di
+   request yang sama); lewat dari itu view menjawab 202 dan browser mencoba
+   lagi, jadi worker request tidak tertahan render besar.
+
+settings.DOCUMENT_RENDER_WORKERS = 0 merender langsung di request thread
+(dipakai di test). Layout tiap dokumen ditulis deklaratif (`*_LAYOUT`, lihat
+pdf_layout.py) dan dikompilasi sekali per proses (`get_plan()`). Naikkan
+`version` di DOCUMENT_TYPES setiap kali layout sebuah dokumen diubah agar
+cache lama tidak dipakai.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from types import SimpleNamespace
+from typing import Callable, NamedTuple, Optional
+
+from django.conf import settings
+from django.contrib.staticfiles.finders import find as find_static
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import cm
+from reportlab.lib.utils import ImageReader
+from reportlab.platypus import TableStyle
+
+from .pdf_layout import (
+    At, Block, Clamp, Columns, Grid, IfLogo, Layout, Lines, Logo, Para, Row, Rule, Space, Text,
+    compile_layout,
+)
+
+CACHE_DIR = 'documents'
+
+styles = getSampleStyleSheet()
+styleN = styles['Normal']
+styleN.fontName = 'Helvetica'
+styleN.fontSize = 9
+styleN.leading = 11
+
+# Style tabel dibuat sekali per proses dan dipakai ulang oleh semua dokumen
+INVOICE_ITEM_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#004d99')), # Darker Blue
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('ALIGN', (2, 1), (2, -1), 'CENTER'),
+    ('ALIGN', (3, 1), (4, -1), 'RIGHT'),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#999999')),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+])
+
+INVOICE_SUMMARY_STYLE = TableStyle([
+    ('ALIGN', (0, 0), (0, -1), 'RIGHT'), 
+    ('ALIGN', (1, 0), (1, -1), 'RIGHT'), 
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+    ('FONTNAME', (0, 2), (-1, 2), 'Helvetica-Bold'), # Total Tagihan Bold
+    ('FONTNAME', (0, 4), (-1, 4), 'Helvetica-Bold'), # Sisa Tagihan Bold
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('TEXTCOLOR', (1, 2), (1, 2), colors.darkgreen),
+    ('TEXTCOLOR', (1, 4), (1, 4), colors.red),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#CCCCCC')),
+    ('BACKGROUND', (0, 2), (-1, 2), colors.HexColor('#E6FFE6')), # Total Tagihan Highlight
+    ('BACKGROUND', (0, 4), (-1, 4), colors.HexColor('#FFF2F2')), # Sisa Tagihan Highlight
+    ('RIGHTPADDING', (0, 0), (0, -1), 5), 
+])
+
+QUOTATION_ITEM_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#004d99')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('ALIGN', (2, 1), (2, -1), 'CENTER'),
+    ('ALIGN', (3, 1), (4, -1), 'RIGHT'),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'), 
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
+    ('TOPPADDING', (0, 1), (-1, -1), 6),
+    ('BOTTOMPADDING', (0, 1), (-1, -1), 6),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#CCCCCC')),
+    ('FONTSIZE', (0, 0), (-1, -1), 9),
+])
+
+QUOTATION_SUMMARY_STYLE = TableStyle([
+    ('ALIGN', (0, 0), (-1, -1), 'RIGHT'),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('FONTNAME', (0, 0), (-1, -2), 'Helvetica'),
+    ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -2), 10),
+    ('FONTSIZE', (0, -1), (-1, -1), 11),
+    ('TEXTCOLOR', (1, -1), (1, -1), colors.HexColor('#B8860B')), 
+    ('TOPPADDING', (0, -1), (-1, -1), 8),
+    ('BOTTOMPADDING', (0, -1), (-1, -1), 8),
+    ('LINEABOVE', (0, -1), (-1, -1), 1.5, colors.HexColor('#004d99')),
+    ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#F0F8FF')),
+])
+
+
+def intcomma(value):
+    """Format an integer with commas."""
+    if isinstance(value, (float, int)):
+        return f"{int(value):,}".replace(",", ".")
+    return str(value)
+
+
+class DocumentType(NamedTuple):
+    collect: Callable   # objek -> dict snapshot
+    render: Callable    # (file, SimpleNamespace snapshot) -> None
+    filename: Callable  # snapshot -> nama file download
+    version: int = 1
+    as_attachment: bool = True
+
+
+class Document(NamedTuple):
+    doc_type: str
+    object_id: int
+    data: dict
+    digest: str
+
+    @property
+    def spec(self):
+        return DOCUMENT_TYPES[self.doc_type]
+
+    @property
+    def directory(self):
+        return os.path.join(settings.MEDIA_ROOT, CACHE_DIR, self.doc_type, str(self.object_id))
+
+    @property
+    def path(self):
+        return os.path.join(self.directory, f"{self.digest}.pdf")
+
+    @property
+    def filename(self):
+        return self.spec.filename(self.data)
+
+    @property
+    def as_attachment(self):
+        return self.spec.as_attachment
+
+
+# --- Snapshot data ---
+def collect_order_label(order):
+    sku = order.sku
+    return {
+        'id': order.id,
+        'customer_name': order.customer_name,
+        'customer_phone': order.customer_phone,
+        'customer_address': order.customer_address,
+        'created_at': order.created_at,
+        'shipping_type': order.shipping_type,
+        'status_display': order.get_status_display(),
+        'sku_id': sku.sku_id if sku else None,
+        'sku_name': sku.name if sku else None,
+        'price': order.price,
+        'sales_username': order.sales_person.username,
+    }
+
+
+def collect_order_labels(orders):
+    return {'orders': [collect_order_label(order) for order in orders]}
+
+
+def collect_invoice(order):
+    return dict(
+        collect_order_label(order),
+        total_paid=order.get_total_paid(),
+        remaining_balance=order.get_remaining_balance(),
+        sales_full_name=order.sales_person.get_full_name(),
+    )
+
+
+def collect_quotation(quotation):
+    sku = quotation.sku
+    return {
+        'id': quotation.id,
+        'quotation_number': quotation.quotation_number,
+        'date': quotation.date,
+        'valid_until': quotation.valid_until,
+        'customer_name': quotation.customer_name,
+        'customer_phone': quotation.customer_phone,
+        'customer_address': quotation.customer_address,
+        'sku_id': sku.sku_id,
+        'sku_name': sku.name,
+        'sku_status_display': sku.get_status_display(),
+        'quantity': quotation.quantity,
+        'price': quotation.price,
+        'extra_discount': quotation.extra_discount,
+        'subtotal': quotation.get_subtotal,
+        'total_quote': quotation.get_total_quote,
+    }
+
+
+def prepare(doc_type, obj, object_id=None):
+    """
+    Snapshot + hash konten dokumen `doc_type` untuk `obj` (belum dirender).
+    `object_id` menentukan folder cache (default obj.pk; untuk dokumen batch
+    dipakai id user, sehingga batch lama user tersebut diganti yang baru).
+    """
+    spec = DOCUMENT_TYPES[doc_type]
+    data = spec.collect(obj)
+    payload = json.dumps([doc_type, spec.version, get_resources().logo_stamp, data], sort_keys=True, default=str)
+    object_id = obj.pk if object_id is None else object_id
+    return Document(doc_type, object_id, data, hashlib.sha256(payload.encode()).hexdigest()[:20])
+
+
+# --- Cache file & pool render ---
+_pool_lock = threading.Lock()
+_pool = None
+_jobs = {}
+
+
+def _workers():
+    return getattr(settings, 'DOCUMENT_RENDER_WORKERS', 2)
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=_workers(), thread_name_prefix='document-render')
+    return _pool
+
+
+def _cache_grace():
+    return getattr(settings, 'DOCUMENT_CACHE_GRACE', 300)
+
+
+def _remove_stale(document):
+    """Hapus versi lama objek ini yang umurnya lebih dari DOCUMENT_CACHE_GRACE detik."""
+    cutoff = time.time() - _cache_grace()
+    current = os.path.basename(document.path)
+    for entry in os.scandir(document.directory):
+        if not entry.name.endswith('.pdf') or entry.name == current:
+            continue
+        try:
+            if entry.stat().st_mtime < cutoff:
+                os.unlink(entry.path)
+        except FileNotFoundError:
+            pass
+
+
+def _render_to_cache(document):
+    """Render ke file sementara lalu rename (atomik), hapus versi lama objek ini."""
+    if os.path.exists(document.path):
+        return document.path
+    os.makedirs(document.directory, exist_ok=True)
+    handle, temp_path = tempfile.mkstemp(dir=document.directory, suffix='.tmp')
+    try:
+        with os.fdopen(handle, 'wb') as target:
+            document.spec.render(target, SimpleNamespace(**document.data))
+        os.replace(temp_path, document.path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    _remove_stale(document)
+    return document.path
+
+
+def cached_path(document):
+    return document.path if os.path.exists(document.path) else None
+
+
+def submit(document):
+    """Masukkan dokumen ke antrian render (sekali per file). Return Future -> path."""
+    with _pool_lock:
+        future = _jobs.get(document.path)
+        if future is not None:
+            return future
+        if _workers() <= 0:
+            future = Future()
+            try:
+                future.set_result(_render_to_cache(document))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        future = _get_pool().submit(_render_to_cache, document)
+        _jobs[document.path] = future
+    future.add_done_callback(lambda done: _jobs.pop(document.path, None))
+    return future
+
+
+def get_pdf(document, wait=None):
+    """
+    Path PDF di cache; render dulu jika belum ada. Return None jika render
+    belum selesai dalam `wait` detik (default settings.DOCUMENT_RENDER_WAIT).
+    """
+    path = cached_path(document)
+    if path:
+        return path
+    if wait is None:
+        wait = getattr(settings, 'DOCUMENT_RENDER_WAIT', 1)
+    try:
+        return submit(document).result(timeout=wait)
+    except FutureTimeoutError:
+        return None
+
+
+# --- Renderer ---
+def get_logo_path():
+    """Mencoba menemukan logo di direktori statis."""
+    # Pastikan file logo Anda ada di direktori static: 'app/images/bringco.png'
+    static_path = find_static('app/images/bringco.png')
+    if static_path and os.path.exists(static_path):
+        return static_path
+        
+    # Fallback jika tidak ditemukan
+    try:
+        if settings.STATICFILES_DIRS:
+            logo_path_manual = os.path.join(settings.STATICFILES_DIRS[0], 'app/images/bringco.png')
+            if os.path.exists(logo_path_manual):
+                return logo_path_manual
+    except (AttributeError, IndexError):
+        pass
+
+    return None
+
+
+class Resources(NamedTuple):
+    logo_path: Optional[str]
+    logo: Optional[ImageReader]  # None jika file tidak ada / gagal di-decode
+    logo_stamp: Optional[list]   # [mtime_ns, size], ikut hash konten dokumen
+
+
+_resources_lock = threading.Lock()
+_resources = None
+
+
+def _load_resources():
+    logo_path = get_logo_path()
+    logo = logo_stamp = None
+    if logo_path:
+        stat = os.stat(logo_path)
+        logo_stamp = [stat.st_mtime_ns, stat.st_size]
+        try:
+            logo = ImageReader(logo_path)
+            logo.getRGBData()  # Decode sekarang, bukan di setiap drawImage
+        except Exception:
+            logo = None
+    return Resources(logo_path=logo_path, logo=logo, logo_stamp=logo_stamp)
+
+
+def get_resources():
+    """
+    Logo (path, gambar ter-decode, stempel file), dimuat sekali per proses lalu
+    dipakai bersama semua render. Mengganti file logo butuh restart proses
+    (atau reset_resources()).
+    """
+    global _resources
+    if _resources is None:
+        with _resources_lock:
+            if _resources is None:
+                _resources = _load_resources()
+    return _resources
+
+
+def reset_resources():
+    global _resources
+    with _resources_lock:
+        _resources = None
+
+
+# --- Layout dokumen (lihat pdf_layout.py) ---
+SENDER_ADDRESS = "Jl. Tebet Timur Dalam II No.7 Kec. Tebet, Jakarta Selatan 12820"
+SENDER_PHONE = "+62-812-1414-4787"
+SENDER_EMAIL = "bringco.hq@gmail.com"
+
+# --- Label pengiriman 10x15 cm ---
+LABEL_WIDTH = 10 * cm
+LABEL_HEIGHT = 15 * cm
+_LM = 0.5 * cm                  # margin
+_LR = LABEL_WIDTH - _LM         # tepi kanan
+_LC2 = LABEL_WIDTH / 2.0        # kolom kanan
+_LLINE = 0.4 * cm               # jarak antar baris standar
+_LADDR = 0.35 * cm              # spasi rapat untuk alamat
+
+ORDER_LABEL_LAYOUT = Layout((LABEL_WIDTH, LABEL_HEIGHT), LABEL_HEIGHT - _LM, [
+    # Header: logo kiri + judul kanan, atau judul teks saja jika tidak ada logo
+    IfLogo(
+        then=[
+            Columns([
+                [Logo(_LM, 2.5 * cm)],
+                [
+                    Row([
+                        Text(_LR, "INVOICE PENGIRIMAN", 'Helvetica-Bold', 14, 'right', dy=0.7 * cm),
+                        Text(_LR, "BringCo - Official Shipping Label", size=9, align='right', dy=1.2 * cm),
+                    ]),
+                    Space(1.5 * cm),
+                ],
+            ]),
+            Space(0.2 * cm),
+        ],
+        otherwise=[
+            Row([Text(_LM, "INVOICE/LABEL PENGIRIMAN", 'Helvetica-Bold', 14)], 0.6 * cm),
+            Row([Text(_LM, "BringCo - Official Shipping Label")], 0.5 * cm),
+        ],
+    ),
+    Rule(_LM, _LR),
+    Space(0.4 * cm),
+
+    # Info order (2 kolom)
+    Columns([
+        [
+            Row([Text(_LM, "Order ID:"), Text(_LM + 1.8 * cm, lambda o: f"{o.id}", 'Helvetica-Bold')], _LLINE),
+            Row([Text(_LM, "Tgl Order:"), Text(_LM + 1.8 * cm, lambda o: o.created_at.strftime('%d-%m-%Y'))]),
+        ],
+        [
+            Row([Text(_LC2, "Pengiriman:"), Text(_LC2 + 2.0 * cm, lambda o: o.shipping_type or '-', 'Helvetica-Bold')], _LLINE),
+            Row([Text(_LC2, "Status:"), Text(_LC2 + 2.0 * cm, lambda o: o.status_display)]),
+        ],
+    ]),
+    Space(0.4 * cm),
+    Rule(_LM, _LR, width=2),
+    Space(0.5 * cm),
+
+    # Penerima & pengirim
+    Row([
+        Text(_LM, "PENERIMA:", 'Helvetica-Bold', 10, color=(0.1, 0.1, 0.5)),
+        Text(_LC2, "PENGIRIM:", 'Helvetica-Bold', 10, color=(0.5, 0.1, 0.1)),
+    ], 0.5 * cm),
+    Columns([
+        [
+            Row([Text(_LM, "Nama: "), Text(_LM + 1.2 * cm, lambda o: o.customer_name, 'Helvetica-Bold')], _LLINE),
+            Row([Text(_LM, lambda o: f"Telp: {o.customer_phone}")], 0.5 * cm),
+            Row([Text(_LM, "Alamat:", 'Helvetica-Bold')], _LADDR),
+            Lines(_LM, lambda o: o.customer_address, leading=_LADDR, wrap_width=4.5 * cm),
+            Space(0.1 * cm),
+        ],
+        [
+            Row([Text(_LC2, "Nama: BringCo")], _LLINE),
+            Row([Text(_LC2, f"Telp: {SENDER_PHONE}")], 0.5 * cm),
+            Row([Text(_LC2, "Alamat:", 'Helvetica-Bold')], _LADDR),
+            Lines(_LC2, SENDER_ADDRESS, leading=_LADDR, wrap_width=4.5 * cm),
+            Space(0.1 * cm),
+        ],
+    ]),
+    Space(0.4 * cm),
+    Rule(_LM, _LR, width=2),
+    Space(0.5 * cm),
+
+    # Barang & harga
+    Row([Text(_LM, "SKU ID & Nama Barang:", 'Helvetica-Bold', 10)], 0.5 * cm),
+    Columns([
+        [
+            Row([Text(_LM, "SKU ID:"), Text(_LM + 2.0 * cm, lambda o: o.sku_id or 'N/A', 'Helvetica-Bold', 10)], _LLINE),
+            Row([Text(_LM, "Barang:"), Text(_LM + 2.0 * cm, lambda o: o.sku_name or 'Detail Barang')]),
+        ],
+        [
+            Row([Text(_LR, "TOTAL HARGA JUAL:", 'Helvetica-Bold', 9, 'right', (0.5, 0.0, 0.5))], _LLINE),
+            Row([Text(_LR, lambda o: f"Rp {intcomma(o.price)}", 'Helvetica-Bold', 12, 'right', (0.0, 0.5, 0.0))]),
+        ],
+    ]),
+    Space(0.5 * cm),
+    Rule(_LM, _LR),
+    Space(0.3 * cm),
+
+    # Footer (tanpa jam cetak: PDF di-cache per isi data, jam akan membeku)
+    Row([
+        Text(_LM, "Terima kasih telah berbelanja.", 'Helvetica-Oblique', 7),
+        Text(_LR, lambda o: f"Dicetak oleh Sales: {o.sales_username}", 'Helvetica-Oblique', 7, 'right'),
+    ]),
+])
+
+# --- Invoice A4 ---
+_PAGE_WIDTH, _PAGE_HEIGHT = A4
+_AM = 2 * cm                        # margin
+_AR = _PAGE_WIDTH - _AM             # tepi kanan
+_CONTENT_WIDTH = _PAGE_WIDTH - 2 * _AM
+_SUMMARY_WIDTH = _CONTENT_WIDTH * 0.45
+_SUMMARY_X = _AR - _SUMMARY_WIDTH
+_SIGN_X = _AR - 5 * cm              # kotak tanda tangan 5 cm
+_SIGN_CENTER = _SIGN_X + 2.5 * cm
+
+_INV_LINE = 0.45 * cm
+_INV_COMPANY_X = _AM + 5 * cm
+_INV_COLON_LEFT = _AM + 2.5 * cm     # cukup ruang untuk "Telepon"
+_INV_RIGHT_X = _PAGE_WIDTH / 2 + 1 * cm
+_INV_COLON_RIGHT = _INV_RIGHT_X + 3.0 * cm  # cukup ruang untuk "Sales Person"
+
+
+def _info_row(label_x, colon_x, label, value, advance=_INV_LINE, value_x=None, align='left'):
+    """Baris 'Label : nilai' dengan titik dua sejajar."""
+    return Row([
+        Text(label_x, label, size=10),
+        Text(colon_x, ":", size=10),
+        Text(colon_x + 0.2 * cm if value_x is None else value_x, value, size=10, align=align),
+    ], advance)
+
+
+def _invoice_items(order):
+    return [
+        ["NO.", "DESCRIPTION (SKU ID)", "QTY", "UNIT PRICE (RP)", "LINE TOTAL (RP)"],
+        ["1.", f"{order.sku_name}\n(ID: {order.sku_id})", "1", intcomma(order.price), intcomma(order.price)],
+    ]
+
+
+def _invoice_summary(order):
+    shipping_cost = 0
+    return [
+        ["SUBTOTAL", f"Rp {intcomma(order.price)}"],
+        ["Biaya Pengiriman", f"Rp {intcomma(shipping_cost)}"],
+        ["TOTAL TAGIHAN", f"Rp {intcomma(order.price + shipping_cost)}"],
+        ["SUDAH TERBAYAR", f"Rp {intcomma(order.total_paid)}"],
+        ["SISA TAGIHAN", f"Rp {intcomma(order.remaining_balance)}"],
+    ]
+
+
+INVOICE_LAYOUT = Layout(A4, _PAGE_HEIGHT - 2 * cm, [
+    # Header: logo, info perusahaan, judul & nomor invoice
+    Block(3.5 * cm, [
+        IfLogo(
+            then=[Logo(_AM, 3.5 * cm, 3.5 * cm, dy=1.5 * cm, mask='auto')],
+            otherwise=[Row([Text(_AM, "BRINGCO", 'Helvetica-Bold', 14, dy=1.0 * cm)])],
+        ),
+        Row([
+            Text(_INV_COMPANY_X, "BRINGCO HEADQUARTERS", 'Helvetica-Bold', 10),
+            Text(_INV_COMPANY_X, SENDER_ADDRESS, size=8, dy=0.4 * cm),
+            Text(_INV_COMPANY_X, f"Telp: {SENDER_PHONE} | Email: {SENDER_EMAIL}", size=8, dy=0.8 * cm),
+            Text(_AR, "INVOICE", 'Helvetica-Bold', 24, 'right', '#004d99'),
+            Text(_AR, "INVOICE NO:", 'Helvetica-Bold', 10, 'right', dy=1.0 * cm),
+            Text(_AR, lambda o: f"INV/{o.created_at.strftime('%Y%m')}/{o.id}", size=10, align='right', dy=1.4 * cm),
+        ]),
+    ]),
+    Rule(_AM, _AR),
+    Space(0.8 * cm),
+
+    # Bill to (kiri) & info transaksi (kanan)
+    Columns([
+        [
+            Row([Text(_AM, "BILL TO:", 'Helvetica-Bold', 11)], 0.6 * cm),
+            _info_row(_AM, _INV_COLON_LEFT, "Nama", lambda o: o.customer_name),
+            _info_row(_AM, _INV_COLON_LEFT, "Telepon", lambda o: o.customer_phone),
+            Row([Text(_AM, "Alamat", size=10), Text(_INV_COLON_LEFT, ":", size=10)]),
+            # ~40 karakter agar tidak bertabrakan dengan kolom kanan
+            Lines(_INV_COLON_LEFT + 0.2 * cm, lambda o: o.customer_address, size=10, leading=0.4 * cm, wrap_chars=40),
+        ],
+        [
+            Row([Text(_INV_RIGHT_X, "TRANSACTION INFO:", 'Helvetica-Bold', 11)], 0.6 * cm),
+            _info_row(_INV_RIGHT_X, _INV_COLON_RIGHT, "Tanggal Invoice",
+                      lambda o: o.created_at.strftime('%d %B %Y'), value_x=_AR, align='right'),
+            _info_row(_INV_RIGHT_X, _INV_COLON_RIGHT, "Sales Person",
+                      lambda o: o.sales_username, value_x=_AR, align='right'),
+            _info_row(_INV_RIGHT_X, _INV_COLON_RIGHT, "Pengiriman",
+                      lambda o: o.shipping_type or 'N/A', advance=0, value_x=_AR, align='right'),
+        ],
+    ]),
+    Rule(_AM, _AR, dy=0.5 * cm),
+    Space(1.0 * cm),
+
+    # Item, ringkasan (kanan) & catatan (kiri)
+    Grid(_AM, _invoice_items, [
+        0.8 * cm, _CONTENT_WIDTH * 0.48, 1.5 * cm, _CONTENT_WIDTH * 0.20, _CONTENT_WIDTH * 0.20,
+    ], INVOICE_ITEM_TABLE_STYLE),
+    Space(0.5 * cm),
+    Columns([
+        [Grid(_SUMMARY_X, _invoice_summary, [_SUMMARY_WIDTH * 0.60, _SUMMARY_WIDTH * 0.40], INVOICE_SUMMARY_STYLE)],
+        [
+            Row([Text(_AM, "CATATAN:", 'Helvetica-Bold', 10)], 0.4 * cm),
+            Row([Text(_AM, lambda o: f"Sisa tagihan **Rp {intcomma(o.remaining_balance)}** jatuh tempo dalam 7 hari.")], 0.4 * cm),
+            Row([Text(_AM, "Pembayaran dapat ditransfer ke Bank XYZ, A/N BRINGCO.")]),
+        ],
+    ]),
+
+    # Tanda tangan & footer (posisi tetap dari bawah)
+    At(4 * cm, [
+        Row([Text(_SIGN_CENTER, "Hormat Kami,", 'Helvetica-Bold', 10, 'center')]),
+        Rule(_SIGN_X, _SIGN_X + 5 * cm, dy=1 * cm),
+        Row([
+            Text(_SIGN_CENTER, lambda o: o.sales_full_name or o.sales_username, 'Helvetica-Bold', 10, 'center', dy=1.5 * cm),
+            Text(_SIGN_CENTER, "Sales Representative", size=9, align='center', dy=1.9 * cm),
+        ]),
+    ]),
+    At(1.5 * cm, [
+        Row([Text(_PAGE_WIDTH / 2, "Terima kasih atas kepercayaan Anda.", 'Helvetica-Oblique', 8, 'center')]),
+    ]),
+])
+
+# --- Quotation A4 ---
+_QUO_LOGO_HEIGHT = 3.8 * cm
+_QUO_VALUE_X = _AM + 3.8 * cm
+_QUO_RIGHT_LABEL_X = _AR - 3.8 * cm
+_QUO_FROM_X = _PAGE_WIDTH / 2 + 0.5 * cm
+_QUO_TTD_RESERVED_Y = 5 * cm
+
+
+def _date(value, fmt):
+    return value.strftime(fmt) if value else 'N/A'
+
+
+def _quotation_items(quotation):
+    description = (
+        f"<b>{quotation.sku_name}</b><br/>"
+        f"SKU ID: {quotation.sku_id}<br/>"
+        f"Kondisi/Status: {quotation.sku_status_display or 'Ready Stock'}."
+    )
+    return [
+        ["No.", "Item Description (SKU ID)", "Quantity", "Unit Price (Rp)", "Line Total (Rp)"],
+        ["1.", description, f"{quotation.quantity}", intcomma(quotation.price), intcomma(quotation.subtotal)],
+    ]
+
+
+def _quotation_summary(quotation):
+    return [
+        ["Subtotal:", f"Rp {intcomma(quotation.subtotal)}"],
+        ["Extra Discount:", f"Rp {intcomma(quotation.extra_discount)}"],
+        ["TOTAL AMOUNT:", f"Rp {intcomma(quotation.total_quote)}"],
+    ]
+
+
+def _quotation_terms(quotation):
+    return [
+        "- Payment Terms: Down Payment is due within 7 days of the invoice date.",
+        "- Delivery Time: Estimated delivery time is 2-7 business days after order confirmation.",
+        f"- Validity: This quotation is valid until {_date(quotation.valid_until, '%d %B %Y')}.",
+        "- Warranty: All products come with a warranty. Details are available on request.",
+        "- Shipping: Shipping cost is calculated based on the delivery location.",
+    ]
+
+
+QUOTATION_LAYOUT = Layout(A4, _PAGE_HEIGHT - _AM, [
+    # Header: logo kiri atas, judul di tengah area logo
+    Block(_QUO_LOGO_HEIGHT + 0.7 * cm, [
+        IfLogo([Logo(_AM, 5.0 * cm, _QUO_LOGO_HEIGHT, preserve_aspect=True)]),
+        Row([Text(_PAGE_WIDTH / 2, "SALES QUOTATION", 'Helvetica-Bold', 22, 'center', '#004d99',
+                  dy=_QUO_LOGO_HEIGHT / 2 + 0.4 * cm)]),
+    ]),
+    Rule(_AM, _AR),
+    Space(0.5 * cm),
+
+    # Nomor, tanggal, masa berlaku
+    Row([
+        Text(_AM, "QUOTATION NO:", 'Helvetica-Bold', 10),
+        Text(_QUO_VALUE_X, lambda q: q.quotation_number or 'DRAFT', size=10),
+        Text(_QUO_RIGHT_LABEL_X, "DATE:", 'Helvetica-Bold', 10),
+        Text(_AR, lambda q: q.date.strftime('%d %b %Y'), size=10, align='right'),
+    ], 0.5 * cm),
+    Row([
+        Text(_QUO_RIGHT_LABEL_X, "VALID UNTIL:", 'Helvetica-Bold', 10),
+        Text(_AR, lambda q: _date(q.valid_until, '%d %b %Y'), size=10, align='right'),
+    ], 1.0 * cm),
+    Rule(_AM, _AR),
+    Space(0.8 * cm),
+
+    # Bill to (kiri) & from (kanan)
+    Columns([
+        [
+            Row([Text(_AM, "BILL TO:", 'Helvetica-Bold', 11, color='#333333')], 0.5 * cm),
+            Row([Text(_AM, lambda q: f"Contact Person: {q.customer_name}", size=10, color='#333333')], 0.4 * cm),
+            Row([Text(_AM, lambda q: f"Phone: {q.customer_phone}", size=10, color='#333333')], 0.6 * cm),
+            Row([Text(_AM, "Address:", 'Helvetica-Bold', 10, color='#333333')], 0.4 * cm),
+            Para(_AM, lambda q: q.customer_address, _PAGE_WIDTH / 2 - 1.0 * cm, styleN),
+            Space(0.1 * cm),
+        ],
+        [
+            Row([Text(_QUO_FROM_X, "FROM: (BRING.CO)", 'Helvetica-Bold', 11, color='#333333')], 0.5 * cm),
+            Para(
+                _QUO_FROM_X,
+                f"{SENDER_ADDRESS}<br/>Email: {SENDER_EMAIL}<br/>Phone: {SENDER_PHONE}",
+                _PAGE_WIDTH / 2 - _AM - 0.5 * cm, styleN,
+            ),
+            Space(0.1 * cm),
+        ],
+    ]),
+    Space(0.5 * cm),
+
+    # Item & ringkasan
+    Row([Text(_AM, "ITEMIZED QUOTATION DETAILS", 'Helvetica-Bold', 12, color='#004d99')], 0.5 * cm),
+    Rule(_AM, _AR, width=0.5),
+    Space(0.1 * cm),
+    Grid(_AM, _quotation_items, [
+        1 * cm, _CONTENT_WIDTH * 0.48, 1.5 * cm, _CONTENT_WIDTH * 0.20, _CONTENT_WIDTH * 0.19,
+    ], QUOTATION_ITEM_TABLE_STYLE, paragraph_columns=[1], paragraph_style=styleN),
+    Space(0.5 * cm),
+    Grid(_SUMMARY_X, _quotation_summary, [_SUMMARY_WIDTH * 0.6, _SUMMARY_WIDTH * 0.4], QUOTATION_SUMMARY_STYLE),
+    Space(0.5 * cm),
+
+    # Syarat & ketentuan, tidak boleh menimpa area tanda tangan
+    Clamp(_QUO_TTD_RESERVED_Y),
+    Row([Text(_AM, "TERMS AND CONDITIONS:", 'Helvetica-Bold', 10)], 0.5 * cm),
+    Lines(_AM, _quotation_terms, leading=0.4 * cm, floor=_QUO_TTD_RESERVED_Y),
+
+    # Persetujuan (pojok kanan bawah)
+    At(4 * cm, [
+        Row([Text(_SIGN_CENTER, "Authorized Signature", 'Helvetica-Bold', 10, 'center')]),
+        Rule(_SIGN_X, _SIGN_X + 5 * cm, dy=1.0 * cm),
+        Row([
+            Text(_SIGN_CENTER, "Approved by CEO", 'Helvetica-Bold', 10, 'center', dy=1.5 * cm),
+            Text(_SIGN_CENTER, "CEO/Authorized Management", size=9, align='center', dy=1.9 * cm),
+        ]),
+    ]),
+])
+
+LAYOUTS = {
+    'order_label': ORDER_LABEL_LAYOUT,
+    'invoice': INVOICE_LAYOUT,
+    'quotation': QUOTATION_LAYOUT,
+}
+
+_plans_lock = threading.Lock()
+_plans = {}
+
+
+def get_plan(name):
+    """Plan render untuk layout `name`, dikompilasi sekali per proses."""
+    plan = _plans.get(name)
+    if plan is None:
+        with _plans_lock:
+            plan = _plans.get(name)
+            if plan is None:
+                plan = _plans[name] = compile_layout(LAYOUTS[name])
+    return plan
+
+
+def render_order_label(target, order):
+    """Label/faktur mini PDF ukuran 10x15 cm (snapshot dari collect_order_label)."""
+    get_plan('order_label').render(target, [order], get_resources().logo)
+
+
+def render_order_labels(target, batch):
+    """Banyak label dalam satu PDF, satu halaman per order (snapshot dari collect_order_labels)."""
+    orders = [SimpleNamespace(**order) for order in batch.orders]
+    get_plan('order_label').render(target, orders, get_resources().logo)
+
+
+def render_invoice_a4(target, order):
+    """Invoice penjualan PDF A4 (snapshot dari collect_invoice)."""
+    get_plan('invoice').render(target, [order], get_resources().logo)
+
+
+def render_quotation_a4(target, quotation):
+    """Sales quotation PDF A4 (snapshot dari collect_quotation)."""
+    get_plan('quotation').render(target, [quotation], get_resources().logo)
+
+
+DOCUMENT_TYPES = {
+    'order_label': DocumentType(
+        collect_order_label, render_order_label,
+        lambda data: f'Order_Label_{data["id"]}_{data["customer_name"].replace(" ", "_")}.pdf',
+        version=3,
+    ),
+    'order_labels': DocumentType(
+        collect_order_labels, render_order_labels,
+        lambda data: f"Order_Labels_{len(data['orders'])}.pdf",
+        version=3,
+    ),
+    'invoice': DocumentType(
+        collect_invoice, render_invoice_a4,
+        lambda data: f"INVOICE_ORDER_{data['id']}.pdf",
+        version=2,
+    ),
+    'quotation': DocumentType(
+        collect_quotation, render_quotation_a4,
+        lambda data: f"QUOTATION_{data['quotation_number'] or data['id']}.pdf",
+        version=2,
+        as_attachment=False,
+    ),
+}
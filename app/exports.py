@@ -0,0 +1,327 @@
+"""
+Export data (CSV / XLSX) yang di-stream baris per baris.
+
+Setiap dataset didefinisikan di EXPORTS: queryset dasar, kolom yang boleh
+dipilih (path ORM untuk `.values_list()`), field tanggal dan field status
+untuk filter. Baris dibaca dengan `.iterator(chunk_size=...)` lalu langsung
+ditulis ke response, sehingga memori tetap datar berapapun jumlah barisnya.
+
+XLSX ditulis sendiri (SpreadsheetML minimal di dalam zip yang di-stream),
+tanpa dependensi tambahan.
+"""
+import csv
+import datetime
+import zipfile
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import Payment, PurchaseOrder, SalesOrder, SKU, SparePartInventory
+
+CHUNK_SIZE = 2000
+
+
+class ExportError(ValueError):
+    """Parameter export tidak valid (kolom / status / tanggal)."""
+
+
+def _choices(model, field_name):
+    return dict(model._meta.get_field(field_name).choices)
+
+
+# columns -> key: (header, path ORM). `roles`: grup yang boleh export (Master Role selalu boleh).
+# `owner_field`: selain Master Role, hanya baris milik user sendiri.
+EXPORTS = {
+    'inventory': {
+        'title': 'Spare Part Inventory',
+        'roles': ('Warehouse Manager', 'Purchasing'),
+        'queryset': lambda: SparePartInventory.objects.order_by('id'),
+        'columns': {
+            'id': ('ID', 'id'),
+            'part_name': ('Nama Part', 'part_name'),
+            'part_sku': ('SKU Part', 'part_sku'),
+            'quantity_in_stock': ('Stok', 'quantity_in_stock'),
+            'location': ('Lokasi', 'location'),
+            'primary_supplier': ('Supplier', 'primary_supplier'),
+            'status': ('Status', 'status'),
+            'origin': ('Asal', 'origin'),
+        },
+        'date_field': None,
+        'status_field': 'status',
+        'choices': {'status': _choices(SparePartInventory, 'status'), 'origin': _choices(SparePartInventory, 'origin')},
+    },
+    'skus': {
+        'title': 'SKU',
+        'roles': ('Warehouse Manager', 'Lead Technician'),
+        'queryset': lambda: SKU.objects.order_by('id'),
+        'columns': {
+            'id': ('ID', 'id'),
+            'sku_id': ('SKU ID', 'sku_id'),
+            'name': ('Nama', 'name'),
+            'status': ('Status', 'status'),
+            'location': ('Lokasi', 'location'),
+            'po_number': ('No. PO', 'po_number__po_number'),
+            'rack': ('Rak', 'shelf_location__rack_location'),
+            'store': ('Store', 'current_store__name'),
+            'technician': ('Teknisi', 'assigned_technician__username'),
+            'created_at': ('Dibuat', 'created_at'),
+            'shelved_at': ('Masuk Rak', 'shelved_at'),
+        },
+        'date_field': 'created_at',
+        'status_field': 'status',
+        'choices': {'status': _choices(SKU, 'status'), 'location': _choices(SKU, 'location')},
+    },
+    'purchase_orders': {
+        'title': 'Purchase Order',
+        'roles': ('Purchasing', 'Warehouse Manager'),
+        'queryset': lambda: PurchaseOrder.objects.order_by('id'),
+        'columns': {
+            'id': ('ID', 'id'),
+            'po_number': ('No. PO', 'po_number'),
+            'status': ('Status', 'status'),
+            'expected_sku_count': ('Jumlah SKU', 'expected_sku_count'),
+            'total_po_price': ('Total Harga', 'total_po_price'),
+            'approved_by_wm': ('Disetujui WM', 'approved_by_wm__username'),
+            'created_at': ('Dibuat', 'created_at'),
+            'managed_at': ('Diproses', 'managed_at'),
+        },
+        'date_field': 'created_at',
+        'status_field': 'status',
+        'choices': {'status': _choices(PurchaseOrder, 'status')},
+    },
+    'sales_orders': {
+        'title': 'Sales Order',
+        'roles': ('Sales',),
+        'queryset': lambda: SalesOrder.objects.order_by('id'),
+        'columns': {
+            'id': ('ID', 'id'),
+            'customer_name': ('Customer', 'customer_name'),
+            'customer_phone': ('Telepon', 'customer_phone'),
+            'sku_id': ('SKU ID', 'sku__sku_id'),
+            'sku_name': ('Nama SKU', 'sku__name'),
+            'price': ('Harga', 'price'),
+            'total_paid': ('Total Bayar', 'total_paid'),
+            'status': ('Status', 'status'),
+            'sales_person': ('Sales', 'sales_person__username'),
+            'created_at': ('Dibuat', 'created_at'),
+            'shipped_at': ('Dikirim', 'shipped_at'),
+            'completed_at': ('Selesai', 'completed_at'),
+        },
+        'date_field': 'created_at',
+        'status_field': 'status',
+        'owner_field': 'sales_person',
+        'choices': {'status': _choices(SalesOrder, 'status')},
+    },
+    'payments': {
+        'title': 'Payment',
+        'roles': ('Sales',),
+        'queryset': lambda: Payment.objects.order_by('id'),
+        'columns': {
+            'id': ('ID', 'id'),
+            'order_id': ('Order ID', 'sales_order_id'),
+            'customer_name': ('Customer', 'sales_order__customer_name'),
+            'sku_id': ('SKU ID', 'sales_order__sku__sku_id'),
+            'amount': ('Jumlah', 'amount'),
+            'payment_date': ('Tanggal Bayar', 'payment_date'),
+            'order_status': ('Status Order', 'sales_order__status'),
+            'sales_person': ('Sales', 'sales_order__sales_person__username'),
+        },
+        'date_field': 'payment_date',
+        'status_field': 'sales_order__status',
+        'owner_field': 'sales_order__sales_person',
+        'choices': {'order_status': _choices(SalesOrder, 'status')},
+    },
+}
+
+
+def _parse_day(value, name):
+    day = parse_date(value)
+    if day is None:
+        raise ExportError(f"Tanggal '{name}' tidak valid (format YYYY-MM-DD).")
+    return day
+
+
+def _start_of_day(day):
+    value = datetime.datetime.combine(day, datetime.time.min)
+    return timezone.make_aware(value) if settings.USE_TZ else value
+
+
+def build_export(dataset, params, owner=None):
+    """
+    (header, rows) untuk dataset. `params`: QueryDict/dict dengan `columns`
+    (dipisah koma), `status` (boleh berulang / dipisah koma), `date_from`,
+    `date_to`. `owner` membatasi baris milik user tsb (untuk Sales).
+    """
+    spec = EXPORTS.get(dataset)
+    if spec is None:
+        raise ExportError(f"Dataset '{dataset}' tidak dikenal.")
+
+    requested = [key for key in params.get('columns', '').split(',') if key]
+    keys = requested or list(spec['columns'])
+    unknown = [key for key in keys if key not in spec['columns']]
+    if unknown:
+        raise ExportError(f"Kolom tidak dikenal: {', '.join(unknown)}.")
+
+    queryset = spec['queryset']()
+    if owner is not None and spec.get('owner_field'):
+        queryset = queryset.filter(**{spec['owner_field']: owner})
+
+    statuses = []
+    for value in (params.getlist('status') if hasattr(params, 'getlist') else [params.get('status', '')]):
+        statuses.extend(status for status in value.split(',') if status)
+    if statuses:
+        queryset = queryset.filter(**{f"{spec['status_field']}__in": statuses})
+
+    date_field = spec['date_field']
+    date_from, date_to = params.get('date_from'), params.get('date_to')
+    if (date_from or date_to) and not date_field:
+        raise ExportError(f"Dataset '{dataset}' tidak punya field tanggal.")
+    # Rentang datetime (bukan __date) supaya index kolom tanggal tetap terpakai
+    if date_from:
+        queryset = queryset.filter(**{f'{date_field}__gte': _start_of_day(_parse_day(date_from, 'date_from'))})
+    if date_to:
+        next_day = _parse_day(date_to, 'date_to') + datetime.timedelta(days=1)
+        queryset = queryset.filter(**{f'{date_field}__lt': _start_of_day(next_day)})
+
+    header = [spec['columns'][key][0] for key in keys]
+    paths = [spec['columns'][key][1] for key in keys]
+    choices = [spec['choices'].get(key) for key in keys]
+
+    def rows():
+        for values in queryset.values_list(*paths).iterator(chunk_size=CHUNK_SIZE):
+            yield [
+                _clean(labels.get(value, value) if labels else value)
+                for value, labels in zip(values, choices)
+            ]
+
+    return header, rows()
+
+
+def _clean(value):
+    if isinstance(value, datetime.datetime):
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        return value.strftime('%Y-%m-%d %H:%M')
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return value
+
+
+# --- Writer ---
+# Teks dari user yang diawali karakter ini dibaca Excel/Sheets sebagai formula
+_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _safe_text(value):
+    """Awali teks berbahaya dengan ' supaya tampil sebagai teks (CSV/formula injection)."""
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+class _Echo:
+    """File-like yang mengembalikan apa yang ditulis (pola dokumentasi Django)."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(header, rows):
+    writer = csv.writer(_Echo())
+    # BOM supaya Excel membaca UTF-8 dengan benar
+    yield '\ufeff' + writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(['' if value is None else _safe_text(value) for value in row])
+
+
+class _ChunkBuffer:
+    """Tujuan tulis zipfile yang tidak bisa di-seek; isinya diambil per potongan."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+_XLSX_STATIC_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _xlsx_cell(value):
+    if value is None or value == '':
+        return '<c/>'
+    if isinstance(value, bool):
+        value = str(value)
+    if isinstance(value, (int, float, Decimal)):
+        return f'<c><v>{value}</v></c>'
+    # Buang karakter kontrol yang tidak valid di XML
+    text = ''.join(char for char in _safe_text(str(value)) if char >= ' ' or char in '\t\n\r')
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(text)}</t></is></c>'
+
+
+def _xlsx_row(values):
+    return '<row>' + ''.join(_xlsx_cell(value) for value in values) + '</row>'
+
+
+def stream_xlsx(header, rows, sheet_name='Data', rows_per_chunk=500):
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in _XLSX_STATIC_PARTS.items():
+            archive.writestr(name, content)
+        archive.writestr('xl/workbook.xml', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets><sheet name="{escape(sheet_name[:31])}" sheetId="1" r:id="rId1"/></sheets>'
+            '</workbook>'
+        ))
+        yield buffer.take()
+
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+                + _xlsx_row(header)
+            ).encode())
+            pending = []
+            for row in rows:
+                pending.append(_xlsx_row(row))
+                if len(pending) >= rows_per_chunk:
+                    sheet.write(''.join(pending).encode())
+                    pending.clear()
+                    yield buffer.take()
+            sheet.write((''.join(pending) + '</sheetData></worksheet>').encode())
+    yield buffer.take()
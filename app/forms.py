@@ -64,6 +64,24 @@ class SKUDetailPOForm(forms.ModelForm):
             'year': forms.NumberInput(attrs={'class': 'form-control form-control-sm year-input', 'min': '1900'}),
             'po_price': forms.NumberInput(attrs={'class': 'form-control form-control-sm po-price-input', 'min': '0', 'required': 'required', 'step': '1000'}),
         }
+# Form import PO massal dari CSV / XLSX (lihat po_import.py)
+class PurchaseOrderImportForm(forms.Form):
+    po_number = forms.CharField(
+        max_length=100,
+        label='Nomor PO',
+        widget=forms.TextInput(attrs={'class': 'form-control'}),
+    )
+    file = forms.FileField(
+        label='File Detail SKU (.csv / .xlsx)',
+        widget=forms.FileInput(attrs={'class': 'form-control', 'accept': '.csv,.xlsx'}),
+    )
+
+    def clean_po_number(self):
+        po_number = self.cleaned_data['po_number'].strip()
+        if PurchaseOrder.objects.filter(po_number=po_number).exists():
+            raise forms.ValidationError("Nomor PO sudah terdaftar.")
+        return po_number
+
 # Form untuk WM me-reject PO
 class PORejectionForm(forms.ModelForm):
     class Meta:
@@ -217,7 +235,7 @@ class PaymentForm(forms.ModelForm):
         }
         widgets = {
             'amount': forms.NumberInput(attrs={'class': 'form-control', 'min': '1'}),
-            'proof_of_transfer': forms.FileInput(attrs={'class': 'form-control', 'required': True}),
+            'proof_of_transfer': forms.FileInput(attrs={'class': 'form-control', 'required': True, 'data-chunked-upload': True}),
         }
 
 class ShippingFileForm(forms.ModelForm):
@@ -291,7 +309,7 @@ class MovementRequestForm(forms.ModelForm):
             'delivery_form': 'Upload Form Pengiriman (DO)',
         }
         widgets = {
-            'delivery_form': forms.FileInput(attrs={'class': 'form-control form-control-lg shadow-sm', 'required': True}),
+            'delivery_form': forms.FileInput(attrs={'class': 'form-control form-control-lg shadow-sm', 'required': True, 'data-chunked-upload': True}),
         }
 
 class RackSelectionForm(forms.Form):
@@ -0,0 +1,151 @@
+"""
+Pipeline foto instalasi (InstallationPhoto) dengan Pillow.
+
+Foto dari HP (4-8 MB) disimpan apa adanya sebagai bukti (`image`), lalu
+setelah commit (signal post_save) dikirim ke thread pool lokal yang membuat
+dua turunan kecil:
+- `preview`   : sisi terpanjang PREVIEW_SIZE px, untuk dilihat penuh
+- `thumbnail` : sisi terpanjang THUMBNAIL_SIZE px, untuk galeri final check
+
+Turunan disimpan sebagai WebP (JPEG jika Pillow tanpa WebP), orientasi diambil
+dari EXIF lalu EXIF dibuang (lokasi GPS, info perangkat). JPEG di-decode
+langsung di skala kecil (`draft`), jadi foto besar tidak pernah dibuka penuh di
+memori. File yang bukan gambar (video) dilewati; template menampilkan link ke
+file asli, tetapi tetap dicatat di `derived_from`. Gambar yang diganti (admin)
+diproses ulang dan turunan lamanya dihapus.
+
+settings.IMAGE_PROCESS_WORKERS = 0 memproses langsung di thread pemanggil
+(dipakai di test). Foto lama: `manage.py process_installation_photos`.
+"""
+import io
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection
+from PIL import Image, ImageOps, features
+
+from .models import InstallationPhoto
+
+PREVIEW_SIZE = 1600
+THUMBNAIL_SIZE = 320
+
+if features.check('webp'):
+    FORMAT, EXTENSION, SAVE_OPTIONS = 'WEBP', 'webp', {'method': 4}
+else:
+    FORMAT, EXTENSION, SAVE_OPTIONS = 'JPEG', 'jpg', {'optimize': True, 'progressive': True}
+
+QUALITY = {'preview': 82, 'thumbnail': 70}
+
+
+def _encode(image, quality):
+    """Simpan ke bytes tanpa EXIF (Pillow hanya menulis EXIF jika diminta)."""
+    if image.mode not in (('RGB',) if FORMAT == 'JPEG' else ('RGB', 'RGBA')):
+        image = image.convert('RGB')
+    output = io.BytesIO()
+    image.save(output, FORMAT, quality=quality, **SAVE_OPTIONS)
+    return output.getvalue()
+
+
+def make_derivatives(file):
+    """{'preview': bytes, 'thumbnail': bytes} dari file gambar, atau None jika bukan gambar."""
+    try:
+        with Image.open(file) as source:
+            source.draft('RGB', (PREVIEW_SIZE, PREVIEW_SIZE))  # JPEG: decode di skala kecil
+            preview = ImageOps.exif_transpose(source)
+            preview.thumbnail((PREVIEW_SIZE, PREVIEW_SIZE), Image.Resampling.LANCZOS)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+    thumbnail = preview.copy()
+    thumbnail.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE), Image.Resampling.LANCZOS)
+    return {
+        'preview': _encode(preview, QUALITY['preview']),
+        'thumbnail': _encode(thumbnail, QUALITY['thumbnail']),
+    }
+
+
+def process_photo(photo_id, force=False):
+    """
+    Buat & simpan turunan dari gambar foto saat ini. Return daftar field yang
+    diisi ([] jika dilewati). `derived_from` dicatat juga untuk file yang bukan
+    gambar, jadi file itu tidak diantrikan lagi di setiap save. Turunan lama
+    (gambar diganti) dihapus setelah yang baru tersimpan.
+    """
+    photo = InstallationPhoto.objects.filter(pk=photo_id).first()
+    if photo is None or not photo.image:
+        return []
+    source = photo.image.name
+    if photo.derived_from == source and not force:
+        return [field for field in ('preview', 'thumbnail') if getattr(photo, field)]
+    try:
+        with photo.image.open('rb') as file:
+            derivatives = make_derivatives(file)
+    except FileNotFoundError:
+        return []
+
+    old = {field: getattr(photo, field).name for field in ('preview', 'thumbnail') if getattr(photo, field)}
+    base = os.path.splitext(os.path.basename(source))[0]
+    names = {'preview': '', 'thumbnail': ''}
+    for field, data in (derivatives or {}).items():
+        getattr(photo, field).save(f"{base}_{field}.{EXTENSION}", ContentFile(data), save=False)
+        names[field] = getattr(photo, field).name
+    # update() agar tidak menimpa field lain yang diubah sementara (remarks, dll.);
+    # filter image=source: gambar diganti saat diproses -> job gambar baru yang menulis
+    if not InstallationPhoto.objects.filter(pk=photo.pk, image=source).update(derived_from=source, **names):
+        for field, name in names.items():
+            if name:
+                getattr(photo, field).storage.delete(name)
+        return []
+    for field, name in old.items():
+        if name != names[field]:
+            getattr(photo, field).storage.delete(name)
+    return [field for field, name in names.items() if name]
+
+
+# --- Pool proses ---
+_pool_lock = threading.Lock()
+_pool = None
+_jobs = {}
+
+
+def _workers():
+    return getattr(settings, 'IMAGE_PROCESS_WORKERS', 2)
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=_workers(), thread_name_prefix='images')
+    return _pool
+
+
+def _process_in_worker(photo_id):
+    try:
+        return process_photo(photo_id)
+    finally:
+        connection.close()  # Koneksi DB milik thread pool
+
+
+def submit(photo_id, image_name=None):
+    """
+    Masukkan foto ke antrian (sekali per foto & gambar). Return Future -> daftar field.
+    Gambar diganti selagi job lama berjalan -> job baru, bukan Future yang lama.
+    """
+    key = (photo_id, image_name)
+    with _pool_lock:
+        future = _jobs.get(key)
+        if future is not None:
+            return future
+        if _workers() <= 0:
+            future = Future()
+            try:
+                future.set_result(process_photo(photo_id))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        future = _get_pool().submit(_process_in_worker, photo_id)
+        _jobs[key] = future
+    future.add_done_callback(lambda done: _jobs.pop(key, None))
+    return future
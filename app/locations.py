@@ -0,0 +1,29 @@
+"""
+Parser lokasi rak, cth. 'A1-03':
+- zone  = prefix sebelum '-'                  -> 'A1' (zona slotting & grid QC)
+- row   = huruf di awal zona (lorong/area)    -> 'A'  (grid peta rak)
+- level = angka setelah '-' terakhir          -> 3    (urutan slot dalam zona)
+
+Dipakai Rack.save() untuk mengisi kolom zone/row/level, sehingga view tidak
+perlu mem-parse ulang string lokasi di setiap request.
+"""
+import re
+from typing import NamedTuple, Optional
+
+_ZONE_PARTS = re.compile(r'^([A-Za-z]*)(\d*)')
+
+
+class RackLocation(NamedTuple):
+    zone: str
+    row: str
+    level: Optional[int]
+
+
+def parse_rack_location(location):
+    location = location or ''
+    zone = location.split('-')[0]
+    letters = _ZONE_PARTS.match(zone).group(1)
+    row = (letters or zone[:1]).upper()
+    tail = location.rsplit('-', 1)[1] if '-' in location else ''
+    level = int(tail) if tail.isdecimal() else None
+    return RackLocation(zone, row, level)
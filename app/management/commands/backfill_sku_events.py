@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from app.models import SKUEvent
+from app.timeline import RECEIVING, TimelineEvent, build_sku_timeline, missing_events, sku_graph_queryset
+
+
+class Command(BaseCommand):
+    help = (
+        "Isi log SKUEvent dari data QC, spare part, movement, order dan pembayaran yang sudah ada "
+        "untuk SKU yang lognya belum lengkap (event lama digabung dengan log yang sudah ada)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200)
+
+    def handle(self, *args, **options):
+        # Log lengkap diawali event penerimaan; SKU yang sedang berjalan saat log mulai
+        # dipakai hanya punya event baru, event lamanya ikut direkonstruksi. Log yang
+        # sudah ada tidak pernah dihapus (transisi antara, nama aktor tidak bisa dibangun ulang).
+        skus = sku_graph_queryset().order_by('id').exclude(events__event_type=RECEIVING).prefetch_related(
+            Prefetch('events', queryset=SKUEvent.objects.only('sku', 'event_type', 'occurred_at'), to_attr='logged_events')
+        )
+
+        now = timezone.now()
+        sku_count = event_count = 0
+        batch = []
+        for sku in skus.iterator(chunk_size=options['batch_size']):
+            sku_count += 1
+            logged = [
+                TimelineEvent(event.occurred_at, event.event_type, '', '')
+                for event in sku.logged_events
+            ]
+            for event in missing_events(logged, build_sku_timeline(sku)):
+                batch.append(SKUEvent(
+                    sku=sku,
+                    event_type=event.type,
+                    actor=event.user,
+                    actor_name=event.actor,
+                    details=event.details,
+                    links=list(event.links),
+                    occurred_at=event.date or now,
+                ))
+            if len(batch) >= options['batch_size']:
+                event_count += self._flush(batch)
+        event_count += self._flush(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"{event_count} event ditulis untuk {sku_count} SKU."))
+
+    def _flush(self, batch):
+        with transaction.atomic():
+            SKUEvent.objects.bulk_create(batch)
+        written = len(batch)
+        batch.clear()
+        return written
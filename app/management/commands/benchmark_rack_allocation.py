@@ -0,0 +1,125 @@
+import random
+import threading
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Count
+
+from app import rack_map, slotting
+from app.models import PurchaseOrder, Rack, SKU
+
+
+class Command(BaseCommand):
+    help = (
+        "Stress test alokasi rak: banyak thread menempatkan/melepas SKU secara bersamaan "
+        "di zona khusus benchmark, lalu cek tidak ada rak yang dipakai dua SKU."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--rounds', type=int, default=50, help="Jumlah place/release per thread.")
+        parser.add_argument('--racks', type=int, default=0, help="Jumlah rak benchmark (default: setengah jumlah SKU).")
+        parser.add_argument('--zone', default='ZZ99', help="Prefix zona rak benchmark (harus belum dipakai).")
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        threads, rounds, zone = options['threads'], options['rounds'], options['zone']
+        if threads > 1 and not connection.features.has_select_for_update_skip_locked:
+            raise CommandError(
+                f"Backend {connection.vendor} tidak mendukung row locking; jalankan dengan --threads 1."
+            )
+        if Rack.objects.filter(rack_location__startswith=f"{zone}-").exists():
+            raise CommandError(f"Zona {zone} sudah berisi rak. Pilih --zone lain.")
+
+        sku_count = threads * 2
+        rack_count = options['racks'] or max(1, sku_count // 2)
+        po = PurchaseOrder.objects.create(po_number=f"BENCH-{zone}-{time.time_ns()}", status='Delivered')
+        racks = [Rack(rack_location=f"{zone}-{n:04d}") for n in range(1, rack_count + 1)]
+        for rack in racks:
+            rack.fill_layout()  # bulk_create tidak memanggil save()
+        Rack.objects.bulk_create(racks)
+        skus = [
+            SKU.objects.create(po_number=po, sku_id=f"{po.po_number}-{n}", name="Benchmark", location='Warehouse')
+            for n in range(sku_count)
+        ]
+        slotting.invalidate_index()
+        rack_map.invalidate_layout()
+
+        stats = Counter()
+        stats_lock = threading.Lock()
+        errors = []
+
+        def worker(index):
+            rng = random.Random(None if options['seed'] is None else options['seed'] + index)
+            own = skus[index * 2:index * 2 + 2]
+            local = Counter()
+            try:
+                for _ in range(rounds):
+                    sku = SKU.objects.get(pk=rng.choice(own).pk)
+                    try:
+                        if sku.shelf_location_id and rng.random() < 0.5:
+                            slotting.release_sku(sku)
+                            local['release'] += 1
+                        else:
+                            slotting.place_sku(sku, zones={zone})
+                            local['place'] += 1
+                    except slotting.SlottingError:
+                        local['full'] += 1
+            except Exception as e:
+                errors.append(e)
+            finally:
+                with stats_lock:
+                    stats.update(local)
+                connection.close()
+
+        started = time.perf_counter()
+        try:
+            if threads == 1:
+                worker(0)
+            else:
+                pool = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+                for thread in pool:
+                    thread.start()
+                for thread in pool:
+                    thread.join()
+            elapsed = time.perf_counter() - started
+            close_old_connections()
+            problems = self._check(zone, po)
+        finally:
+            with transaction.atomic():
+                Rack.objects.filter(rack_location__startswith=f"{zone}-").delete()
+                po.delete()
+            slotting.invalidate_index()
+
+        operations = stats['place'] + stats['release'] + stats['full']
+        self.stdout.write(
+            f"{threads} thread x {rounds} putaran, {rack_count} rak / {sku_count} SKU: "
+            f"{stats['place']} place, {stats['release']} release, {stats['full']} rak penuh "
+            f"dalam {elapsed:.2f} detik ({operations / elapsed if elapsed else 0:.0f} operasi/detik)"
+        )
+        for problem in problems:
+            self.stdout.write(problem)
+        if errors:
+            raise CommandError(f"{len(errors)} thread gagal: {errors[0]!r}")
+        if problems:
+            raise CommandError(f"{len(problems)} double booking / ketidaksesuaian ditemukan.")
+        self.stdout.write(self.style.SUCCESS("Tidak ada double booking."))
+
+    def _check(self, zone, po):
+        racks = Rack.objects.filter(rack_location__startswith=f"{zone}-")
+        problems = [
+            f"Rak {rack_id}: terisi tapi status bukan 'Used'"
+            for rack_id in racks.filter(occupied_by_sku__isnull=False).exclude(status='Used').values_list('pk', flat=True)
+        ]
+        expected = dict(racks.filter(occupied_by_sku__isnull=False).values_list('occupied_by_sku', 'pk'))
+        for sku_id, shelf_location_id in SKU.objects.filter(po_number=po).values_list('pk', 'shelf_location_id'):
+            if shelf_location_id != expected.get(sku_id):
+                problems.append(f"SKU {sku_id}: shelf_location={shelf_location_id}, rak={expected.get(sku_id)}")
+        problems.extend(
+            f"Rak {row['shelf_location']}: dipakai {row['total']} SKU"
+            for row in SKU.objects.filter(po_number=po, shelf_location__isnull=False)
+            .values('shelf_location').annotate(total=Count('pk')).filter(total__gt=1)
+        )
+        return problems
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from app import uploads
+
+
+class Command(BaseCommand):
+    help = "Hapus file upload bertahap yang sudah dipakai atau terbengkalai (lihat app/uploads.py)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24, help="Umur maksimal upload yang belum selesai (jam).")
+
+    def handle(self, *args, **options):
+        removed = uploads.cleanup(options['hours'])
+        self.stdout.write(self.style.SUCCESS(f"{removed} upload dihapus."))
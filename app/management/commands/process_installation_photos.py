@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from app import images
+from app.models import InstallationPhoto
+
+
+class Command(BaseCommand):
+    help = "Buat thumbnail & preview (WebP, tanpa EXIF) untuk foto instalasi yang gambarnya belum diproses."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Proses ulang semua foto, termasuk yang sudah punya turunan.")
+
+    def handle(self, *args, **options):
+        photos = InstallationPhoto.objects.order_by('pk')
+        if not options['all']:
+            photos = photos.exclude(derived_from=F('image'))
+        done = skipped = 0
+        for photo_id in photos.values_list('pk', flat=True).iterator():
+            if images.process_photo(photo_id, force=options['all']):
+                done += 1
+            else:
+                skipped += 1
+                self.stdout.write(f"Foto {photo_id}: dilewati (bukan gambar / file tidak ada)")
+        self.stdout.write(self.style.SUCCESS(f"{done} foto diproses, {skipped} dilewati."))
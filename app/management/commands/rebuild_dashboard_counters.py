@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from app.counters import compute_counts, rebuild_counters
+from app.models import DashboardCounter
+
+
+class Command(BaseCommand):
+    help = "Bangun ulang tabel DashboardCounter dari data SKU dan PO."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help="Hanya bandingkan counter tersimpan dengan hasil hitung ulang, tanpa menulis.",
+        )
+
+    def handle(self, *args, **options):
+        if options['check']:
+            expected = compute_counts()
+            stored = dict(DashboardCounter.objects.values_list('key', 'value'))
+            drift = {
+                key: (stored.get(key, 0), expected.get(key, 0))
+                for key in set(stored) | set(expected)
+                if stored.get(key, 0) != expected.get(key, 0)
+            }
+            for key, (stored_value, expected_value) in sorted(drift.items()):
+                self.stdout.write(f"{key}: tersimpan={stored_value}, seharusnya={expected_value}")
+            if drift:
+                self.stdout.write(self.style.WARNING(f"{len(drift)} counter tidak sesuai."))
+            else:
+                self.stdout.write(self.style.SUCCESS("Semua counter sesuai."))
+            return
+
+        totals = rebuild_counters()
+        self.stdout.write(self.style.SUCCESS(f"{len(totals)} counter dibangun ulang."))
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from app import slotting
+from app.models import Rack, SKU
+
+
+class Command(BaseCommand):
+    help = "Cocokkan okupansi rak (Rack.occupied_by_sku / status) dengan SKU.shelf_location."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help="Perbaiki ketidaksesuaian dengan Rack.occupied_by_sku sebagai acuan (default: hanya laporkan).",
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            bad_status, bad_skus = slotting.occupancy_mismatches()
+            for rack_id in bad_status:
+                self.stdout.write(f"Rak {rack_id}: terisi tapi status bukan 'Used'")
+            for sku_id, stored, expected in bad_skus:
+                self.stdout.write(f"SKU {sku_id}: shelf_location={stored}, seharusnya={expected}")
+
+            if options['fix'] and (bad_status or bad_skus):
+                # Lewat save() (bukan queryset.update) agar signal berjalan: counter dashboard
+                # (sku.need_shelving), versi cache history SKU, index slot & peta rak
+                for rack in Rack.objects.filter(pk__in=bad_status):
+                    rack.status = 'Used'
+                    rack.save(update_fields=['status', 'updated_at'])
+                skus = SKU.objects.in_bulk([sku_id for sku_id, _, _ in bad_skus])
+                # Kosongkan dulu agar constraint unik shelf_location tidak bentrok saat pindah
+                for sku in skus.values():
+                    sku.shelf_location = None
+                    sku.save(update_fields=['shelf_location'])
+                for sku_id, _, expected in bad_skus:
+                    sku = skus[sku_id]
+                    if expected is not None:
+                        sku.shelf_location_id = expected
+                        sku.save(update_fields=['shelf_location'])
+                    else:
+                        sku.shelved_at = None
+                        sku.save(update_fields=['shelved_at'])
+
+        total = len(bad_status) + len(bad_skus)
+        if not total:
+            self.stdout.write(self.style.SUCCESS("Semua okupansi rak sesuai."))
+        elif options['fix']:
+            self.stdout.write(self.style.SUCCESS(f"{total} ketidaksesuaian diperbaiki."))
+        else:
+            self.stdout.write(self.style.WARNING(f"{total} ketidaksesuaian ditemukan."))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+
+from app.models import SalesOrder
+
+
+class Command(BaseCommand):
+    help = "Cocokkan SalesOrder.total_paid dengan jumlah Payment.amount per order."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help="Perbaiki total_paid yang tidak sesuai (default: hanya laporkan).",
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            mismatched = list(
+                SalesOrder.objects.with_payments_sum()
+                .exclude(total_paid=F('payments_sum'))
+                .values_list('id', 'total_paid', 'payments_sum')
+            )
+            for order_id, stored, expected in mismatched:
+                self.stdout.write(f"Order {order_id}: tersimpan={stored}, seharusnya={expected}")
+                if options['fix']:
+                    SalesOrder.objects.filter(pk=order_id).update(total_paid=expected)
+
+        if not mismatched:
+            self.stdout.write(self.style.SUCCESS("Semua total_paid sesuai."))
+        elif options['fix']:
+            self.stdout.write(self.style.SUCCESS(f"{len(mismatched)} order diperbaiki."))
+        else:
+            self.stdout.write(self.style.WARNING(f"{len(mismatched)} order tidak sesuai."))
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.8 on 2026-10-17 04:13
+
+from django.db import migrations, models
+
+
+def fill_counters(apps, schema_editor):
+    """
+    Isi awal counter dashboard dari data yang sudah ada. Aturan key disalin
+    dari counters.DASHBOARD_KEYS (bukan import), supaya perubahan counters.py
+    tidak mengubah hasil atau merusak migration lama.
+    """
+    SKU = apps.get_model('app', 'SKU')
+    PurchaseOrder = apps.get_model('app', 'PurchaseOrder')
+    totals = {f'sku.status.{status}': SKU.objects.filter(status=status).count() for status in ('Ready', 'Shop')}
+    totals['po.status.Pending_Approval'] = PurchaseOrder.objects.filter(status='Pending_Approval').count()
+
+    DashboardCounter = apps.get_model('app', 'DashboardCounter')
+    DashboardCounter.objects.bulk_create(
+        DashboardCounter(key=key, value=value) for key, value in totals.items() if value
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0029_remove_purchaseorder_suggested_rack'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(help_text="cth: 'sku.status.Ready', 'po.status.Pending_Approval'", max_length=100, unique=True)),
+                ('value', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-17 04:15
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0030_dashboardcounter'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='purchaseorder',
+            index=models.Index(fields=['-created_at', '-id'], name='po_created_at_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sku',
+            index=models.Index(fields=['assigned_technician', '-created_at', '-id'], name='sku_tech_created_at_id_idx'),
+        ),
+    ]
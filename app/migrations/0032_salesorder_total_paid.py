@@ -0,0 +1,30 @@
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum
+
+
+def fill_total_paid(apps, schema_editor):
+    """Isi total_paid dari jumlah Payment yang sudah ada."""
+    SalesOrder = apps.get_model('app', 'SalesOrder')
+    Payment = apps.get_model('app', 'Payment')
+    payments_sum = Payment.objects.filter(
+        sales_order=OuterRef('pk')
+    ).order_by().values('sales_order').annotate(total=Sum('amount')).values('total')
+    SalesOrder.objects.filter(payments__isnull=False).distinct().update(
+        total_paid=Subquery(payments_sum)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0031_history_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='salesorder',
+            name='total_paid',
+            field=models.DecimalField(decimal_places=0, default=0, help_text='Jumlah semua Payment.amount. Diperbarui otomatis saat Payment dibuat/diubah/dihapus (lihat signals.py)', max_digits=10),
+        ),
+        migrations.RunPython(fill_total_paid, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.8 on 2026-10-17 04:22
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0032_salesorder_total_paid'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SKUEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(choices=[('Receiving', 'Penerimaan Barang'), ('QC Submit', 'QC Disubmit'), ('QC Approve', 'QC Disetujui'), ('QC Reject', 'QC Ditolak'), ('Spare Part', 'Spare Part'), ('Install Submit', 'Instalasi Disubmit'), ('Install Approve', 'Instalasi Disetujui'), ('Install Reject', 'Instalasi Ditolak'), ('Shelving', 'Penempatan Rak'), ('Movement', 'Proses Pengiriman'), ('Sales Order', 'Sales Order Dibuat'), ('Payment', 'Pembayaran Diterima'), ('Shipping', 'Pengiriman Diproses'), ('Completed', 'Selesai (Completed)')], max_length=30)),
+                ('actor_name', models.CharField(help_text="Nama yang ditampilkan (username, 'Lead Tech', nama customer, dll.)", max_length=255)),
+                ('details', models.TextField(blank=True)),
+                ('occurred_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('actor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sku_events', to=settings.AUTH_USER_MODEL)),
+                ('sku', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='app.sku')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['sku', '-occurred_at', '-id'], name='skuevent_sku_occurred_idx'), models.Index(fields=['event_type', 'occurred_at'], name='skuevent_type_occurred_idx')],
+            },
+        ),
+    ]
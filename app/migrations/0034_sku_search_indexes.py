@@ -0,0 +1,42 @@
+from django.db import migrations
+
+# Index untuk pencarian SKU di sidebar (queries.search_skus, lookup istartswith).
+# PostgreSQL: istartswith -> UPPER(col) LIKE UPPER('x%'), dilayani GIN pg_trgm.
+# SQLite: istartswith -> col LIKE 'x%' (case-insensitive), butuh index NOCASE.
+SEARCH_COLUMNS = ['sku_id', 'name']
+
+
+def create_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for column in SEARCH_COLUMNS:
+            schema_editor.execute(
+                f'CREATE INDEX IF NOT EXISTS app_sku_{column}_trgm_idx '
+                f'ON app_sku USING gin (UPPER({column}) gin_trgm_ops)'
+            )
+    elif vendor == 'sqlite':
+        for column in SEARCH_COLUMNS:
+            schema_editor.execute(
+                f'CREATE INDEX IF NOT EXISTS app_sku_{column}_nocase_idx '
+                f'ON app_sku ({column} COLLATE NOCASE)'
+            )
+
+
+def drop_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    suffix = {'postgresql': 'trgm', 'sqlite': 'nocase'}.get(vendor)
+    if suffix:
+        for column in SEARCH_COLUMNS:
+            schema_editor.execute(f'DROP INDEX IF EXISTS app_sku_{column}_{suffix}_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0033_skuevent'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
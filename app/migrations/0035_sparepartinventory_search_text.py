@@ -0,0 +1,68 @@
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+# Salinan normalisasi app/search.py saat migration ini dibuat (bukan import),
+# supaya perubahan search.py tidak mengubah atau merusak migration lama
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+
+
+def normalize_text(value):
+    if not value:
+        return ''
+    value = unicodedata.normalize('NFKD', value)
+    value = ''.join(char for char in value if not unicodedata.combining(char))
+    return _NON_ALNUM.sub(' ', value.lower()).strip()
+
+
+def build_search_text(*values):
+    tokens = []
+    for value in values:
+        words = normalize_text(value).split()
+        if len(words) > 1:
+            words.append(''.join(words))
+        for token in words:
+            if token not in tokens:
+                tokens.append(token)
+    return f" {' '.join(tokens)} " if tokens else ''
+
+
+def fill_search_text(apps, schema_editor):
+    SparePartInventory = apps.get_model('app', 'SparePartInventory')
+    parts = list(SparePartInventory.objects.only('id', 'part_name', 'part_sku'))
+    for part in parts:
+        part.search_text = build_search_text(part.part_name, part.part_sku)
+    SparePartInventory.objects.bulk_update(parts, ['search_text'], batch_size=500)
+
+
+def create_trigram_index(apps, schema_editor):
+    # LIKE '% term%' pada search_text dilayani GIN pg_trgm (PostgreSQL saja)
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS app_sparepart_search_trgm_idx '
+            'ON app_sparepartinventory USING gin (search_text gin_trgm_ops)'
+        )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS app_sparepart_search_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0034_sku_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sparepartinventory',
+            name='search_text',
+            field=models.TextField(blank=True, default='', editable=False, help_text='Token nama & SKU yang sudah dinormalisasi (lihat search.py), diisi otomatis saat save()'),
+        ),
+        migrations.RunPython(fill_search_text, migrations.RunPython.noop),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-17 04:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0035_sparepartinventory_search_text'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='rack',
+            index=models.Index(condition=models.Q(('status', 'Available')), fields=['rack_location'], name='rack_available_idx'),
+        ),
+    ]
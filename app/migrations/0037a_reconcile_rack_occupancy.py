@@ -0,0 +1,36 @@
+from django.db import migrations, models
+
+
+def reconcile_occupancy(apps, schema_editor):
+    """
+    Samakan kedua sisi relasi sebelum constraint dipasang, dengan
+    Rack.occupied_by_sku (OneToOne) sebagai acuan: rak terisi -> 'Used',
+    SKU.shelf_location -> rak yang benar-benar ditempatinya (atau kosong).
+    """
+    Rack = apps.get_model('app', 'Rack')
+    SKU = apps.get_model('app', 'SKU')
+    Rack.objects.filter(occupied_by_sku__isnull=False).exclude(status='Used').update(status='Used')
+
+    expected = dict(Rack.objects.filter(occupied_by_sku__isnull=False).values_list('occupied_by_sku', 'pk'))
+    to_update = []
+    for sku in SKU.objects.filter(models.Q(shelf_location__isnull=False) | models.Q(pk__in=expected)).only('pk', 'shelf_location', 'shelved_at'):
+        rack_id = expected.get(sku.pk)
+        if sku.shelf_location_id != rack_id:
+            sku.shelf_location_id = rack_id
+            if rack_id is None:
+                sku.shelved_at = None
+            to_update.append(sku)
+    SKU.objects.bulk_update(to_update, ['shelf_location', 'shelved_at'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+    # Perbaikan data terpisah dari constraint: di PostgreSQL update FK shelf_location
+    # meninggalkan trigger event tertunda, CREATE INDEX di transaksi yang sama gagal
+
+    dependencies = [
+        ('app', '0036_rack_available_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(reconcile_occupancy, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0037a_reconcile_rack_occupancy'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='rack',
+            constraint=models.CheckConstraint(condition=models.Q(('occupied_by_sku__isnull', True), ('status', 'Used'), _connector='OR'), name='rack_occupied_is_used'),
+        ),
+        migrations.AddConstraint(
+            model_name='sku',
+            constraint=models.UniqueConstraint(condition=models.Q(('shelf_location__isnull', False)), fields=('shelf_location',), name='sku_unique_shelf_location'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-17 04:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0037b_rack_occupancy_constraints'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='rack',
+            index=models.Index(fields=['updated_at'], name='rack_updated_at_idx'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.8 on 2026-10-17 04:48
+
+import re
+
+from django.db import migrations, models
+
+# Salinan app/locations.parse_rack_location saat migration ini dibuat (bukan import)
+_ZONE_PARTS = re.compile(r'^([A-Za-z]*)(\d*)')
+
+
+def parse_rack_location(location):
+    location = location or ''
+    zone = location.split('-')[0]
+    row = (_ZONE_PARTS.match(zone).group(1) or zone[:1]).upper()
+    tail = location.rsplit('-', 1)[1] if '-' in location else ''
+    return zone, row, int(tail) if tail.isdecimal() else None
+
+
+def backfill_layout(apps, schema_editor):
+    Rack = apps.get_model('app', 'Rack')
+    racks = list(Rack.objects.only('pk', 'rack_location'))
+    for rack in racks:
+        rack.zone, rack.row, rack.level = parse_rack_location(rack.rack_location)
+    Rack.objects.bulk_update(racks, ['zone', 'row', 'level'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0038_rack_updated_at_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rack',
+            name='level',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='rack',
+            name='row',
+            field=models.CharField(blank=True, editable=False, max_length=50),
+        ),
+        migrations.AddField(
+            model_name='rack',
+            name='zone',
+            field=models.CharField(blank=True, editable=False, max_length=50),
+        ),
+        migrations.RunPython(backfill_layout, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='rack',
+            index=models.Index(fields=['row', 'zone', 'level'], name='rack_layout_idx'),
+        ),
+    ]
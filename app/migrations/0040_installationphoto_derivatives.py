@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-17 05:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0039_rack_layout_columns'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='installationphoto',
+            name='preview',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='installation_photos/derived/'),
+        ),
+        migrations.AddField(
+            model_name='installationphoto',
+            name='thumbnail',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='installation_photos/derived/'),
+        ),
+    ]
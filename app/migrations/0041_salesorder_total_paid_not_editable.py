@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-17 05:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0040_installationphoto_derivatives'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='salesorder',
+            name='total_paid',
+            field=models.DecimalField(decimal_places=0, default=0, editable=False, help_text='Jumlah semua Payment.amount. Diperbarui otomatis saat Payment dibuat/diubah/dihapus (lihat signals.py)', max_digits=10),
+        ),
+    ]
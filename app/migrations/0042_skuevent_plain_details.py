@@ -0,0 +1,40 @@
+import re
+
+from django.db import migrations, models
+from django.utils.html import strip_tags
+
+LINK = re.compile(r"""<a\s[^>]*href=["']([^"']+)["'][^>]*>(.*?)</a>""", re.S)
+
+
+def split_html_details(apps, schema_editor):
+    """Ubah details HTML lama menjadi teks biasa + daftar link file bukti."""
+    SKUEvent = apps.get_model('app', 'SKUEvent')
+    changed = []
+    for event in SKUEvent.objects.filter(details__contains='<').only('details', 'links').iterator():
+        links = [
+            {'url': url, 'label': strip_tags(label).strip(' ()') or 'Lihat File', 'icon': 'bi-paperclip'}
+            for url, label in LINK.findall(event.details)
+        ]
+        event.details = ' '.join(strip_tags(LINK.sub('', event.details)).split())
+        event.links = links
+        changed.append(event)
+        if len(changed) >= 500:
+            SKUEvent.objects.bulk_update(changed, ['details', 'links'])
+            changed = []
+    SKUEvent.objects.bulk_update(changed, ['details', 'links'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0041_salesorder_total_paid_not_editable'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='skuevent',
+            name='links',
+            field=models.JSONField(blank=True, default=list, help_text="[{'url', 'label', 'icon'}] file bukti terkait event"),
+        ),
+        migrations.RunPython(split_html_details, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-17 05:37
+
+from django.db import migrations, models
+
+
+def mark_processed(apps, schema_editor):
+    """Foto yang sudah punya thumbnail dianggap sudah diproses dari gambar saat ini."""
+    InstallationPhoto = apps.get_model('app', 'InstallationPhoto')
+    InstallationPhoto.objects.exclude(thumbnail='').exclude(thumbnail__isnull=True).update(
+        derived_from=models.F('image'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0042_skuevent_plain_details'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='installationphoto',
+            name='derived_from',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(mark_processed, migrations.RunPython.noop),
+    ]
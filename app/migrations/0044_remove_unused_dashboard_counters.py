@@ -0,0 +1,20 @@
+from django.db import migrations
+
+
+def remove_unused_counters(apps, schema_editor):
+    """Counter yang tidak dibaca dashboard tidak lagi dipelihara (lihat counters.DASHBOARD_KEYS)."""
+    DashboardCounter = apps.get_model('app', 'DashboardCounter')
+    DashboardCounter.objects.exclude(
+        key__in=['sku.status.Ready', 'sku.status.Shop', 'po.status.Pending_Approval'],
+    ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0043_installationphoto_derived_from'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_unused_counters, migrations.RunPython.noop),
+    ]
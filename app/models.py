@@ -1,9 +1,13 @@
 from django.db import models
 from django.contrib.auth.models import User, Group
 from django.utils import timezone
-from django.db.models import Sum
+from django.db.models import DecimalField, F, Sum, Value
+from django.db.models.functions import Coalesce
 from django.urls import reverse
 
+from .locations import parse_rack_location
+from .search import build_search_text
+
 # 1. Model untuk Proses Receiving
 class PurchaseOrder(models.Model):
     STATUS_CHOICES = [
@@ -39,6 +43,13 @@ class PurchaseOrder(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, null=True, blank=True)
     managed_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # Keyset pagination riwayat PO (created_at DESC, id DESC); baris created_at NULL
+            # diambil dengan query terpisah (lihat pagination.keyset_paginate)
+            models.Index(fields=['-created_at', '-id'], name='po_created_at_id_idx'),
+        ]
+
     def __str__(self):
         return self.po_number
 class SKUDetailPO(models.Model):
@@ -133,13 +144,49 @@ class Rack(models.Model):
     # Kapan status terakhir diubah
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Hasil parse rack_location (lihat locations.py), diisi otomatis saat save()
+    zone = models.CharField(max_length=50, blank=True, editable=False)
+    row = models.CharField(max_length=50, blank=True, editable=False)
+    level = models.PositiveIntegerField(null=True, blank=True, editable=False)
+
+    LAYOUT_FIELDS = ('zone', 'row', 'level')
+
     def __str__(self):
         return self.rack_location
 
+    def fill_layout(self):
+        self.zone, self.row, self.level = parse_rack_location(self.rack_location)
+
+    def save(self, *args, **kwargs):
+        self.fill_layout()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'rack_location' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | set(self.LAYOUT_FIELDS)
+        super().save(*args, **kwargs)
+
     class Meta:
         verbose_name = "Slot Rak Gudang"
         verbose_name_plural = "Slot Rak Gudang"
         ordering = ['rack_location']
+        indexes = [
+            # Index slot kosong untuk slotting.FreeSlotIndex (partial index)
+            models.Index(
+                fields=['rack_location'],
+                condition=models.Q(status='Available'),
+                name='rack_available_idx',
+            ),
+            # Delta peta rak (rack_map.changes): updated_at > cursor
+            models.Index(fields=['updated_at'], name='rack_updated_at_idx'),
+            # Layout rak (rack_map.get_layout): urut lorong -> zona -> level
+            models.Index(fields=['row', 'zone', 'level'], name='rack_layout_idx'),
+        ]
+        constraints = [
+            # Rak yang ditempati SKU harus berstatus Used (lihat slotting.place_sku)
+            models.CheckConstraint(
+                condition=models.Q(occupied_by_sku__isnull=True) | models.Q(status='Used'),
+                name='rack_occupied_is_used',
+            ),
+        ]
 
 class SKU(models.Model):
     STATUS_CHOICES = [
@@ -190,6 +237,20 @@ class SKU(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, null=True, blank=True)
     shelved_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # Keyset pagination history teknisi (created_at DESC, id DESC); blok NULL terpisah
+            models.Index(fields=['assigned_technician', '-created_at', '-id'], name='sku_tech_created_at_id_idx'),
+        ]
+        constraints = [
+            # Satu rak hanya untuk satu SKU (sisi SKU dari Rack.occupied_by_sku)
+            models.UniqueConstraint(
+                fields=['shelf_location'],
+                condition=models.Q(shelf_location__isnull=False),
+                name='sku_unique_shelf_location',
+            ),
+        ]
+
     def __str__(self):
         return f"{self.sku_id} - {self.name}"
     def get_absolute_url(self):
@@ -227,6 +288,11 @@ class InstallationPhoto(models.Model):
     ]
     qc_form = models.ForeignKey(QCForm, on_delete=models.CASCADE, related_name='photos')
     image = models.ImageField(upload_to='installation_photos/')
+    # Turunan WebP tanpa EXIF, diisi di background oleh images.py
+    preview = models.ImageField(upload_to='installation_photos/derived/', blank=True, null=True, editable=False)
+    thumbnail = models.ImageField(upload_to='installation_photos/derived/', blank=True, null=True, editable=False)
+    # image.name yang turunannya sudah dibuat (atau dilewati karena bukan gambar)
+    derived_from = models.CharField(max_length=255, blank=True, default='', editable=False)
     photo_type = models.CharField(max_length=10, choices=PHOTO_TYPE_CHOICES)
     remarks = models.CharField(max_length=255, blank=True, null=True, help_text="Keterangan foto")
     created_at = models.DateTimeField(auto_now_add=True)
@@ -365,9 +431,22 @@ class SparePartInventory(models.Model):
     
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Out_Of_Stock')
     origin = models.CharField(max_length=10, choices=ORIGIN_CHOICES, default='MANUAL')
+    search_text = models.TextField(
+        blank=True,
+        default='',
+        editable=False,
+        help_text="Token nama & SKU yang sudah dinormalisasi (lihat search.py), diisi otomatis saat save()",
+    )
 
     def __str__(self):
         return f"{self.part_name} (Stok: {self.quantity_in_stock})"
+
+    def save(self, *args, **kwargs):
+        self.search_text = build_search_text(self.part_name, self.part_sku)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and ({'part_name', 'part_sku'} & set(update_fields)):
+            kwargs['update_fields'] = set(update_fields) | {'search_text'}
+        super().save(*args, **kwargs)
     def has_pending_adjustment(self):
         return self.adjustments.filter(status='Pending').exists()
 
@@ -507,6 +586,22 @@ class Quotation(models.Model):
         """Menghitung total harga quotation (Subtotal - Diskon)."""
         return self.get_subtotal - self.extra_discount
 
+class SalesOrderQuerySet(models.QuerySet):
+    def with_payment_totals(self):
+        """
+        Anotasi `remaining_balance` dari kolom `total_paid` (tanpa join ke Payment),
+        supaya list order tidak menghitung sisa tagihan per baris.
+        """
+        return self.annotate(remaining_balance=F('price') - F('total_paid'))
+
+    def with_payments_sum(self):
+        """Anotasi `payments_sum` = SUM(Payment.amount), untuk rekonsiliasi `total_paid`."""
+        money = DecimalField(max_digits=10, decimal_places=0)
+        return self.annotate(
+            payments_sum=Coalesce(Sum('payments__amount'), Value(0), output_field=money),
+        )
+
+
 class SalesOrder(models.Model):
     STATUS_CHOICES = [
         ('Pending', 'Pending Payment'), # Baru dibuat
@@ -531,6 +626,13 @@ class SalesOrder(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=0, help_text="Harga final penjualan")
     
     # 3. Data Pembayaran (dikelola oleh model Payment)
+    total_paid = models.DecimalField(
+        max_digits=10,
+        decimal_places=0,
+        default=0,
+        editable=False,
+        help_text="Jumlah semua Payment.amount. Diperbarui otomatis saat Payment dibuat/diubah/dihapus (lihat signals.py)",
+    )
     
     # 4. Data Pengiriman
     shipping_type = models.CharField(max_length=100, blank=True, null=True, help_text="Contoh: JNE, J&T, Diambil Sendiri")
@@ -550,20 +652,31 @@ class SalesOrder(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = SalesOrderQuerySet.as_manager()
+
     def __str__(self):
         return f"Order {self.id} - {self.customer_name} ({self.sku.sku_id})"
 
     def get_total_paid(self):
-        """Menghitung total pembayaran yang sudah masuk."""
-        total = self.payments.aggregate(total=Sum('amount'))['total']
-        return total or 0
+        """Total pembayaran yang sudah masuk (kolom denormalisasi, tanpa query)."""
+        return self.total_paid
 
     def get_remaining_balance(self):
         """Menghitung sisa tagihan."""
+        if 'remaining_balance' in self.__dict__:
+            return self.remaining_balance
         return self.price - self.get_total_paid()
 
+    @classmethod
+    def add_to_total_paid(cls, order_id, amount):
+        """Tambah/kurangi `total_paid` secara atomik di database (UPDATE ... SET total_paid = total_paid + x)."""
+        if amount:
+            cls.objects.filter(pk=order_id).update(total_paid=F('total_paid') + amount)
+
     def update_status_based_on_payment(self):
         """Logika untuk update status order DAN SKU."""
+        # total_paid di-increment lewat F(), jadi nilai di memori bisa basi
+        self.refresh_from_db(fields=['total_paid'])
         total_paid = self.get_total_paid()
         
         if total_paid >= self.price:
@@ -577,7 +690,7 @@ class SalesOrder(models.Model):
             self.status = 'Pending'
             self.sku.status = 'Shop' # Kembali jadi Ready Store
             
-        self.save()
+        self.save(update_fields=['status', 'updated_at'])
         self.sku.save()
 
 class Payment(models.Model):
@@ -592,3 +705,64 @@ class Payment(models.Model):
 
 
 
+
+class DashboardCounter(models.Model):
+    """
+    Ringkasan hitungan untuk dashboard (SKU Ready / di Shop, PO menunggu
+    approval; lihat counters.DASHBOARD_KEYS). Diperbarui secara incremental oleh signal
+    (lihat counters.py) dan bisa dibangun ulang dengan command
+    `rebuild_dashboard_counters`.
+    """
+    key = models.CharField(max_length=100, unique=True, help_text="cth: 'sku.status.Ready', 'po.status.Pending_Approval'")
+    value = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.key} = {self.value}"
+
+
+class SKUEvent(models.Model):
+    """
+    Log append-only perjalanan SKU. Setiap view yang mengubah status SKU
+    menulis satu baris di dalam transaksinya (lihat timeline.record_sku_event).
+    Dipakai sebagai sumber history SKU dan laporan throughput / cycle time.
+    """
+    EVENT_TYPE_CHOICES = [
+        ('Receiving', 'Penerimaan Barang'),
+        ('QC Submit', 'QC Disubmit'),
+        ('QC Approve', 'QC Disetujui'),
+        ('QC Reject', 'QC Ditolak'),
+        ('Spare Part', 'Spare Part'),
+        ('Install Submit', 'Instalasi Disubmit'),
+        ('Install Approve', 'Instalasi Disetujui'),
+        ('Install Reject', 'Instalasi Ditolak'),
+        ('Shelving', 'Penempatan Rak'),
+        ('Movement', 'Proses Pengiriman'),
+        ('Sales Order', 'Sales Order Dibuat'),
+        ('Payment', 'Pembayaran Diterima'),
+        ('Shipping', 'Pengiriman Diproses'),
+        ('Completed', 'Selesai (Completed)'),
+    ]
+    sku = models.ForeignKey(SKU, on_delete=models.CASCADE, related_name='events')
+    event_type = models.CharField(max_length=30, choices=EVENT_TYPE_CHOICES)
+    actor = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='sku_events',
+    )
+    actor_name = models.CharField(max_length=255, help_text="Nama yang ditampilkan (username, 'Lead Tech', nama customer, dll.)")
+    # Teks biasa (di-escape saat render); link file bukti terpisah sebagai data
+    details = models.TextField(blank=True)
+    links = models.JSONField(default=list, blank=True, help_text="[{'url', 'label', 'icon'}] file bukti terkait event")
+    occurred_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['sku', '-occurred_at', '-id'], name='skuevent_sku_occurred_idx'),
+            models.Index(fields=['event_type', 'occurred_at'], name='skuevent_type_occurred_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.sku_id} {self.event_type} @ {self.occurred_at}"
@@ -0,0 +1,99 @@
+"""
+Keyset (seek) pagination untuk list history yang terus bertambah.
+
+Urutan selalu `<field> DESC, id DESC` (NULL di akhir, diambil terpisah). Halaman berikutnya
+diambil dengan kondisi "lebih kecil dari baris terakhir" alih-alih OFFSET,
+sehingga biaya per halaman tetap konstan berapapun panjang history-nya.
+"""
+import base64
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+DEFAULT_PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+
+
+class KeysetPage:
+    """Satu halaman hasil keyset_paginate()."""
+
+    def __init__(self, items, next_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def encode_cursor(value, pk):
+    raw = json.dumps([value.isoformat() if value is not None else None, pk])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Kembalikan (value, pk) atau None jika cursor kosong/tidak valid."""
+    if not cursor:
+        return None
+    try:
+        value, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        value = parse_datetime(value) if value is not None else None
+        return value, int(pk)
+    except (ValueError, TypeError):
+        return None
+
+
+def get_page_size(request, default=DEFAULT_PAGE_SIZE):
+    try:
+        page_size = int(request.GET.get('page_size', default))
+    except (TypeError, ValueError):
+        page_size = default
+    return max(1, min(page_size, MAX_PAGE_SIZE))
+
+
+def keyset_paginate(queryset, cursor=None, page_size=DEFAULT_PAGE_SIZE, field='created_at'):
+    """
+    Ambil satu halaman dari queryset berurutan `field DESC, id DESC`.
+
+    `cursor` adalah nilai `next_cursor` dari halaman sebelumnya (string).
+
+    Baris dengan `field` terisi dan blok NULL (data lama) diambil dengan
+    query terpisah: masing-masing berupa satu range scan pada index biasa
+    `(-field, -id)` tanpa OR ke `IS NULL`. Blok NULL hanya diquery jika
+    halaman belum penuh (dan field memang nullable).
+    """
+    nullable = queryset.model._meta.get_field(field).null
+    limit = page_size + 1
+    rows = []
+
+    position = decode_cursor(cursor)
+    if position is None or position[0] is not None:
+        values = queryset.filter(**{f'{field}__isnull': False}).order_by(f'-{field}', '-id')
+        if position is not None:
+            value, pk = position
+            # `field <= value` sebagai batas range index, sisanya memutus seri nilai sama
+            values = values.filter(**{f'{field}__lte': value}).filter(
+                Q(**{f'{field}__lt': value}) | Q(**{field: value, 'id__lt': pk})
+            )
+        rows = list(values[:limit])
+
+    if nullable and len(rows) < limit:
+        # Blok NULL (paling akhir), urut id DESC
+        nulls = queryset.filter(**{f'{field}__isnull': True}).order_by('-id')
+        if position is not None and position[0] is None:
+            nulls = nulls.filter(id__lt=position[1])
+        rows.extend(nulls[:limit - len(rows)])
+
+    items = rows[:page_size]
+    next_cursor = None
+    if len(rows) > page_size:
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, field), last.pk)
+    return KeysetPage(items, next_cursor)
@@ -0,0 +1,232 @@
+"""
+Import PO massal dari file CSV / XLSX.
+
+Satu baris file = satu SKUDetailPO. Semua baris divalidasi dalam satu kali
+jalan (tanpa query per baris) dan setiap kesalahan dicatat per baris, sehingga
+user bisa memperbaiki file sekaligus. Jika tidak ada error, PO dan seluruh
+detailnya ditulis dalam satu transaksi dengan bulk_create.
+
+Kolom wajib: machine_sku_id, machine_name, color, po_price. Kolom opsional:
+year. Nama kolom tidak case-sensitive dan boleh memakai label Indonesia
+(lihat COLUMN_ALIASES).
+"""
+import csv
+import io
+import re
+import zipfile
+from decimal import Decimal
+from xml.etree import ElementTree
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .models import PurchaseOrder, SKU, SKUDetailPO
+
+FIELDS = ('machine_sku_id', 'machine_name', 'color', 'year', 'po_price')
+REQUIRED_FIELDS = ('machine_sku_id', 'machine_name', 'color', 'po_price')
+
+COLUMN_ALIASES = {
+    'sku id mesin': 'machine_sku_id',
+    'sku id': 'machine_sku_id',
+    'nama mesin': 'machine_name',
+    'warna': 'color',
+    'tahun': 'year',
+    'harga po': 'po_price',
+    'harga po per unit': 'po_price',
+}
+
+MAX_ROWS = 5000
+
+_XLSX_NS = {'main': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+_CELL_COLUMN = re.compile(r'[A-Z]+')
+
+
+class ImportFileError(ValueError):
+    """File tidak bisa dibaca (format / header salah)."""
+
+
+def _normalize_header(value):
+    key = ' '.join(str(value or '').replace('*', ' ').replace('_', ' ').lower().split())
+    key = key.split('(')[0].strip()
+    return COLUMN_ALIASES.get(key, key.replace(' ', '_'))
+
+
+def _read_csv(uploaded_file):
+    raw = uploaded_file.read()
+    try:
+        text = raw.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        text = raw.decode('latin-1')
+    try:
+        dialect = csv.Sniffer().sniff(text[:4096], delimiters=',;\t')
+    except csv.Error:
+        dialect = csv.excel
+    return list(csv.reader(io.StringIO(text), dialect))
+
+
+def _xlsx_column_index(ref):
+    index = 0
+    for char in _CELL_COLUMN.match(ref).group():
+        index = index * 26 + ord(char) - ord('A') + 1
+    return index - 1
+
+
+def _read_xlsx(uploaded_file):
+    """Baca sheet pertama XLSX dengan zipfile + ElementTree (tanpa openpyxl)."""
+    try:
+        workbook = zipfile.ZipFile(uploaded_file)
+        names = set(workbook.namelist())
+        shared = []
+        if 'xl/sharedStrings.xml' in names:
+            root = ElementTree.fromstring(workbook.read('xl/sharedStrings.xml'))
+            for item in root.iterfind('main:si', _XLSX_NS):
+                shared.append(''.join(node.text or '' for node in item.iter(f"{{{_XLSX_NS['main']}}}t")))
+        sheet_name = 'xl/worksheets/sheet1.xml'
+        if sheet_name not in names:
+            sheets = sorted(name for name in names if name.startswith('xl/worksheets/sheet'))
+            if not sheets:
+                raise ImportFileError("File XLSX tidak memiliki sheet.")
+            sheet_name = sheets[0]
+        sheet = ElementTree.fromstring(workbook.read(sheet_name))
+        return _sheet_rows(sheet, shared)
+    except ImportFileError:
+        raise
+    except (zipfile.BadZipFile, ElementTree.ParseError, KeyError, IndexError, ValueError, AttributeError):
+        # AttributeError/IndexError/ValueError: referensi sel (r="1A") atau index shared string rusak
+        raise ImportFileError("File XLSX tidak valid.")
+
+
+def _sheet_rows(sheet, shared):
+    rows = []
+    for row in sheet.iterfind('.//main:sheetData/main:row', _XLSX_NS):
+        values = []
+        for cell in row.iterfind('main:c', _XLSX_NS):
+            cell_type = cell.get('t')
+            if cell_type == 'inlineStr':
+                value = ''.join(node.text or '' for node in cell.iter(f"{{{_XLSX_NS['main']}}}t"))
+            else:
+                node = cell.find('main:v', _XLSX_NS)
+                value = node.text if node is not None and node.text is not None else ''
+                if cell_type == 's' and value:
+                    value = shared[int(value)]
+                elif not cell_type or cell_type == 'n':
+                    # Angka bulat di Excel sering tersimpan sebagai '2020.0'
+                    value = value[:-2] if value.endswith('.0') else value
+            ref = cell.get('r')
+            index = _xlsx_column_index(ref) if ref else len(values)
+            values.extend([''] * (index - len(values)))
+            values.append(value)
+        rows.append(values)
+    return rows
+
+
+def read_rows(uploaded_file):
+    """
+    Baca file upload menjadi list (nomor_baris, dict field -> teks).
+    Nomor baris mengikuti file (header = baris 1). Baris kosong dilewati.
+    """
+    name = (uploaded_file.name or '').lower()
+    if name.endswith('.xlsx'):
+        table = _read_xlsx(uploaded_file)
+    elif name.endswith('.csv') or name.endswith('.txt'):
+        table = _read_csv(uploaded_file)
+    else:
+        raise ImportFileError("Format file harus .csv atau .xlsx.")
+
+    if not table:
+        raise ImportFileError("File kosong.")
+    header = [_normalize_header(value) for value in table[0]]
+    missing = [field for field in REQUIRED_FIELDS if field not in header]
+    if missing:
+        raise ImportFileError(f"Kolom wajib tidak ditemukan: {', '.join(missing)}.")
+    positions = {field: header.index(field) for field in FIELDS if field in header}
+
+    rows = []
+    for line, values in enumerate(table[1:], start=2):
+        if not any(str(value).strip() for value in values):
+            continue
+        rows.append((line, {
+            field: str(values[position]).strip() if position < len(values) else ''
+            for field, position in positions.items()
+        }))
+    if not rows:
+        raise ImportFileError("File tidak berisi baris data.")
+    if len(rows) > MAX_ROWS:
+        raise ImportFileError(f"Maksimal {MAX_ROWS} baris per file.")
+    return rows
+
+
+def validate_rows(rows):
+    """
+    Validasi semua baris memakai aturan field model SKUDetailPO; machine_sku_id
+    tidak boleh duplikat di file maupun sudah dipakai SKU / detail PO lain.
+    Return (details, total_price, errors): `details` adalah instance belum
+    disimpan, `total_price` Decimal, `errors` list (nomor_baris, pesan).
+    """
+    model_fields = {name: SKUDetailPO._meta.get_field(name) for name in FIELDS}
+    details, errors = [], []
+    total_price = Decimal(0)
+    seen_sku_ids = {}
+    # SKU ID yang sudah dipakai (SKU diterima / detail PO lain): satu query untuk semua baris
+    sku_ids = {data.get('machine_sku_id') for _, data in rows} - {'', None}
+    existing_sku_ids = set(
+        SKU.objects.filter(sku_id__in=sku_ids).values_list('sku_id', flat=True).union(
+            SKUDetailPO.objects.filter(machine_sku_id__in=sku_ids).values_list('machine_sku_id', flat=True)
+        )
+    ) if sku_ids else set()
+
+    for line, data in rows:
+        cleaned, row_errors = {}, []
+        for name, field in model_fields.items():
+            value = data.get(name, '')
+            if value == '':
+                if name in REQUIRED_FIELDS:
+                    row_errors.append(f"{name}: wajib diisi.")
+                else:
+                    cleaned[name] = None
+                continue
+            if name == 'po_price':
+                value = value.replace('Rp', '').replace(' ', '')
+            try:
+                cleaned[name] = field.clean(value, None)
+            except ValidationError as e:
+                row_errors.append(f"{name}: {' '.join(e.messages)}")
+
+        sku_id = cleaned.get('machine_sku_id')
+        if sku_id:
+            if sku_id in existing_sku_ids:
+                row_errors.append("machine_sku_id: sudah terdaftar di SKU atau PO lain.")
+            elif sku_id in seen_sku_ids:
+                row_errors.append(f"machine_sku_id: duplikat dengan baris {seen_sku_ids[sku_id]}.")
+            else:
+                seen_sku_ids[sku_id] = line
+        if cleaned.get('po_price') is not None and cleaned['po_price'] < 0:
+            row_errors.append("po_price: tidak boleh negatif.")
+
+        if row_errors:
+            errors.extend((line, message) for message in row_errors)
+            continue
+        details.append(SKUDetailPO(**cleaned))
+        total_price += cleaned['po_price']
+
+    return details, total_price, errors
+
+
+def create_purchase_order(po_number, details, total_price):
+    """Simpan PO (Pending_Approval) + semua detailnya dalam satu transaksi."""
+    try:
+        PurchaseOrder._meta.get_field('total_po_price').clean(total_price, None)
+    except ValidationError:
+        raise ImportFileError("Total harga PO melebihi batas yang bisa disimpan.")
+
+    with transaction.atomic():
+        po = PurchaseOrder.objects.create(
+            po_number=po_number,
+            expected_sku_count=len(details),
+            total_po_price=total_price,
+            status='Pending_Approval',
+        )
+        for detail in details:
+            detail.purchase_order = po
+        SKUDetailPO.objects.bulk_create(details, batch_size=500)
+    return po
@@ -0,0 +1,174 @@
+"""
+Query-spec per dashboard.
+
+Setiap fungsi mengembalikan queryset untuk satu list di dashboard beserta
+join yang dibutuhkan template-nya (select_related / prefetch_related),
+sehingga jumlah query per halaman tetap, tidak bergantung jumlah baris.
+Jika template menambah akses relasi baru (cth. `part.qc_form.sku.sku_id`),
+tambahkan join-nya di sini.
+"""
+from django.db.models import Case, IntegerField, Q, Value, When
+
+from .models import (
+    MovementRequest, PurchaseOrder, PurchasingNotification, QCForm, Quotation,
+    SalesOrder, SKU, SparePartInventory, SparePartRequest, StockAdjustment,
+)
+
+
+# --- Sidebar (sidebar_sku_status.html & sidebar_ready_sku_list.html) ---
+def sidebar_skus_under_tech():
+    # sku.assigned_technician.username
+    return SKU.objects.filter(
+        assigned_technician__isnull=False
+    ).select_related('assigned_technician').order_by('assigned_technician__username')
+
+def search_skus(term):
+    """
+    Pencarian prefix SKU di sidebar berdasarkan sku_id / nama (istartswith).
+    Dilayani index GIN pg_trgm atas UPPER(kolom) di PostgreSQL, atau index
+    COLLATE NOCASE di SQLite (lihat migrasi 0034_sku_search_indexes).
+    """
+    return sidebar_skus_under_tech().filter(
+        Q(sku_id__istartswith=term) | Q(name__istartswith=term)
+    ).order_by('sku_id')
+
+def ready_skus():
+    return SKU.objects.filter(status='Ready').order_by('name')
+
+def shop_skus():
+    return SKU.objects.filter(status='Shop').order_by('name')
+
+
+# --- Warehouse Manager (wm_dashboard.html) ---
+def wm_pending_part_requests():
+    # part.qc_form.sku.sku_id, part.qc_form.technician.username
+    return SparePartRequest.objects.filter(
+        status='Pending'
+    ).select_related('qc_form__sku', 'qc_form__technician')
+
+def wm_skus_need_shelving():
+    return SKU.objects.filter(status='Ready', shelf_location__isnull=True)
+
+
+# --- Technician (tech_dashboard.html) ---
+def tech_current_skus(user):
+    # sku.po_number.po_number
+    return SKU.objects.filter(
+        assigned_technician=user,
+        status='QC'
+    ).select_related('po_number')
+
+def tech_skus_to_install(user):
+    # sku.qc_form.final_lead_comments, sku.qc_form.id
+    return SKU.objects.filter(
+        assigned_technician=user,
+        status='AWAITING_INSTALL'
+    ).select_related('qc_form')
+
+def tech_history(user):
+    """SKU milik teknisi yang sudah lewat tahap QC/instalasi."""
+    return SKU.objects.filter(
+        assigned_technician=user
+    ).exclude(
+        status__in=['QC', 'QC_PENDING', 'AWAITING_INSTALL']
+    )
+
+
+# --- Lead Technician (lead_dashboard.html) ---
+def lead_pending_qc_forms():
+    # form.sku.*, form.technician.username
+    return QCForm.objects.filter(
+        sku__status='QC_PENDING'
+    ).select_related('sku', 'technician')
+
+def lead_pending_final_checks():
+    return QCForm.objects.filter(
+        sku__status='PENDING_FINAL_CHECK',
+        installation_submitted_at__isnull=False, # Pastikan teknisi sudah submit
+        final_approval_at__isnull=True # Pastikan belum di-approve
+    ).select_related('sku', 'technician')
+
+def lead_parts_awaiting_receipt():
+    # part.qc_form.sku.sku_id, part.qc_form.technician.username, part.warehouse_manager.username
+    return SparePartRequest.objects.filter(
+        status='PENDING_LEAD_RECEIPT'
+    ).select_related('qc_form__sku', 'qc_form__technician', 'warehouse_manager')
+
+
+# --- Purchasing (purchasing_dashboard.html) ---
+def purchasing_parts_to_buy():
+    # part.qc_form.sku.sku_id, part.warehouse_manager.username
+    return SparePartRequest.objects.filter(
+        status='Approved_Buy'
+    ).select_related('qc_form__sku', 'warehouse_manager')
+
+def purchasing_notifications():
+    # notif.po_number.po_number, notif.reported_by.username
+    return PurchasingNotification.objects.filter(
+        is_resolved=False
+    ).select_related('po_number', 'reported_by')
+
+def purchasing_rejected_pos():
+    # po.approved_by_wm.username
+    return PurchaseOrder.objects.filter(status='Rejected').select_related('approved_by_wm')
+
+def purchasing_pending_adjustments():
+    # adj.spare_part.part_name, adj.requested_by.username
+    return StockAdjustment.objects.filter(
+        status='Pending'
+    ).select_related('spare_part', 'requested_by')
+
+def purchasing_history_pos(search_query=''):
+    history_pos = PurchaseOrder.objects.exclude(status='Pending_Approval')
+    if search_query:
+        history_pos = history_pos.filter(po_number__icontains=search_query)
+    return history_pos
+
+
+# --- Sales (sales_dashboard.html) ---
+def sales_orders(user):
+    # order.sku.*, order.get_total_paid, order.get_remaining_balance
+    return SalesOrder.objects.filter(
+        sales_person=user
+    ).select_related('sku').with_payment_totals().order_by('-created_at')
+
+def sales_quotations(user):
+    # quotation.sku.sku_id
+    return Quotation.objects.filter(
+        sales_person=user
+    ).select_related('sku').order_by('-created_at')
+
+def sales_movements_in_transit(store):
+    # move.sku_to_move.*
+    return MovementRequest.objects.filter(
+        requested_by_store=store,
+        status='Delivering'
+    ).select_related('sku_to_move', 'requested_by_store').order_by('-created_at')
+
+
+# --- Inventory (picker spare part di manage_sparepart.html) ---
+def search_spare_parts(normalized_query):
+    """
+    Spare part yang setiap kata query-nya cocok dengan awal salah satu token
+    `search_text` (nama / SKU part), diurutkan berdasarkan relevansi:
+    token persis > awal token, bonus jika nama diawali query, lalu stok terbanyak.
+    `normalized_query` adalah hasil search.normalize_text().
+    """
+    terms = normalized_query.split()
+    match = Q()
+    rank = Value(0)
+    for term in terms:
+        match &= Q(search_text__contains=f' {term}')
+        rank = rank + Case(
+            When(search_text__contains=f' {term} ', then=Value(2)),
+            default=Value(1),
+            output_field=IntegerField(),
+        )
+    rank = rank + Case(
+        When(search_text__startswith=f' {normalized_query}', then=Value(len(terms))),
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+    return SparePartInventory.objects.filter(match).annotate(
+        search_rank=rank
+    ).order_by('-search_rank', '-quantity_in_stock', 'part_name')
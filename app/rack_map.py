@@ -0,0 +1,209 @@
+"""
+Peta rak ringkas (JSON) untuk grid rak dan polling perubahan.
+
+`snapshot()` mengembalikan seluruh gudang dari satu query (JOIN ke SKU):
+array datar `ids`, `locations` dan `states` (kode status, lihat `STATES`)
+ber-index sama, plus `occupied` yang jarang (sparse): index -> [sku_id, nama,
+status SKU], hanya untuk slot terisi.
+
+`changes(cursor)` mengembalikan hanya rak dengan `updated_at` lebih baru dari
+cursor klien (ber-index rack_id). Cursor berikutnya = waktu server saat query;
+perubahan yang di-commit sedikit terlambat tetap ikut karena query mundur
+`CURSOR_OVERLAP` (delta bersifat idempoten, jadi aman dikirim ulang).
+Rak yang dihapus tidak muncul di delta: klien memuat ulang snapshot jika
+`total` berbeda dengan jumlah slot yang dimilikinya.
+
+Update rak lewat queryset.update() harus mengisi `updated_at` sendiri
+(auto_now hanya berlaku untuk save()). Save SKU penghuni (status/nama berubah)
+ikut menyentuh `updated_at` raknya (signal sku_occupant_changed); perubahan
+status SKU lewat queryset.update() baru terlihat di snapshot berikutnya.
+
+Untuk render grid HTML, `get_layout()` menyimpan susunan rak (lorong -> zona
+-> slot, dari kolom zone/row/level) di memori proses. Layout hanya berubah saat
+rak ditambah/diubah lokasinya/dihapus (signal rack_changed), jadi setiap
+request cukup menumpangkan okupansi (`overlay()`: satu query rak terisi).
+"""
+import threading
+import time
+from datetime import timedelta, timezone as dt_timezone
+from typing import NamedTuple, Optional
+
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Rack, SKU
+
+# Kode status slot di array `states`
+STATES = [code for code, _ in Rack.STATUS_CHOICES]
+_STATE_INDEX = {code: index for index, code in enumerate(STATES)}
+
+CURSOR_OVERLAP = timedelta(seconds=5)
+
+_SKU_STATUS_LABELS = dict(SKU.STATUS_CHOICES)
+
+
+class InvalidCursor(ValueError):
+    """Cursor dari klien tidak bisa dibaca."""
+
+
+def _rows(queryset):
+    return queryset.order_by('rack_location').values_list(
+        'pk', 'rack_location', 'status',
+        'occupied_by_sku__sku_id', 'occupied_by_sku__name', 'occupied_by_sku__status',
+    )
+
+
+def _occupant(sku_id, name, status):
+    return [sku_id, name, _SKU_STATUS_LABELS.get(status, status)] if sku_id else None
+
+
+def current_cursor():
+    return timezone.now().isoformat()
+
+
+def parse_cursor(value):
+    try:
+        # '+' pada offset zona waktu menjadi spasi jika tidak di-encode klien
+        cursor = parse_datetime((value or '').strip().replace(' ', '+'))
+    except ValueError:
+        cursor = None
+    if cursor is None:
+        raise InvalidCursor("Cursor tidak valid.")
+    if timezone.is_naive(cursor):
+        cursor = timezone.make_aware(cursor, dt_timezone.utc)
+    return cursor
+
+
+def snapshot():
+    cursor = current_cursor()
+    ids, locations, states, occupied = [], [], [], {}
+    for index, (pk, location, status, sku_id, name, sku_status) in enumerate(_rows(Rack.objects.all())):
+        ids.append(pk)
+        locations.append(location)
+        states.append(_STATE_INDEX.get(status, -1))
+        occupant = _occupant(sku_id, name, sku_status)
+        if occupant:
+            occupied[index] = occupant
+    return {
+        'cursor': cursor,
+        'state_codes': STATES,
+        'total': len(ids),
+        'ids': ids,
+        'locations': locations,
+        'states': states,
+        'occupied': occupied,
+    }
+
+
+def changes(cursor):
+    """Rak yang berubah sejak `cursor` (string ISO dari respons sebelumnya)."""
+    since = parse_cursor(cursor) - CURSOR_OVERLAP
+    next_cursor = current_cursor()
+    changed = [
+        [pk, location, _STATE_INDEX.get(status, -1), _occupant(sku_id, name, sku_status)]
+        for pk, location, status, sku_id, name, sku_status in _rows(Rack.objects.filter(updated_at__gt=since))
+    ]
+    return {
+        'cursor': next_cursor,
+        'total': Rack.objects.count(),
+        'changed': changed,
+    }
+
+
+# --- Layout rak (cache proses) ---
+_LAYOUT_VERSION_KEY = 'app:rack_layout:version'
+
+
+class LayoutSlot(NamedTuple):
+    id: int
+    rack_location: str
+    zone: str
+    row: str
+    level: Optional[int]
+
+
+class RackTile(NamedTuple):
+    """Slot layout + okupansi saat ini (untuk template grid)."""
+    id: int
+    rack_location: str
+    status: str
+    sku_id: Optional[str] = None
+    sku_name: Optional[str] = None
+    sku_status: Optional[str] = None
+
+
+class RackLayout:
+    """{lorong: {zona: [LayoutSlot, ...]}}, urut lorong, zona, level, lokasi."""
+
+    def __init__(self, slots):
+        self.rows = {}
+        for slot in slots:
+            self.rows.setdefault(slot.row, {}).setdefault(slot.zone, []).append(slot)
+
+    @classmethod
+    def build(cls):
+        return cls(
+            LayoutSlot(*values) for values in
+            Rack.objects.order_by('row', 'zone', 'level', 'rack_location')
+            .values_list('id', 'rack_location', 'zone', 'row', 'level')
+        )
+
+    def __len__(self):
+        return sum(len(slots) for zones in self.rows.values() for slots in zones.values())
+
+    def row_slots(self, row):
+        return [slot for slots in self.rows[row].values() for slot in slots]
+
+
+_layout_lock = threading.Lock()
+_layout = None
+_layout_version = None
+
+
+def _current_layout_version():
+    version = cache.get(_LAYOUT_VERSION_KEY)
+    if version is None:
+        cache.add(_LAYOUT_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(_LAYOUT_VERSION_KEY)
+    return version
+
+
+def invalidate_layout():
+    """Panggil setelah rak ditambah, lokasinya diubah, atau dihapus."""
+    try:
+        cache.incr(_LAYOUT_VERSION_KEY)
+    except ValueError:
+        pass  # Belum ada versi: layout dibangun ulang saat dipakai
+
+
+def get_layout():
+    global _layout, _layout_version
+    version = _current_layout_version()
+    with _layout_lock:
+        if _layout is None or _layout_version != version:
+            _layout, _layout_version = RackLayout.build(), version
+        return _layout
+
+
+def overlay():
+    """{rack_id: (sku_id, nama, status SKU)} untuk rak terisi (satu query)."""
+    return {
+        pk: (sku_id, name, _SKU_STATUS_LABELS.get(status, status))
+        for pk, sku_id, name, status in Rack.objects.filter(status='Used').values_list(
+            'pk', 'occupied_by_sku__sku_id', 'occupied_by_sku__name', 'occupied_by_sku__status',
+        )
+    }
+
+
+def grid():
+    """{lorong: [RackTile, ...]}: layout dari cache + okupansi terkini."""
+    layout, occupied = get_layout(), overlay()
+    grid = {}
+    for row in layout.rows:
+        grid[row] = [
+            RackTile(slot.id, slot.rack_location, 'Used', *occupied[slot.id])
+            if slot.id in occupied else RackTile(slot.id, slot.rack_location, 'Available')
+            for slot in layout.row_slots(row)
+        ]
+    return grid
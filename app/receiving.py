@@ -0,0 +1,201 @@
+"""
+Penerimaan SKU massal (batch receiving) untuk satu PO.
+
+Alur per batch:
+1. `validate_assignments()` memeriksa semua baris (detail PO, teknisi, rak)
+   sekaligus, tanpa query per baris, dan mengumpulkan semua error.
+2. `receive_batch()` mengunci PO dan rak yang dipilih dengan
+   select_for_update, mengisi rak "auto" lewat slotting.allocate() dan
+   teknisi "auto" berdasarkan beban kerja, lalu menulis SKU
+   (bulk_create), rak (bulk_update), event timeline (bulk_create) dan
+   status PO (sekali) dalam satu transaksi.
+
+bulk_create/bulk_update tidak memicu signal, jadi counter dashboard, cache
+history dan index slot rak diperbarui langsung di sini.
+"""
+from collections import Counter
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from . import slotting, timeline
+from .models import PurchaseOrder, Rack, SKU, SKUDetailPO, SKUEvent
+
+AUTO = 'auto'
+
+# Status SKU yang masih dikerjakan teknisi (dipakai untuk auto-assign teknisi)
+OPEN_TECH_STATUSES = ('QC', 'QC_PENDING', 'AWAITING_INSTALL', 'PENDING_FINAL_CHECK')
+
+
+class ReceivingError(ValueError):
+    """Batch tidak bisa diproses. `errors`: list pesan per baris."""
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        super().__init__('; '.join(self.errors))
+
+
+def pending_details(po):
+    """Detail PO yang SKU-nya belum terdaftar."""
+    received = SKU.objects.filter(sku_id__in=po.sku_details.values('machine_sku_id')).values('sku_id')
+    return SKUDetailPO.objects.filter(purchase_order=po).exclude(machine_sku_id__in=received).order_by('id')
+
+
+def technician_queryset():
+    return User.objects.filter(groups__name='Technician').distinct()
+
+
+def _parse_id(value):
+    if value in (None, '', AUTO):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return False
+
+
+def _parse_rack(value):
+    """Kode rak yang diketik (None = auto)."""
+    code = (value or '').strip().upper()
+    return None if code in ('', AUTO.upper()) else code
+
+
+def validate_assignments(po, assignments):
+    """
+    `assignments`: list dict {'detail': id, 'technician': id|'auto', 'rack': kode rak|'auto'}.
+    Kode rak (Rack.rack_location) diketik user; kosong = auto. Return list baris tervalidasi {'detail': SKUDetailPO, 'technician': User|None,
+    'rack_id': int|None} (None = auto). Raise ReceivingError berisi semua error.
+    """
+    if not assignments:
+        raise ReceivingError(["Tidak ada SKU yang dipilih."])
+
+    details = pending_details(po).in_bulk([_parse_id(row.get('detail')) or 0 for row in assignments])
+    technicians = technician_queryset().in_bulk(
+        [tech_id for tech_id in (_parse_id(row.get('technician')) for row in assignments) if tech_id]
+    )
+    rack_codes = [code for code in (_parse_rack(row.get('rack')) for row in assignments) if code]
+    free_racks = dict(
+        slotting.available_racks().filter(rack_location__in=rack_codes).values_list('rack_location', 'pk')
+    )
+
+    errors, plan = [], []
+    seen_details, rack_usage = set(), Counter(rack_codes)
+    for number, row in enumerate(assignments, start=1):
+        detail = details.get(_parse_id(row.get('detail')))
+        tech_id, rack_code = _parse_id(row.get('technician')), _parse_rack(row.get('rack'))
+        rack_id = free_racks.get(rack_code)
+        label = detail.machine_sku_id if detail else f"baris {number}"
+        if detail is None:
+            errors.append(f"{label}: detail PO tidak ditemukan atau sudah diterima.")
+        elif detail.pk in seen_details:
+            errors.append(f"{label}: dipilih lebih dari sekali.")
+        if tech_id is False or (tech_id and tech_id not in technicians):
+            errors.append(f"{label}: teknisi tidak valid.")
+        if rack_code and rack_id is None:
+            errors.append(f"{label}: rak {rack_code} tidak ditemukan atau tidak tersedia.")
+        elif rack_code and rack_usage[rack_code] > 1:
+            errors.append(f"{label}: rak yang sama dipilih untuk lebih dari satu SKU.")
+        if detail is not None:
+            seen_details.add(detail.pk)
+        plan.append({
+            'detail': detail,
+            'technician': technicians.get(tech_id) if tech_id else None,
+            'rack_id': rack_id,
+        })
+
+    if errors:
+        raise ReceivingError(errors)
+    return plan
+
+
+def _auto_technicians(count):
+    """Bagi `count` SKU ke teknisi dengan beban kerja terendah (round-robin berbobot)."""
+    workloads = list(technician_queryset().annotate(
+        open_skus=Count('sku', filter=Q(sku__status__in=OPEN_TECH_STATUSES))
+    ).order_by('open_skus', 'username'))
+    if not workloads:
+        raise ReceivingError(["Tidak ada teknisi untuk auto-assign."])
+    chosen = []
+    for _ in range(count):
+        tech = min(workloads, key=lambda user: user.open_skus)
+        tech.open_skus += 1
+        chosen.append(tech)
+    return chosen
+
+
+@transaction.atomic
+def receive_batch(po, plan, user=None):
+    """
+    Terima semua baris `plan` (hasil validate_assignments). Return list SKU baru.
+    Rak pilihan user dikunci dan dicek ulang; rak 'auto' dialokasikan engine
+    slotting (PO yang sama dikumpulkan dalam satu zona).
+    """
+    po = PurchaseOrder.objects.select_for_update().get(pk=po.pk)
+    now = timezone.now()
+
+    chosen_ids = [row['rack_id'] for row in plan if row['rack_id']]
+    racks = {rack.pk: rack for rack in Rack.objects.select_for_update().filter(pk__in=chosen_ids)}
+    taken = [rack.rack_location for rack in racks.values() if rack.status != 'Available' or rack.occupied_by_sku_id]
+    if taken or len(racks) != len(chosen_ids):
+        raise ReceivingError([f"Rak {', '.join(taken) or 'terpilih'} baru saja dipakai. Pilih ulang rak."])
+
+    auto_rack_rows = [row for row in plan if not row['rack_id']]
+    if auto_rack_rows:
+        try:
+            free = slotting.allocate(len(auto_rack_rows), po_id=po.pk, stage='receiving', exclude=chosen_ids)
+        except slotting.SlottingError as e:
+            raise ReceivingError([str(e)])
+        for row, rack in zip(auto_rack_rows, free):
+            row['rack_id'] = rack.pk
+            racks[rack.pk] = rack
+
+    auto_tech_rows = [row for row in plan if row['technician'] is None]
+    for row, tech in zip(auto_tech_rows, _auto_technicians(len(auto_tech_rows)) if auto_tech_rows else []):
+        row['technician'] = tech
+
+    new_skus = SKU.objects.bulk_create([
+        SKU(
+            po_number=po,
+            sku_id=row['detail'].machine_sku_id,
+            name=row['detail'].machine_name,
+            assigned_technician=row['technician'],
+            status='QC',
+            location='Warehouse',
+            shelf_location=racks[row['rack_id']],
+            shelved_at=now,
+        )
+        for row in plan
+    ])
+    if any(sku.pk is None for sku in new_skus):
+        # Backend tanpa RETURNING pada bulk insert
+        ids = dict(SKU.objects.filter(sku_id__in=[sku.sku_id for sku in new_skus]).values_list('sku_id', 'pk'))
+        for sku in new_skus:
+            sku.pk = ids[sku.sku_id]
+
+    for sku in new_skus:
+        rack = sku.shelf_location
+        rack.status = 'Used'
+        rack.occupied_by_sku = sku
+        rack.updated_at = now
+    Rack.objects.bulk_update(list(racks.values()), ['status', 'occupied_by_sku', 'updated_at'])
+    transaction.on_commit(slotting.invalidate_index)
+
+    events = []
+    for sku in new_skus:
+        for event in (timeline.receiving_event(sku, user=user), timeline.shelving_event(sku, user=user)):
+            events.append(SKUEvent(
+                sku=sku, event_type=event.type, actor=event.user, actor_name=event.actor,
+                details=event.details, occurred_at=now,
+            ))
+    SKUEvent.objects.bulk_create(events)
+
+    timeline.invalidate_sku_history(*(sku.pk for sku in new_skus))
+
+    received_count = po.skus.count()
+    new_status = 'Finished' if received_count >= po.expected_sku_count else 'Delivered'
+    if po.status != new_status:
+        po.status = new_status
+        po.save()
+    return new_skus
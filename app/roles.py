@@ -0,0 +1,54 @@
+"""
+Resolusi role user (Django Group) dengan cache.
+
+Nama grup milik user dimuat sekali lalu disimpan:
+- di objek user itu sendiri (berlaku selama satu request, karena request.user
+  adalah objek yang sama untuk semua decorator dan view), dan
+- di cache Django (lintas request), diinvalidasi oleh signal di signals.py
+  ketika keanggotaan grup berubah.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+# Batas atas umur cache (detik), sebagai pengaman jika cache tidak dibagi antar worker
+ROLE_CACHE_TIMEOUT = getattr(settings, 'ROLE_CACHE_TIMEOUT', 300)
+
+_USER_ATTR = '_cached_role_names'
+
+
+def _cache_key(user_id):
+    return f'app:user_roles:{user_id}'
+
+
+def get_role_names(user):
+    """Mengembalikan frozenset nama grup user. Maksimal satu query per request."""
+    if user is None or not getattr(user, 'is_authenticated', False) or user.pk is None:
+        return frozenset()
+
+    role_names = getattr(user, _USER_ATTR, None)
+    if role_names is not None:
+        return role_names
+
+    key = _cache_key(user.pk)
+    role_names = cache.get(key)
+    if role_names is None:
+        role_names = frozenset(user.groups.values_list('name', flat=True))
+        cache.set(key, role_names, ROLE_CACHE_TIMEOUT)
+
+    setattr(user, _USER_ATTR, role_names)
+    return role_names
+
+
+def has_role(user, *role_names):
+    """True jika user anggota salah satu grup pada role_names."""
+    return not get_role_names(user).isdisjoint(role_names)
+
+
+def invalidate_user_roles(*user_ids, user=None):
+    """Hapus cache role untuk user_ids (dan memo pada objek user jika diberikan)."""
+    if user is not None:
+        user.__dict__.pop(_USER_ATTR, None)
+        user_ids = user_ids + (user.pk,)
+    keys = [_cache_key(user_id) for user_id in user_ids if user_id is not None]
+    if keys:
+        cache.delete_many(keys)
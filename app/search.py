@@ -0,0 +1,52 @@
+"""
+Normalisasi teks untuk pencarian spare part.
+
+Nama dan SKU part dipecah menjadi token huruf kecil tanpa aksen/tanda baca,
+lalu disimpan di kolom `SparePartInventory.search_text` dengan format
+" token1 token2 ... " (diapit spasi) sehingga pencocokan awal kata cukup
+dengan LIKE '% term%'. Di PostgreSQL kolom ini punya index GIN pg_trgm
+(migrasi 0035_sparepartinventory_search_text).
+"""
+import hashlib
+import re
+import unicodedata
+
+from django.conf import settings
+
+# Hasil pencarian di-cache sebentar (detik): ketikan berulang / backspace
+# tidak memukul database lagi. Perubahan stok terlihat setelah TTL habis.
+SEARCH_CACHE_TIMEOUT = getattr(settings, 'PART_SEARCH_CACHE_TIMEOUT', 30)
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+
+
+def normalize_text(value):
+    """'Sénsor  Tipe-X' -> 'sensor tipe x'"""
+    if not value:
+        return ''
+    value = unicodedata.normalize('NFKD', value)
+    value = ''.join(char for char in value if not unicodedata.combining(char))
+    return _NON_ALNUM.sub(' ', value.lower()).strip()
+
+
+def tokenize(value):
+    """Token kata dari `value`, plus bentuk rapatnya ('AB-12' -> ab, 12, ab12)."""
+    normalized = normalize_text(value)
+    tokens = normalized.split()
+    if len(tokens) > 1:
+        tokens.append(''.join(tokens))
+    return tokens
+
+
+def build_search_text(*values):
+    tokens = []
+    for value in values:
+        for token in tokenize(value):
+            if token not in tokens:
+                tokens.append(token)
+    return f" {' '.join(tokens)} " if tokens else ''
+
+
+def cache_key(namespace, normalized_query):
+    digest = hashlib.md5(normalized_query.encode()).hexdigest()
+    return f'app:search:{namespace}:{digest}'
@@ -0,0 +1,156 @@
+from django.contrib.auth.models import User, Group
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import counters, images, rack_map, slotting, timeline
+from .models import (
+    InstallationPhoto, MovementRequest, Payment, QCForm, Rack, SalesOrder, SKU, SKUEvent, SparePartRequest,
+)
+from .roles import invalidate_user_roles
+
+
+# --- Invalidasi cache role ---
+@receiver(m2m_changed, sender=User.groups.through)
+def user_groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Keanggotaan grup berubah (user.groups.add/remove/clear atau group.user_set.*)."""
+    if not reverse:
+        # instance adalah User
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            invalidate_user_roles(user=instance)
+        return
+
+    # instance adalah Group, pk_set berisi ID user
+    if action in ('post_add', 'post_remove'):
+        invalidate_user_roles(*pk_set)
+    elif action == 'pre_clear':
+        invalidate_user_roles(*instance.user_set.values_list('id', flat=True))
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    """Grup di-rename atau dihapus: semua anggotanya perlu resolve ulang."""
+    if instance.pk:
+        invalidate_user_roles(*instance.user_set.values_list('id', flat=True))
+
+
+# --- Counter dashboard (DashboardCounter) ---
+def _counter_pre_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    if counters.affects_counters(sender, update_fields):
+        instance._counter_old_state = counters.get_db_state(sender, instance.pk)
+
+
+def _counter_post_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    if not counters.affects_counters(sender, update_fields):
+        return
+    old_state = getattr(instance, '_counter_old_state', None)
+    counters.apply_transition(sender, old_state, counters.get_state(instance))
+
+
+def _counter_post_delete(sender, instance, **kwargs):
+    counters.apply_transition(sender, counters.get_state(instance), None)
+
+
+for _model in counters.COUNTED_MODELS:
+    pre_save.connect(_counter_pre_save, sender=_model, dispatch_uid=f'counter_pre_save_{_model.__name__}')
+    post_save.connect(_counter_post_save, sender=_model, dispatch_uid=f'counter_post_save_{_model.__name__}')
+    post_delete.connect(_counter_post_delete, sender=_model, dispatch_uid=f'counter_post_delete_{_model.__name__}')
+
+
+# --- Denormalisasi SalesOrder.total_paid ---
+@receiver(pre_save, sender=Payment)
+def payment_pre_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    instance._old_payment = (
+        Payment.objects.filter(pk=instance.pk).values('sales_order_id', 'amount').first()
+        if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=Payment)
+def payment_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        # loaddata: total_paid ikut di fixture
+        return
+    old = getattr(instance, '_old_payment', None)
+    if old:
+        SalesOrder.add_to_total_paid(old['sales_order_id'], -old['amount'])
+    SalesOrder.add_to_total_paid(instance.sales_order_id, instance.amount)
+
+
+@receiver(post_delete, sender=Payment)
+def payment_deleted(sender, instance, **kwargs):
+    SalesOrder.add_to_total_paid(instance.sales_order_id, -instance.amount)
+
+
+# --- Invalidasi cache fragment history SKU ---
+HISTORY_SOURCES = {
+    SKU: lambda instance: instance.pk,
+    SKUEvent: lambda instance: instance.sku_id,
+    QCForm: lambda instance: instance.sku_id,
+    SparePartRequest: lambda instance: QCForm.objects.filter(pk=instance.qc_form_id).values_list('sku_id', flat=True).first(),
+    MovementRequest: lambda instance: instance.sku_to_move_id,
+    SalesOrder: lambda instance: instance.sku_id,
+    Payment: lambda instance: SalesOrder.objects.filter(pk=instance.sales_order_id).values_list('sku_id', flat=True).first(),
+}
+
+
+def _history_changed(sender, instance, **kwargs):
+    sku_id = HISTORY_SOURCES[sender](instance)
+    # Setelah commit: request lain yang membaca sebelum commit masih melihat data lama
+    # dan akan menyimpannya di bawah versi baru jika versi dinaikkan sekarang
+    transaction.on_commit(lambda: timeline.invalidate_sku_history(sku_id))
+
+
+for _model in HISTORY_SOURCES:
+    post_save.connect(_history_changed, sender=_model, dispatch_uid=f'history_post_save_{_model.__name__}')
+    post_delete.connect(_history_changed, sender=_model, dispatch_uid=f'history_post_delete_{_model.__name__}')
+
+
+# --- Index slot rak kosong (slotting.py) & layout grid rak (rack_map.py) ---
+@receiver(post_save, sender=Rack)
+@receiver(post_delete, sender=Rack)
+def rack_changed(sender, instance, created=False, update_fields=None, **kwargs):
+    # Setelah commit: sebelum itu proses lain masih melihat status rak lama
+    transaction.on_commit(slotting.invalidate_index)
+    # Layout grid hanya berubah saat rak ditambah/dihapus/lokasinya diubah;
+    # update okupansi (place_sku/release_sku) memakai update_fields tanpa lokasi
+    if kwargs['signal'] is post_delete or created or update_fields is None or 'rack_location' in update_fields:
+        transaction.on_commit(rack_map.invalidate_layout)
+
+
+@receiver(post_save, sender=SKU)
+def sku_occupant_changed(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Delta peta rak (rack_map.changes) memilih rak lewat updated_at, padahal status
+    # & nama SKU penghuni ikut dikirim: sentuh rak tempat SKU ini berada
+    if raw or (update_fields is not None and not {'status', 'name'} & set(update_fields)):
+        return
+    Rack.objects.filter(occupied_by_sku=instance).update(updated_at=timezone.now())
+
+
+# --- Turunan foto instalasi (images.py) ---
+@receiver(pre_save, sender=InstallationPhoto)
+def installation_photo_pre_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    instance._old_image = (
+        InstallationPhoto.objects.filter(pk=instance.pk).values_list('image', flat=True).first()
+        if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=InstallationPhoto)
+def installation_photo_saved(sender, instance, raw=False, **kwargs):
+    # Foto baru, gambar diganti (admin), atau gambar ini belum pernah diproses
+    # (proses sebelumnya gagal). derived_from juga terisi untuk file bukan gambar.
+    if raw or not instance.image:
+        return
+    image_name = instance.image.name
+    if image_name == getattr(instance, '_old_image', None) and image_name == instance.derived_from:
+        return
+    photo_id = instance.pk
+    # Setelah commit: worker membaca foto dari koneksi DB lain
+    transaction.on_commit(lambda: images.submit(photo_id, image_name))
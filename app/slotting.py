@@ -0,0 +1,327 @@
+"""
+Slotting rak otomatis (receiving, QC, QC verify, final check).
+
+Rak dikelompokkan per zona = prefix lokasi sebelum '-' ('A1-03' -> 'A1',
+kolom Rack.zone, lihat locations.py), sama seperti grid rak di template. `FreeSlotIndex` menyimpan slot kosong per
+zona di memori proses; dibangun ulang dari satu query ber-index
+(`status='Available'`, lihat migrasi 0036_rack_available_idx) setiap kali
+versi index di cache berubah (signal simpan/hapus Rack, atau bulk update di
+receiving.py).
+
+Urutan zona ditentukan kebijakan di settings.RACK_SLOTTING_POLICIES
+(dievaluasi berurutan, kebijakan pertama paling menentukan):
+- 'keep_po_together': zona yang sudah berisi SKU dari PO yang sama
+- 'nearest_zone': zona terdekat dari rak SKU saat ini / zona default tahap
+  (settings.RACK_SLOTTING_STAGE_ZONES, cth. {'ready': 'B1'})
+- 'fill_first': zona dengan slot kosong paling sedikit (dipenuhi dulu)
+Di dalam zona, slot diambil urut lokasi.
+
+Index hanya dipakai untuk menyusun kandidat. Alokasi selalu mengunci baris
+Rack dengan select_for_update(skip_locked=True) dan mengecek ulang status,
+sehingga dua user tidak pernah mendapat slot yang sama; slot yang sedang
+dikunci transaksi lain dilewati.
+"""
+import re
+import threading
+import time
+from collections import Counter
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .locations import parse_rack_location
+from .models import Rack, SKU
+
+AUTO = 'auto'
+
+DEFAULT_POLICIES = ('keep_po_together', 'nearest_zone', 'fill_first')
+POLICIES = tuple(getattr(settings, 'RACK_SLOTTING_POLICIES', DEFAULT_POLICIES))
+STAGE_ZONES = getattr(settings, 'RACK_SLOTTING_STAGE_ZONES', {})
+
+# Jumlah kandidat yang dicoba dikunci per query
+CANDIDATE_BATCH = 20
+
+_VERSION_KEY = 'app:slotting:version'
+_ZONE_PARTS = re.compile(r'^([A-Za-z]*)(\d*)')
+
+
+class SlottingError(ValueError):
+    """Tidak ada rak kosong yang bisa dialokasikan."""
+
+
+class FreeSlot(NamedTuple):
+    id: int
+    rack_location: str
+    zone: str
+    status: str = 'Available'
+
+
+def zone_of(rack_location):
+    return parse_rack_location(rack_location).zone
+
+
+def _zone_position(zone):
+    """'B12' -> (1, 12); dipakai untuk jarak antar zona."""
+    letters, digits = _ZONE_PARTS.match(zone).groups()
+    row = 0
+    for char in letters.upper():
+        row = row * 26 + ord(char) - ord('A') + 1
+    return row, int(digits) if digits else 0
+
+
+def zone_distance(zone, other):
+    if zone == other:
+        return 0
+    (row, col), (other_row, other_col) = _zone_position(zone), _zone_position(other)
+    # Pindah lorong (huruf) lebih mahal dari pindah rak dalam lorong (angka)
+    return abs(row - other_row) * 100 + abs(col - other_col) + 1
+
+
+def available_racks():
+    return Rack.objects.filter(status='Available', occupied_by_sku__isnull=True)
+
+
+# --- Kebijakan: fungsi (zona, slot_zona, konteks) -> kunci urut (kecil = lebih baik) ---
+def _keep_po_together(zone, slots, context):
+    return -context['po_zones'].get(zone, 0)
+
+
+def _nearest_zone(zone, slots, context):
+    return zone_distance(zone, context['near']) if context['near'] else 0
+
+
+def _fill_first(zone, slots, context):
+    return len(slots)
+
+
+POLICY_FUNCTIONS = {
+    'keep_po_together': _keep_po_together,
+    'nearest_zone': _nearest_zone,
+    'fill_first': _fill_first,
+}
+
+
+class FreeSlotIndex:
+    """Slot kosong per zona, masing-masing urut lokasi."""
+
+    def __init__(self, rows):
+        self.zones = {}
+        for rack_id, rack_location, zone in rows:
+            slot = FreeSlot(rack_id, rack_location, zone)
+            self.zones.setdefault(slot.zone, []).append(slot)
+
+    @classmethod
+    def build(cls):
+        return cls(available_racks().order_by('rack_location').values_list('id', 'rack_location', 'zone'))
+
+    def __len__(self):
+        return sum(len(slots) for slots in self.zones.values())
+
+    def grid(self):
+        """{zona: [FreeSlot, ...]} untuk grid rak di template."""
+        return {zone: list(self.zones[zone]) for zone in sorted(self.zones)}
+
+    def candidates(self, context, policies=POLICIES, exclude=(), zones=None):
+        """Slot kosong (opsional hanya di `zones`), urut dari yang paling direkomendasikan."""
+        functions = [POLICY_FUNCTIONS[name] for name in policies]
+
+        def zone_key(zone):
+            slots = self.zones[zone]
+            return tuple(function(zone, slots, context) for function in functions) + (zone,)
+
+        excluded = set(exclude)
+        return [
+            slot
+            for zone in sorted(self.zones, key=zone_key)
+            if zones is None or zone in zones
+            for slot in self.zones[zone]
+            if slot.id not in excluded
+        ]
+
+
+_index_lock = threading.Lock()
+_index = None
+_index_version = None
+
+
+def _current_version():
+    version = cache.get(_VERSION_KEY)
+    if version is None:
+        cache.add(_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(_VERSION_KEY)
+    return version
+
+
+def invalidate_index():
+    """
+    Panggil setelah status rak berubah tanpa signal (bulk_update / update()),
+    sebaiknya lewat transaction.on_commit().
+    """
+    try:
+        cache.incr(_VERSION_KEY)
+    except ValueError:
+        pass  # Belum ada versi: index dibangun ulang saat dipakai
+
+
+def get_free_slot_index(rebuild=False):
+    global _index, _index_version
+    version = _current_version()
+    with _index_lock:
+        if rebuild or _index is None or _index_version != version:
+            _index, _index_version = FreeSlotIndex.build(), version
+        return _index
+
+
+def free_slot_grid():
+    return get_free_slot_index().grid()
+
+
+def build_context(sku=None, po_id=None, near=None, stage=None):
+    """
+    Konteks kebijakan: zona PO (jumlah SKU PO yang sama per zona) dan zona acuan
+    'nearest_zone' (rak SKU saat ini, lalu `near`, lalu zona default tahap).
+    """
+    if sku is not None:
+        po_id = po_id or sku.po_number_id
+        if near is None and sku.shelf_location_id:
+            near = Rack.objects.filter(pk=sku.shelf_location_id).values_list('rack_location', flat=True).first()
+    po_zones = Counter()
+    if po_id and 'keep_po_together' in POLICIES:
+        po_zones.update(
+            Rack.objects.filter(occupied_by_sku__po_number_id=po_id).values_list('zone', flat=True)
+        )
+    near = near or STAGE_ZONES.get(stage)
+    return {'po_zones': po_zones, 'near': zone_of(near) if near else None}
+
+
+def propose(sku=None, po_id=None, near=None, stage=None):
+    """Slot yang direkomendasikan (tanpa mengunci), atau None jika gudang penuh."""
+    candidates = get_free_slot_index().candidates(build_context(sku, po_id, near, stage))
+    return candidates[0] if candidates else None
+
+
+def allocate(count=1, sku=None, po_id=None, near=None, stage=None, exclude=(), zones=None):
+    """
+    Kunci dan kembalikan `count` objek Rack kosong terbaik (urut rekomendasi).
+    Harus dipanggil di dalam transaction.atomic(); caller yang menandai rak
+    sebagai Used. Raise SlottingError jika rak kosong tidak cukup.
+    """
+    context = build_context(sku, po_id, near, stage)
+    for rebuild in (False, True):
+        # Percobaan kedua memakai index baru: index lama bisa basi (rak baru, bulk_create)
+        candidates = get_free_slot_index(rebuild=rebuild).candidates(context, exclude=exclude, zones=zones)
+        chosen = []
+        batch_size = max(CANDIDATE_BATCH, count * 2)
+        for start in range(0, len(candidates), batch_size):
+            batch = candidates[start:start + batch_size]
+            locked = {
+                rack.pk: rack for rack in
+                available_racks().filter(pk__in=[slot.id for slot in batch]).select_for_update(skip_locked=True)
+            }
+            chosen.extend(locked[slot.id] for slot in batch if slot.id in locked)
+            if len(chosen) >= count:
+                return chosen[:count]
+    raise SlottingError(f"Rak kosong tidak cukup: butuh {count}, tersedia {len(chosen)}.")
+
+
+def lock_rack(rack_id):
+    """Kunci rak pilihan user; None jika rak tidak ada / sudah terisi."""
+    try:
+        rack_id = int(rack_id)
+    except (TypeError, ValueError):
+        return None
+    return available_racks().select_for_update().filter(pk=rack_id).first()
+
+
+def assign(sku, rack_id=None, stage=None, zones=None):
+    """
+    Rak untuk `sku`: rak pilihan user (dikunci & dicek ulang), atau rekomendasi
+    engine jika `rack_id` kosong / 'auto'. Harus di dalam transaction.atomic().
+    """
+    if rack_id and rack_id != AUTO:
+        rack = lock_rack(rack_id)
+        if rack is None:
+            raise SlottingError("Rak yang dipilih tidak valid atau sudah terisi.")
+        return rack
+    return allocate(sku=sku, stage=stage, zones=zones)[0]
+
+
+# --- Okupansi rak ---
+# Relasi rak <-> SKU disimpan di dua sisi: Rack.occupied_by_sku (OneToOne, sumber
+# kebenaran) dan SKU.shelf_location. Semua perubahan lewat place_sku() /
+# release_sku(): kunci dulu (SKU, lalu rak), baru update kedua sisi dalam satu
+# transaksi. Constraint DB (migrasi 0037) menolak rak terisi yang tidak 'Used'
+# dan dua SKU dengan shelf_location yang sama.
+def _lock_sku_racks(sku):
+    """
+    Kunci baris SKU dan rak yang saat ini ditempatinya (dari kedua sisi relasi).
+    Rak yang ditunjuk shelf_location tapi diisi SKU lain tidak ikut dikembalikan.
+    """
+    shelf_location_id = SKU.objects.select_for_update().filter(pk=sku.pk).values_list('shelf_location_id', flat=True).get()
+    racks = Rack.objects.select_for_update().filter(Q(occupied_by_sku=sku.pk) | Q(pk=shelf_location_id)).order_by('pk')
+    return [rack for rack in racks if rack.occupied_by_sku_id in (sku.pk, None)]
+
+
+def _free(rack):
+    rack.status = 'Available'
+    rack.occupied_by_sku = None
+    rack.save(update_fields=['status', 'occupied_by_sku', 'updated_at'])
+
+
+@transaction.atomic
+def place_sku(sku, rack_id=None, stage=None, zones=None):
+    """
+    Tempatkan `sku` di rak `rack_id` (atau rak rekomendasi jika kosong/'auto').
+    Rak lama dikosongkan. Mengisi sku.shelf_location/shelved_at dan menyimpannya.
+    Return (rak_baru, [rak_lama_yang_dikosongkan]). Raise SlottingError.
+    """
+    current = _lock_sku_racks(sku)
+    same = next((rack for rack in current if str(rack.pk) == str(rack_id)), None)
+    rack = same or assign(sku, rack_id, stage=stage, zones=zones)
+
+    released = [old for old in current if old.pk != rack.pk]
+    for old in released:
+        _free(old)
+    rack.status = 'Used'
+    rack.occupied_by_sku = sku
+    rack.save(update_fields=['status', 'occupied_by_sku', 'updated_at'])
+
+    sku.shelf_location = rack
+    sku.shelved_at = timezone.now()
+    sku.save(update_fields=['shelf_location', 'shelved_at'])
+    return rack, released
+
+
+@transaction.atomic
+def release_sku(sku):
+    """Keluarkan `sku` dari raknya (kedua sisi relasi). Return list rak yang dikosongkan."""
+    released = _lock_sku_racks(sku)
+    for rack in released:
+        _free(rack)
+    if sku.shelf_location_id is not None or released:
+        sku.shelf_location = None
+        sku.shelved_at = None
+        sku.save(update_fields=['shelf_location', 'shelved_at'])
+    return released
+
+
+def occupancy_mismatches():
+    """
+    Ketidaksesuaian okupansi (Rack.occupied_by_sku sebagai acuan):
+    (id rak terisi yang status-nya bukan 'Used', [(sku_id, shelf_location_id, seharusnya)]).
+    """
+    bad_status = list(
+        Rack.objects.filter(occupied_by_sku__isnull=False).exclude(status='Used').values_list('pk', flat=True)
+    )
+    expected = dict(Rack.objects.filter(occupied_by_sku__isnull=False).values_list('occupied_by_sku', 'pk'))
+    bad_skus = [
+        (sku_pk, shelf_location_id, expected.get(sku_pk))
+        for sku_pk, shelf_location_id in
+        SKU.objects.filter(Q(shelf_location__isnull=False) | Q(pk__in=expected)).values_list('pk', 'shelf_location_id')
+        if shelf_location_id != expected.get(sku_pk)
+    ]
+    return bad_status, bad_skus
@@ -4,7 +4,9 @@ when you run "manage.py test".
 """
 
 import django
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.urls import reverse
+from django.utils import timezone
 
 # TODO: Configure your database in settings.py and sync before running tests.
 
@@ -32,3 +34,1399 @@ class ViewTest(TestCase):
         """Tests the about page."""
         response = self.client.get('/about')
         self.assertContains(response, 'About', 3, 200)
+
+
+class RoleResolutionTest(TestCase):
+    """Tests for the cached role resolution in roles.py."""
+
+    def setUp(self):
+        from django.contrib.auth.models import Group, User
+        from django.core.cache import cache
+        cache.clear()
+        self.wm_group = Group.objects.create(name='Warehouse Manager')
+        self.purchasing_group = Group.objects.create(name='Purchasing')
+        self.user = User.objects.create_user('wm', password='secret')
+        self.user.groups.add(self.wm_group)
+
+    def test_role_checks_query_once(self):
+        """Only the first role check per user hits the database."""
+        from django.contrib.auth.models import User
+        from .views import is_warehouse_manager, is_purchasing, has_permission_or_is_master
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(1):
+            self.assertTrue(is_warehouse_manager(user))
+            self.assertFalse(is_purchasing(user))
+            self.assertTrue(has_permission_or_is_master(user, 'Warehouse Manager'))
+        # Request berikutnya (objek user baru) dilayani dari cache
+        with self.assertNumQueries(0):
+            self.assertTrue(is_warehouse_manager(User(pk=self.user.pk)))
+
+    def test_group_change_invalidates_cache(self):
+        """Adding or removing a group is visible on the next check."""
+        from django.contrib.auth.models import User
+        from .views import is_purchasing
+        self.assertFalse(is_purchasing(User.objects.get(pk=self.user.pk)))
+        self.purchasing_group.user_set.add(self.user)
+        self.assertTrue(is_purchasing(User.objects.get(pk=self.user.pk)))
+        self.user.groups.remove(self.purchasing_group)
+        self.assertFalse(is_purchasing(User.objects.get(pk=self.user.pk)))
+
+
+class DashboardCounterTest(TestCase):
+    """Tests for the incremental DashboardCounter maintenance in counters.py."""
+
+    def test_counters_follow_status_transitions(self):
+        from .counters import DASHBOARD_KEYS, compute_counts, get_counts
+        from .models import DashboardCounter, PurchaseOrder, SKU, Store
+        store = Store.objects.create(name='Store A')
+        po = PurchaseOrder.objects.create(po_number='PO-1', expected_sku_count=2)
+        self.assertEqual(get_counts('po.status.Pending_Approval')['po.status.Pending_Approval'], 1)
+
+        po.status = 'Pending'
+        po.save()
+        sku = SKU.objects.create(sku_id='SKU-1', name='Mesin', po_number=po, status='Ready')
+        SKU.objects.create(sku_id='SKU-2', name='Mesin', po_number=po, status='QC')
+        sku.status = 'Shop'
+        sku.current_store = store
+        sku.save()
+
+        counts = get_counts(*DASHBOARD_KEYS)
+        self.assertEqual(counts, {'po.status.Pending_Approval': 0, 'sku.status.Shop': 1, 'sku.status.Ready': 0})
+        # Only the keys the dashboard reads are maintained
+        self.assertEqual(set(DashboardCounter.objects.values_list('key', flat=True)), set(DASHBOARD_KEYS))
+
+        # Saves that cannot change the status skip the old-state lookup
+        with self.assertNumQueries(1):
+            sku.save(update_fields=['current_store'])
+
+        sku.delete()
+        expected = compute_counts()
+        self.assertEqual(get_counts(*expected), dict(expected))
+        self.assertEqual(get_counts('sku.status.Shop')['sku.status.Shop'], 0)
+
+
+class KeysetPaginationTest(TestCase):
+    """Tests for keyset_paginate() and the history endpoints."""
+
+    def setUp(self):
+        from django.contrib.auth.models import Group, User
+        from .models import PurchaseOrder
+        self.user = User.objects.create_user('purchasing', password='secret')
+        self.user.groups.add(Group.objects.create(name='Purchasing'))
+        created_at = timezone.now()
+        for i in range(7):
+            po = PurchaseOrder.objects.create(po_number=f'PO-{i}', status='Pending')
+            # Beberapa baris memiliki created_at sama / NULL (data lama)
+            PurchaseOrder.objects.filter(pk=po.pk).update(created_at=None if i < 2 else created_at)
+
+    def test_pages_cover_all_rows_once(self):
+        from .models import PurchaseOrder
+        from .pagination import keyset_paginate
+        seen, cursor = [], None
+        while True:
+            page = keyset_paginate(PurchaseOrder.objects.all(), cursor=cursor, page_size=3)
+            seen.extend(po.po_number for po in page)
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        self.assertEqual(sorted(seen), sorted(f'PO-{i}' for i in range(7)))
+        self.assertEqual(seen[-2:], ['PO-1', 'PO-0'])
+
+    def test_null_tail_is_a_separate_query(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .models import PurchaseOrder
+        from .pagination import keyset_paginate
+        first = keyset_paginate(PurchaseOrder.objects.all(), page_size=3)
+        with CaptureQueriesContext(connection) as ctx:
+            page = keyset_paginate(PurchaseOrder.objects.all(), cursor=first.next_cursor, page_size=3)
+        self.assertEqual([po.po_number for po in page], ['PO-3', 'PO-2', 'PO-1'])
+        self.assertEqual(len(ctx.captured_queries), 2)
+        for query in ctx.captured_queries:
+            self.assertFalse('IS NULL' in query['sql'] and ' OR ' in query['sql'], query['sql'])
+
+    def test_history_endpoint_returns_next_page(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('history_pos_page'), {'page_size': 5})
+        data = response.json()
+        self.assertEqual(data['html'].count('<tr'), 5)
+        response = self.client.get(reverse('history_pos_page'), {'page_size': 5, 'cursor': data['next_cursor']})
+        data = response.json()
+        self.assertEqual(data['html'].count('<tr'), 2)
+        self.assertIsNone(data['next_cursor'])
+
+    def test_dashboard_renders_first_page(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('dashboard'), {'page_size': 5})
+        self.assertContains(response, 'keyset-load-more')
+        self.assertContains(response, 'PO-6')
+        self.assertNotContains(response, 'PO-0')
+
+
+class DashboardQueryCountTest(TestCase):
+    """
+    Query count per dashboard must not depend on the number of rows shown.
+    Each dashboard is rendered, more rows are added, and the query count of
+    the second render must equal the first.
+    """
+
+    ROLES = ['Warehouse Manager', 'Technician', 'Lead Technician', 'Purchasing', 'Sales']
+
+    def setUp(self):
+        from django.contrib.auth.models import Group, User
+        from django.core.cache import cache
+        cache.clear()
+        self.users = {}
+        for role in self.ROLES:
+            user = User.objects.create_user(role.lower().replace(' ', '_'), password='secret')
+            user.groups.add(Group.objects.create(name=role))
+            self.users[role] = user
+        self.row_count = 0
+        self.add_rows(2)
+
+    def add_rows(self, count):
+        from .models import (
+            PurchaseOrder, PurchasingNotification, QCForm, SKU,
+            SparePartInventory, SparePartRequest, StockAdjustment,
+        )
+        wm, tech = self.users['Warehouse Manager'], self.users['Technician']
+        for _ in range(count):
+            self.row_count += 1
+            n = self.row_count
+            po = PurchaseOrder.objects.create(po_number=f'PO-{n}', status='Rejected', approved_by_wm=wm)
+            PurchasingNotification.objects.create(po_number=po, message='Packing list', reported_by=wm)
+            for status in ['QC', 'QC_PENDING', 'AWAITING_INSTALL', 'PENDING_FINAL_CHECK', 'Ready', 'Sold']:
+                sku = SKU.objects.create(
+                    sku_id=f'SKU-{n}-{status}', name='Mesin', po_number=po,
+                    assigned_technician=tech, status=status,
+                )
+                if status == 'QC':
+                    continue
+                qc_form = QCForm.objects.create(
+                    sku=sku, technician=tech, condition_notes='OK',
+                    installation_submitted_at=timezone.now(),
+                )
+                for part_status in ['Pending', 'Approved_Buy', 'PENDING_LEAD_RECEIPT']:
+                    SparePartRequest.objects.create(
+                        qc_form=qc_form, part_name='Sensor', status=part_status, warehouse_manager=wm,
+                    )
+            part = SparePartInventory.objects.create(part_name=f'Part {n}')
+            StockAdjustment.objects.create(
+                spare_part=part, requested_by=wm, quantity_in_system=0, quantity_actual=1, reason='Opname',
+            )
+
+    def count_dashboard_queries(self, user):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_query_count_is_constant(self):
+        for role, user in self.users.items():
+            with self.subTest(role=role):
+                self.client.force_login(user)
+                self.client.get(reverse('dashboard'))  # warm up role cache
+                before = self.count_dashboard_queries(user)
+                self.add_rows(3)
+                after = self.count_dashboard_queries(user)
+                self.assertEqual(before, after)
+
+
+class SalesOrderPaymentTotalsTest(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from .models import PurchaseOrder, SalesOrder, SKU
+        sales = User.objects.create_user('sales', password='secret')
+        po = PurchaseOrder.objects.create(po_number='PO-SALES')
+        self.paid = SalesOrder.objects.create(
+            customer_name='Budi', customer_address='Jl. Mawar', customer_phone='0812',
+            sku=SKU.objects.create(sku_id='SKU-PAID', name='Mesin', po_number=po, status='Booked'),
+            price=1000, sales_person=sales,
+        )
+        self.unpaid = SalesOrder.objects.create(
+            customer_name='Sari', customer_address='Jl. Melati', customer_phone='0813',
+            sku=SKU.objects.create(sku_id='SKU-UNPAID', name='Mesin', po_number=po, status='Shop'),
+            price=500, sales_person=sales,
+        )
+        self.paid.payments.create(amount=300, proof_of_transfer='a.jpg')
+        self.paid.payments.create(amount=200, proof_of_transfer='b.jpg')
+
+    def test_annotation_matches_model_methods(self):
+        from .models import SalesOrder
+        with self.assertNumQueries(1):
+            orders = {o.pk: o for o in SalesOrder.objects.with_payment_totals()}
+            self.assertEqual(orders[self.paid.pk].get_total_paid(), 500)
+            self.assertEqual(orders[self.paid.pk].get_remaining_balance(), 500)
+            self.assertEqual(orders[self.unpaid.pk].get_total_paid(), 0)
+            self.assertEqual(orders[self.unpaid.pk].get_remaining_balance(), 500)
+        self.assertEqual(SalesOrder.objects.get(pk=self.paid.pk).get_remaining_balance(), 500)
+
+    def test_total_paid_follows_payment_changes(self):
+        payment = self.paid.payments.first()
+        payment.amount = 250
+        payment.save()
+        self.paid.refresh_from_db()
+        self.assertEqual(self.paid.total_paid, 450)
+
+        payment.delete()
+        self.paid.refresh_from_db()
+        self.assertEqual(self.paid.total_paid, 200)
+
+    def test_reconcile_command_fixes_drift(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from .models import SalesOrder
+        SalesOrder.objects.filter(pk=self.paid.pk).update(total_paid=999)
+
+        out = StringIO()
+        call_command('reconcile_sales_payments', stdout=out)
+        self.assertIn('1 order tidak sesuai', out.getvalue())
+        self.paid.refresh_from_db()
+        self.assertEqual(self.paid.total_paid, 999)
+
+        call_command('reconcile_sales_payments', '--fix', stdout=StringIO())
+        self.paid.refresh_from_db()
+        self.assertEqual(self.paid.total_paid, 500)
+
+    def test_add_payment_updates_status(self):
+        import tempfile
+        from django.contrib.auth.models import Group
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from django.test import override_settings
+        self.unpaid.sales_person.groups.add(Group.objects.create(name='Sales'))
+        self.client.force_login(self.unpaid.sales_person)
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            self.client.post(reverse('add_payment', args=[self.unpaid.pk]), {
+                'amount': 500,
+                'proof_of_transfer': SimpleUploadedFile('proof.jpg', b'data'),
+            })
+        self.unpaid.refresh_from_db()
+        self.assertEqual(self.unpaid.total_paid, 500)
+        self.assertEqual(self.unpaid.status, 'Sold')
+        self.assertEqual(self.unpaid.sku.status, 'Sold')
+
+
+class SKUTimelineTest(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from django.core.cache import cache
+        cache.clear()
+        from .models import PurchaseOrder, QCForm, SKU, Store
+        self.tech = User.objects.create_user('tech', password='secret')
+        self.sales = User.objects.create_user('sales', password='secret')
+        self.store = Store.objects.create(name='Store Jakarta')
+        po = PurchaseOrder.objects.create(po_number='PO-TL', approved_by_wm=self.tech)
+        self.sku = SKU.objects.create(
+            sku_id='SKU-TL', name='Mesin', po_number=po, assigned_technician=self.tech, status='Sold',
+        )
+        self.qc_form = QCForm.objects.create(
+            sku=self.sku, technician=self.tech, condition_notes='OK',
+            installation_submitted_at=timezone.now(),
+        )
+        self.order = None
+        self.add_history(2)
+
+    def add_history(self, count):
+        from .models import MovementRequest, SalesOrder
+        if self.order is None:
+            self.order = SalesOrder.objects.create(
+                customer_name='Budi', customer_address='Jl. Mawar', customer_phone='0812',
+                sku=self.sku, price=1000, sales_person=self.sales,
+            )
+        for _ in range(count):
+            self.qc_form.part_requests.create(
+                part_name='Sensor', status='PENDING_LEAD_RECEIPT', warehouse_manager=self.tech,
+                managed_at=timezone.now(), lead_receipt_at=timezone.now(), lead_receipt_approver=self.tech,
+            )
+            MovementRequest.objects.create(
+                sku_to_move=self.sku, requested_by_store=self.store, received_at=timezone.now(),
+            )
+            self.order.payments.create(amount=100, proof_of_transfer='proof.jpg')
+
+    def count_modal_queries(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('sku_history_modal', args=[self.sku.pk]))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_modal_query_count_is_constant(self):
+        self.client.force_login(self.tech)
+        before = self.count_modal_queries()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add_history(5)
+        self.assertEqual(before, self.count_modal_queries())
+
+    def test_timeline_events(self):
+        from . import timeline
+        with self.assertNumQueries(5):
+            sku = timeline.fetch_sku_graph(self.sku.pk)
+        with self.assertNumQueries(0):
+            events = timeline.build_sku_timeline(sku)
+        types = [event.type for event in events]
+        # Installation is emitted once, not once per spare part
+        self.assertEqual(types.count(timeline.INSTALL_SUBMIT), 1)
+        self.assertEqual(types.count(timeline.SPARE_PART), 6)
+        self.assertEqual(types.count(timeline.PAYMENT), 2)
+        self.assertIn('Store Jakarta', next(e.details for e in events if e.type == timeline.MOVEMENT))
+
+    def test_backfill_then_history_reads_log(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from . import timeline
+        from .models import SKUEvent
+        call_command('backfill_sku_events', stdout=StringIO())
+        reconstructed = timeline.build_sku_timeline(timeline.fetch_sku_graph(self.sku.pk))
+        self.assertEqual(SKUEvent.objects.filter(sku=self.sku).count(), len(reconstructed))
+
+        # Re-running only fills SKUs without a log
+        call_command('backfill_sku_events', stdout=StringIO())
+        self.assertEqual(SKUEvent.objects.filter(sku=self.sku).count(), len(reconstructed))
+
+        with self.assertNumQueries(2):
+            sku, events = timeline.load_sku_history(self.sku.pk)
+        self.assertEqual(
+            sorted(event.type for event in events),
+            sorted(event.type for event in reconstructed),
+        )
+
+    def test_partial_log_is_merged_with_older_history(self):
+        from datetime import timedelta
+        from io import StringIO
+        from django.core.management import call_command
+        from . import timeline
+        from .models import SKUEvent
+        from .timeline import TimelineEvent
+        # SKU in progress when the log was introduced: one new event only
+        timeline.record_sku_event(self.sku, TimelineEvent(None, timeline.SHIPPING, 'sales', 'Dikirim.'))
+        reconstructed = timeline.build_sku_timeline(timeline.fetch_sku_graph(self.sku.pk))
+
+        sku, events = timeline.load_sku_history(self.sku.pk)
+        self.assertIn(timeline.RECEIVING, [event.type for event in events])
+        self.assertEqual(len(events), len(reconstructed) + 1)
+        self.assertEqual(events[0].type, timeline.SHIPPING)
+
+        call_command('backfill_sku_events', stdout=StringIO())
+        self.assertEqual(SKUEvent.objects.filter(sku=self.sku).count(), len(reconstructed) + 1)
+        call_command('backfill_sku_events', stdout=StringIO())
+        self.assertEqual(SKUEvent.objects.filter(sku=self.sku).count(), len(reconstructed) + 1)
+        with self.assertNumQueries(2):
+            sku, events = timeline.load_sku_history(self.sku.pk)
+        self.assertEqual(len(events), len(reconstructed) + 1)
+
+        # A logged event matching a reconstructed one is not duplicated
+        payment = self.order.payments.first()
+        SKUEvent.objects.filter(sku=self.sku).exclude(event_type=timeline.SHIPPING).delete()
+        timeline.record_sku_event(self.sku, timeline.payment_event(payment, self.order))
+        SKUEvent.objects.filter(event_type=timeline.PAYMENT).update(
+            occurred_at=payment.payment_date + timedelta(seconds=1),
+        )
+        sku, events = timeline.load_sku_history(self.sku.pk)
+        self.assertEqual(len(events), len(reconstructed) + 1)
+
+    def test_repeated_qc_rejects_are_logged(self):
+        from django.contrib.auth.models import Group, User
+        from . import timeline
+        from .models import SKUEvent
+        lead = User.objects.create_user('lead', password='secret')
+        lead.groups.add(Group.objects.create(name='Lead Technician'))
+        self.client.force_login(lead)
+        for comment in ['Baut kurang', 'Kabel rusak']:
+            self.client.post(reverse('qc_verify', args=[self.qc_form.pk]), {'reject': '1', 'comments': comment})
+
+        rejects = SKUEvent.objects.filter(sku=self.sku, event_type=timeline.QC_REJECT).order_by('id')
+        self.assertEqual([event.actor for event in rejects], [lead, lead])
+        self.assertIn('Baut kurang', rejects[0].details)
+        self.assertIn('Kabel rusak', rejects[1].details)
+
+    def test_event_details_are_escaped(self):
+        from django.contrib.auth.models import Group, User
+        lead = User.objects.create_user('lead', password='secret')
+        lead.groups.add(Group.objects.create(name='Lead Technician'))
+        self.client.force_login(lead)
+        self.client.post(reverse('qc_verify', args=[self.qc_form.pk]), {
+            'reject': '1', 'comments': '<script>alert(1)</script>',
+        })
+        self.client.force_login(self.tech)
+        response = self.client.get(reverse('sku_history_modal', args=[self.sku.pk]))
+        self.assertNotContains(response, '<script>alert(1)</script>')
+        self.assertContains(response, '&lt;script&gt;alert(1)&lt;/script&gt;')
+
+        from . import timeline
+        payment = next(e for e in timeline.build_sku_timeline(timeline.fetch_sku_graph(self.sku.pk))
+                       if e.type == timeline.PAYMENT)
+        self.assertNotIn('<', payment.details)
+        self.assertEqual(payment.links[0]['url'], '/media/proof.jpg')
+
+    def test_modal_fragment_is_cached_until_related_change(self):
+        self.client.force_login(self.tech)
+        url = reverse('sku_history_modal', args=[self.sku.pk])
+        first = self.client.get(url).content
+        self.assertNotIn(b'Halo, tech', first)  # fragment only, no base.html
+
+        # Cached: only session + user lookups, no history queries or rendering
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get(url).content, first)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.order.payments.create(amount=12345, proof_of_transfer='late.jpg')
+            # Version is bumped on commit, not while the transaction is still open
+            self.assertEqual(self.client.get(url).content, first)
+        self.assertIn(b'12.345', self.client.get(url).content)
+
+
+class SKUSearchApiTest(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from .models import PurchaseOrder, SKU
+        self.tech = User.objects.create_user('tech', password='secret')
+        po = PurchaseOrder.objects.create(po_number='PO-SEARCH')
+        SKU.objects.create(sku_id='ABC-001', name='Mesin Cuci', po_number=po, assigned_technician=self.tech, status='QC')
+        SKU.objects.create(sku_id='XYZ-002', name='Abacus', po_number=po, assigned_technician=self.tech, status='Ready')
+        SKU.objects.create(sku_id='ABC-003', name='Kulkas', po_number=po, status='QC')  # no technician
+        SKU.objects.create(sku_id='ZZ-ABC', name='Oven', po_number=po, assigned_technician=self.tech, status='QC')
+
+    def search(self, term):
+        response = self.client.get(reverse('sku_search_api'), {'q': term})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_prefix_match_on_sku_id_and_name(self):
+        self.client.force_login(self.tech)
+        results = self.search('ab')
+        self.assertEqual([sku['sku_id'] for sku in results], ['ABC-001', 'XYZ-002'])
+        self.assertEqual(results[0]['technician'], 'tech')
+        self.assertEqual(results[1]['status_display'], 'Ready')
+        self.assertEqual(self.search(''), [])
+
+    def test_requires_login(self):
+        response = self.client.get(reverse('sku_search_api'), {'q': 'ab'})
+        self.assertEqual(response.status_code, 302)
+
+
+class SparePartSearchTest(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from django.core.cache import cache
+        from .models import SparePartInventory
+        cache.clear()
+        self.user = User.objects.create_user('wm', password='secret')
+        SparePartInventory.objects.create(part_name='Sensor Suhu', part_sku='SN-100', quantity_in_stock=1)
+        SparePartInventory.objects.create(part_name='Kabel Sensor', part_sku='KB-200', quantity_in_stock=9)
+        SparePartInventory.objects.create(part_name='Sénsor Tekanan', part_sku='SN-300', quantity_in_stock=5)
+        SparePartInventory.objects.create(part_name='Pompa Air', part_sku='PA-400', quantity_in_stock=50)
+
+    def search(self, term):
+        response = self.client.get(reverse('inventory_search_api'), {'q': term})
+        self.assertEqual(response.status_code, 200)
+        return [item['name'] for item in response.json()]
+
+    def test_search_text_is_normalized(self):
+        from .models import SparePartInventory
+        part = SparePartInventory.objects.get(part_sku='SN-300')
+        self.assertEqual(part.search_text, ' sensor tekanan sensortekanan sn 300 sn300 ')
+
+    def test_ranked_word_prefix_search(self):
+        self.client.force_login(self.user)
+        # Name starting with the query ranks first, then stock
+        self.assertEqual(self.search('sens'), ['Sénsor Tekanan', 'Sensor Suhu', 'Kabel Sensor'])
+        self.assertEqual(self.search('sensor suhu'), ['Sensor Suhu'])
+        self.assertEqual(self.search('SN300'), ['Sénsor Tekanan'])
+        self.assertEqual(self.search('ensor'), [])
+
+    def test_repeated_query_served_from_cache(self):
+        self.client.force_login(self.user)
+        self.search('pompa')
+        with self.assertNumQueries(2):  # session + user only
+            self.assertEqual(self.search('  Pompa '), ['Pompa Air'])
+
+
+class ExportTest(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import Group, User
+        from django.core.cache import cache
+        from .models import PurchaseOrder, SalesOrder, SKU, SparePartInventory
+        cache.clear()
+        self.wm = User.objects.create_user('wm', password='secret')
+        self.wm.groups.add(Group.objects.create(name='Warehouse Manager'))
+        sales_group = Group.objects.create(name='Sales')
+        self.sales = User.objects.create_user('sales', password='secret')
+        self.sales.groups.add(sales_group)
+        other = User.objects.create_user('other', password='secret')
+        other.groups.add(sales_group)
+        SparePartInventory.objects.create(part_name='Sensor, Suhu', part_sku='SN-1', quantity_in_stock=3)
+        SparePartInventory.objects.create(part_name='Pompa', part_sku='PA-1', quantity_in_stock=0, status='Pending_Adjustment')
+        po = PurchaseOrder.objects.create(po_number='PO-EXP')
+        sku_a = SKU.objects.create(sku_id='EXP-1', name='Mesin A', po_number=po)
+        sku_b = SKU.objects.create(sku_id='EXP-2', name='Mesin B', po_number=po)
+        SalesOrder.objects.create(sku=sku_a, sales_person=self.sales, customer_name='Budi', price=100)
+        SalesOrder.objects.create(sku=sku_b, sales_person=other, customer_name='Ani', price=200)
+
+    def export(self, dataset, **params):
+        return self.client.get(reverse('export_data', args=[dataset]), params)
+
+    def read_csv(self, response):
+        import csv
+        import io
+        self.assertEqual(response.status_code, 200)
+        content = b''.join(response.streaming_content).decode('utf-8-sig')
+        return list(csv.reader(io.StringIO(content)))
+
+    def test_csv_columns_and_status_filter(self):
+        self.client.force_login(self.wm)
+        response = self.export('inventory', columns='part_name,quantity_in_stock,status')
+        self.assertIn('attachment; filename="inventory_', response['Content-Disposition'])
+        rows = self.read_csv(response)
+        self.assertEqual(rows[0], ['Nama Part', 'Stok', 'Status'])
+        self.assertEqual(rows[1], ['Sensor, Suhu', '3', 'Out of Stock'])
+
+        rows = self.read_csv(self.export('inventory', columns='part_sku', status='Pending_Adjustment'))
+        self.assertEqual(rows, [['SKU Part'], ['PA-1']])
+
+    def test_date_filter_and_bad_params(self):
+        self.client.force_login(self.wm)
+        today = timezone.localdate()
+        self.assertEqual(len(self.read_csv(self.export('skus', date_from=today.isoformat()))), 3)
+        self.assertEqual(len(self.read_csv(self.export('skus', date_to=(today - timezone.timedelta(days=1)).isoformat()))), 1)
+        self.assertEqual(self.export('skus', columns='nope').status_code, 400)
+        self.assertEqual(self.export('skus', date_from='kemarin').status_code, 400)
+
+    def test_xlsx_is_valid_workbook(self):
+        import io
+        import zipfile
+        self.client.force_login(self.wm)
+        response = self.export('skus', columns='sku_id,name', format='xlsx')
+        self.assertEqual(response.status_code, 200)
+        workbook = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertIsNone(workbook.testzip())
+        sheet = workbook.read('xl/worksheets/sheet1.xml').decode()
+        self.assertIn('EXP-1', sheet)
+        self.assertIn('Mesin B', sheet)
+
+    def test_formula_like_text_is_neutralized(self):
+        import io
+        import zipfile
+        from .models import SalesOrder
+        SalesOrder.objects.filter(customer_name='Budi').update(customer_name='=HYPERLINK("http://x")')
+        self.client.force_login(self.sales)
+        rows = self.read_csv(self.export('sales_orders', columns='customer_name'))
+        self.assertIn(['\'=HYPERLINK("http://x")'], rows)
+        response = self.export('sales_orders', columns='customer_name', format='xlsx')
+        workbook = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertIn('>\'=HYPERLINK', workbook.read('xl/worksheets/sheet1.xml').decode())
+
+    def test_sales_sees_only_own_orders(self):
+        self.client.force_login(self.sales)
+        rows = self.read_csv(self.export('sales_orders', columns='customer_name'))
+        self.assertEqual(rows, [['Customer'], ['Budi']])
+        self.assertEqual(self.export('inventory').status_code, 403)
+
+
+class PurchaseOrderImportTest(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import Group, User
+        from django.core.cache import cache
+        cache.clear()
+        self.user = User.objects.create_user('purchasing', password='secret')
+        self.user.groups.add(Group.objects.create(name='Purchasing'))
+        self.client.force_login(self.user)
+
+    def upload(self, name, content, po_number='PO-IMP-1'):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        return self.client.post(reverse('po_import'), {
+            'po_number': po_number,
+            'file': SimpleUploadedFile(name, content),
+        })
+
+    def test_csv_import_creates_po_and_details(self):
+        from decimal import Decimal
+        from .models import PurchaseOrder
+        content = (
+            'SKU ID Mesin*,Nama Mesin*,Warna*,Tahun (Opsional),Harga PO per Unit (Rp)*\n'
+            'M-1,Mesin Cuci,Putih,2020,1500000\n'
+            '\n'
+            'M-2,Kulkas,Hitam,,2500001\n'
+        ).encode()
+        response = self.upload('po.csv', content)
+        self.assertRedirects(response, reverse('dashboard'), fetch_redirect_response=False)
+        po = PurchaseOrder.objects.get(po_number='PO-IMP-1')
+        self.assertEqual(po.status, 'Pending_Approval')
+        self.assertEqual(po.expected_sku_count, 2)
+        self.assertEqual(po.total_po_price, Decimal('4000001'))
+        details = list(po.sku_details.order_by('machine_sku_id').values_list('machine_sku_id', 'year', 'po_price'))
+        self.assertEqual(details, [('M-1', 2020, Decimal('1500000')), ('M-2', None, Decimal('2500001'))])
+
+    def test_row_errors_are_reported_and_nothing_saved(self):
+        from .models import PurchaseOrder, SKUDetailPO
+        content = (
+            'machine_sku_id;machine_name;color;year;po_price\n'
+            'M-1;Mesin;Putih;2020;abc\n'
+            'M-1;Mesin;;2020;1000\n'
+            'M-3;Mesin;Merah;tahun;1000\n'
+        ).encode()
+        response = self.upload('po.csv', content)
+        self.assertEqual(response.status_code, 200)
+        lines = [line for line, _ in response.context['row_errors']]
+        self.assertEqual(lines, [2, 3, 3, 4])
+        self.assertFalse(PurchaseOrder.objects.exists())
+        self.assertFalse(SKUDetailPO.objects.exists())
+
+    def test_xlsx_import(self):
+        from . import exports
+        from .models import PurchaseOrder
+        header = ['machine_sku_id', 'machine_name', 'color', 'po_price']
+        rows = [['X-%d' % i, 'Mesin', 'Biru', 1000] for i in range(3)]
+        content = b''.join(exports.stream_xlsx(header, iter(rows), sheet_name='PO'))
+        self.upload('po.xlsx', content, po_number='PO-XLSX')
+        po = PurchaseOrder.objects.get(po_number='PO-XLSX')
+        self.assertEqual(po.sku_details.count(), 3)
+        self.assertEqual(po.total_po_price, 3000)
+
+    def test_existing_sku_ids_are_rejected(self):
+        from .models import PurchaseOrder, SKU, SKUDetailPO
+        other = PurchaseOrder.objects.create(po_number='PO-OLD')
+        SKUDetailPO.objects.create(purchase_order=other, machine_sku_id='M-1', machine_name='Mesin', color='Putih', po_price=1)
+        SKU.objects.create(sku_id='M-2', name='Mesin', po_number=other)
+        content = (
+            'machine_sku_id,machine_name,color,po_price\n'
+            'M-1,Mesin,Putih,1000\n'
+            'M-2,Mesin,Putih,1000\n'
+            'M-3,Mesin,Putih,1000\n'
+        ).encode()
+        response = self.upload('po.csv', content)
+        self.assertEqual([line for line, _ in response.context['row_errors']], [2, 3])
+        self.assertFalse(PurchaseOrder.objects.filter(po_number='PO-IMP-1').exists())
+
+    def test_malformed_xlsx_is_rejected(self):
+        import io
+        import zipfile
+        for cells in ('<c r="A1" t="s"><v>7</v></c>', '<c r="1A"><v>1</v></c>', '<c r="A1" t="s"><v>x</v></c>'):
+            buffer = io.BytesIO()
+            with zipfile.ZipFile(buffer, 'w') as workbook:
+                workbook.writestr('xl/worksheets/sheet1.xml', (
+                    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                    f'<sheetData><row r="1">{cells}</row></sheetData></worksheet>'
+                ))
+            response = self.upload('po.xlsx', buffer.getvalue())
+            self.assertEqual(response.status_code, 200)
+            self.assertFormError(response.context['form'], 'file', 'File XLSX tidak valid.')
+
+    def test_bad_file_and_duplicate_po(self):
+        from .models import PurchaseOrder
+        PurchaseOrder.objects.create(po_number='PO-IMP-1')
+        response = self.upload('po.csv', b'machine_sku_id,color\nM-1,Putih\n')
+        self.assertFormError(response.context['form'], 'po_number', 'Nomor PO sudah terdaftar.')
+        response = self.upload('po.pdf', b'x', po_number='PO-NEW')
+        self.assertFormError(response.context['form'], 'file', 'Format file harus .csv atau .xlsx.')
+
+    def test_po_create_form_total_uses_decimal(self):
+        from .models import PurchaseOrder
+        data = {'po_number': 'PO-FORM', 'expected_sku_count': 2, 'total_po_price': '4503599627'}
+        for i, price in enumerate(['4503599626', '1']):
+            data.update({
+                f'sku_details[{i}][machine_sku_id]': f'F-{i}',
+                f'sku_details[{i}][machine_name]': 'Mesin',
+                f'sku_details[{i}][color]': 'Putih',
+                f'sku_details[{i}][po_price]': price,
+            })
+        response = self.client.post(reverse('po_create'), data)
+        self.assertRedirects(response, reverse('dashboard'), fetch_redirect_response=False)
+        self.assertEqual(PurchaseOrder.objects.get(po_number='PO-FORM').sku_details.count(), 2)
+
+
+class BatchReceivingTest(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import Group, User
+        from django.core.cache import cache
+        from .models import PurchaseOrder, Rack, SKUDetailPO
+        cache.clear()
+        self.wm = User.objects.create_user('wm', password='secret')
+        self.wm.groups.add(Group.objects.create(name='Warehouse Manager'))
+        tech_group = Group.objects.create(name='Technician')
+        self.tech_a = User.objects.create_user('tech_a', password='secret')
+        self.tech_b = User.objects.create_user('tech_b', password='secret')
+        tech_group.user_set.add(self.tech_a, self.tech_b)
+        self.po = PurchaseOrder.objects.create(po_number='PO-RCV', expected_sku_count=4, status='Pending')
+        self.details = SKUDetailPO.objects.bulk_create([
+            SKUDetailPO(purchase_order=self.po, machine_sku_id=f'R-{i}', machine_name='Mesin', color='Putih', po_price=1)
+            for i in range(4)
+        ])
+        self.racks = Rack.objects.bulk_create([Rack(rack_location=f'A1-0{i}') for i in range(1, 6)])
+        self.client.force_login(self.wm)
+
+    def post(self, data):
+        return self.client.post(reverse('receiving_detail', args=[self.po.id]), data)
+
+    def test_selected_batch_with_manual_and_auto_assignments(self):
+        from .models import Rack, SKU, SKUEvent
+        data = {'receive_batch': '1', 'batch_detail': [self.details[0].id, self.details[1].id]}
+        data[f'batch_technician_{self.details[0].id}'] = self.tech_b.id
+        data[f'batch_rack_{self.details[0].id}'] = 'a1-05 '
+        data[f'batch_technician_{self.details[1].id}'] = 'auto'
+        data[f'batch_rack_{self.details[1].id}'] = ''
+        self.post(data)
+
+        first, second = SKU.objects.order_by('sku_id')
+        self.assertEqual((first.assigned_technician, first.shelf_location_id), (self.tech_b, self.racks[4].id))
+        # Auto: least-loaded technician, first free rack by location
+        self.assertEqual((second.assigned_technician, second.shelf_location_id), (self.tech_a, self.racks[0].id))
+        self.assertEqual(Rack.objects.get(pk=self.racks[4].id).occupied_by_sku, first)
+        self.assertEqual(SKUEvent.objects.filter(sku=second).count(), 2)
+        self.po.refresh_from_db()
+        self.assertEqual(self.po.status, 'Delivered')
+
+    def test_receive_all_auto_finishes_po(self):
+        from .models import Rack, SKU
+        response = self.client.get(reverse('receiving_detail', args=[self.po.id]))
+        self.assertContains(response, 'name="batch_rack_%d"' % self.details[3].id)
+        # Rack choices are listed once for the whole table, not per row
+        self.assertContains(response, '<option value="A1-01">', count=1)
+        self.post({'receive_all_auto': '1'})
+        self.assertEqual(SKU.objects.filter(po_number=self.po).count(), 4)
+        self.assertEqual(Rack.objects.filter(status='Used').count(), 4)
+        self.assertEqual(
+            sorted(SKU.objects.values_list('assigned_technician__username', flat=True)),
+            ['tech_a', 'tech_a', 'tech_b', 'tech_b'],
+        )
+        self.po.refresh_from_db()
+        self.assertEqual(self.po.status, 'Finished')
+
+    def test_invalid_rows_reject_whole_batch(self):
+        from .models import Rack, SKU
+        Rack.objects.filter(pk=self.racks[0].id).update(status='Used')
+        data = {'receive_batch': '1', 'batch_detail': [self.details[0].id, self.details[1].id]}
+        data[f'batch_rack_{self.details[0].id}'] = self.racks[0].rack_location
+        data[f'batch_rack_{self.details[1].id}'] = self.racks[1].rack_location
+        data[f'batch_technician_{self.details[1].id}'] = self.wm.id
+        response = self.post(data)
+        errors = [str(message) for message in response.wsgi_request._messages]
+        self.assertEqual(len(errors), 2)
+        self.assertFalse(SKU.objects.exists())
+
+
+class RackSlottingTest(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import Group, User
+        from django.core.cache import cache
+        from .models import PurchaseOrder, Rack, SKU
+        cache.clear()
+        self.racks = {
+            location: Rack.objects.create(rack_location=location)
+            for location in ['A1-01', 'A1-02', 'A2-01', 'B1-01', 'B1-02', 'B1-03']
+        }
+        self.po = PurchaseOrder.objects.create(po_number='PO-SLOT')
+        self.tech = User.objects.create_user('tech', password='secret')
+        self.tech.groups.add(Group.objects.create(name='Technician'))
+        self.sku = SKU.objects.create(sku_id='S-1', name='Mesin', po_number=self.po, assigned_technician=self.tech, status='QC')
+
+    def occupy(self, location, sku):
+        rack = self.racks[location]
+        rack.status, rack.occupied_by_sku = 'Used', sku
+        rack.save()
+
+    def test_policies(self):
+        from . import slotting
+        from .models import SKU
+        # fill_first: A2 has the fewest free slots
+        self.assertEqual(slotting.propose().rack_location, 'A2-01')
+        # nearest_zone beats fill_first
+        self.assertEqual(slotting.propose(near='B1-09').rack_location, 'B1-01')
+        # keep_po_together beats nearest_zone
+        other = SKU.objects.create(sku_id='S-2', name='Mesin', po_number=self.po)
+        self.occupy('B1-02', other)
+        self.assertEqual(slotting.propose(sku=self.sku, near='A1').rack_location, 'B1-01')
+        self.assertEqual(slotting.zone_distance('A1', 'A3'), 3)
+        self.assertLess(slotting.zone_distance('A1', 'A9'), slotting.zone_distance('A1', 'B1'))
+
+    def test_allocate_skips_racks_taken_behind_index(self):
+        from django.db import transaction
+        from . import slotting
+        from .models import Rack
+        slotting.get_free_slot_index()
+        # Changed without signals: the index is now stale
+        Rack.objects.filter(rack_location='A2-01').update(status='Used')
+        with transaction.atomic():
+            racks = slotting.allocate(2)
+        self.assertEqual([rack.rack_location for rack in racks], ['A1-01', 'A1-02'])
+        Rack.objects.exclude(rack_location='B1-03').update(status='Used')
+        with transaction.atomic(), self.assertRaises(slotting.SlottingError):
+            slotting.allocate(2)
+
+    def test_qc_form_auto_rack(self):
+        from .models import Rack
+        self.client.force_login(self.tech)
+        response = self.client.get(reverse('qc_form', args=[self.sku.id]))
+        self.assertContains(response, 'Otomatis (Rekomendasi: A2-01)')
+        self.client.post(reverse('qc_form', args=[self.sku.id]), {
+            'condition_notes': 'OK', 'selected_rack_id': 'auto',
+        })
+        self.sku.refresh_from_db()
+        self.assertEqual(self.sku.status, 'QC_PENDING')
+        self.assertEqual(self.sku.shelf_location.rack_location, 'A2-01')
+        self.assertEqual(Rack.objects.get(rack_location='A2-01').occupied_by_sku, self.sku)
+
+        # A rack that is already used is rejected
+        from .models import SKU
+        self.occupy('A1-01', SKU.objects.create(sku_id='S-3', name='Mesin', po_number=self.po))
+        self.sku.status = 'QC'
+        self.sku.save()
+        response = self.client.post(reverse('qc_form', args=[self.sku.id]), {
+            'condition_notes': 'OK', 'selected_rack_id': self.racks['A1-01'].id,
+        })
+        self.assertRedirects(response, reverse('qc_form', args=[self.sku.id]), fetch_redirect_response=False)
+
+    def test_place_and_release_keep_both_sides_consistent(self):
+        from django.db import IntegrityError, transaction
+        from . import slotting
+        from .models import Rack
+        rack, released = slotting.place_sku(self.sku, self.racks['A1-01'].id)
+        self.assertEqual(released, [])
+        rack, released = slotting.place_sku(self.sku, self.racks['B1-01'].id)
+        self.assertEqual([old.rack_location for old in released], ['A1-01'])
+        self.sku.refresh_from_db()
+        self.assertEqual(self.sku.shelf_location, rack)
+        self.assertEqual(Rack.objects.get(rack_location='A1-01').status, 'Available')
+        self.assertEqual(Rack.objects.get(rack_location='B1-01').occupied_by_sku, self.sku)
+
+        self.assertEqual(slotting.release_sku(self.sku), [rack])
+        self.assertIsNone(self.sku.shelf_location)
+        self.assertEqual(Rack.objects.filter(status='Used').count(), 0)
+
+        # Occupied racks must be 'Used'
+        with transaction.atomic(), self.assertRaises(IntegrityError):
+            Rack.objects.filter(pk=rack.pk).update(occupied_by_sku=self.sku)
+
+    def test_reconcile_racks_command(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from . import timeline
+        from .models import Rack, SKU
+        SKU.objects.filter(pk=self.sku.pk).update(status='Ready')
+        Rack.objects.filter(pk=self.racks['A1-01'].pk).update(status='Used', occupied_by_sku=self.sku)
+        version = timeline.get_history_version(self.sku.pk)
+        out = StringIO()
+        call_command('reconcile_racks', stdout=out)
+        self.assertIn('1 ketidaksesuaian ditemukan', out.getvalue())
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('reconcile_racks', '--fix', stdout=out)
+        self.sku.refresh_from_db()
+        self.assertEqual(self.sku.shelf_location_id, self.racks['A1-01'].pk)
+        # Fixed through save(), so the SKU signals ran
+        self.assertNotEqual(timeline.get_history_version(self.sku.pk), version)
+        out = StringIO()
+        call_command('reconcile_racks', stdout=out)
+        self.assertIn('Semua okupansi rak sesuai', out.getvalue())
+
+    def test_benchmark_command_single_thread(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from .models import Rack
+        out = StringIO()
+        call_command('benchmark_rack_allocation', threads=1, rounds=20, seed=1, stdout=out)
+        self.assertIn('Tidak ada double booking', out.getvalue())
+        self.assertFalse(Rack.objects.filter(rack_location__startswith='ZZ99-').exists())
+
+
+@skipUnlessDBFeature('has_select_for_update_skip_locked')
+class RackAllocationConcurrencyTest(TransactionTestCase):
+    def test_no_double_booking_under_contention(self):
+        from io import StringIO
+        from django.core.management import call_command
+        out = StringIO()
+        call_command('benchmark_rack_allocation', threads=8, rounds=25, stdout=out)
+        self.assertIn('Tidak ada double booking', out.getvalue())
+
+
+class RackMapTest(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import Group, User
+        from django.core.cache import cache
+        from .models import PurchaseOrder, Rack, SKU
+        cache.clear()
+        self.user = User.objects.create_user('wm', password='secret')
+        self.user.groups.add(Group.objects.create(name='Warehouse Manager'))
+        self.client.force_login(self.user)
+        po = PurchaseOrder.objects.create(po_number='PO-MAP')
+        self.racks = [Rack.objects.create(rack_location=f'A1-0{n}') for n in range(1, 4)]
+        self.skus = [SKU.objects.create(sku_id=f'M-{n}', name='Mesin', po_number=po, status='QC') for n in range(2)]
+        for rack, sku in zip(self.racks, self.skus):
+            rack.status, rack.occupied_by_sku = 'Used', sku
+            rack.save()
+
+    def test_snapshot_is_one_joined_query(self):
+        from . import rack_map
+        with self.assertNumQueries(1):
+            data = rack_map.snapshot()
+        self.assertEqual(data['locations'], ['A1-01', 'A1-02', 'A1-03'])
+        self.assertEqual([data['state_codes'][state] for state in data['states']], ['Used', 'Used', 'Available'])
+        self.assertEqual(data['occupied'], {0: ['M-0', 'Mesin', 'In QC'], 1: ['M-1', 'Mesin', 'In QC']})
+
+    def test_delta_endpoint(self):
+        from datetime import timedelta
+        from .models import Rack
+        url = reverse('rack_map_api')
+        cursor = self.client.get(url).json()['cursor']
+        # Older than the overlap window: unchanged racks are not returned
+        Rack.objects.update(updated_at=timezone.now() - timedelta(minutes=5))
+        data = self.client.get(url, {'since': cursor}).json()
+        self.assertEqual(data['changed'], [])
+
+        rack = self.racks[2]
+        rack.status, rack.occupied_by_sku = 'Used', None
+        rack.save()
+        data = self.client.get(url, {'since': cursor}).json()
+        self.assertEqual(data['total'], 3)
+        self.assertEqual([change[1] for change in data['changed']], ['A1-03'])
+        self.assertEqual(self.client.get(url, {'since': 'kemarin'}).status_code, 400)
+
+    def test_delta_includes_occupant_status_change(self):
+        from datetime import timedelta
+        from .models import Rack
+        url = reverse('rack_map_api')
+        cursor = self.client.get(url).json()['cursor']
+        Rack.objects.update(updated_at=timezone.now() - timedelta(minutes=5))
+        sku = self.skus[1]
+        sku.status = 'Ready'
+        sku.save(update_fields=['status'])
+        # Saves that do not touch status/name leave the rack alone
+        self.skus[0].save(update_fields=['shelved_at'])
+        data = self.client.get(url, {'since': cursor}).json()
+        self.assertEqual([(change[1], change[3]) for change in data['changed']], [('A1-02', ['M-1', 'Mesin', 'Ready'])])
+
+    def test_grid_view_queries_do_not_grow_with_racks(self):
+        from .models import Rack
+        url = reverse('rack_grid_view')
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as before:
+            response = self.client.get(url)
+        self.assertContains(response, 'M-1')
+        self.assertEqual(sum('"app_rack"' in query['sql'] for query in before.captured_queries), 1)
+        Rack.objects.create(rack_location='B1-01')
+        with self.assertNumQueries(len(before.captured_queries)):
+            self.client.get(url)
+
+    def test_layout_columns_and_cached_grid(self):
+        from . import rack_map
+        from .locations import parse_rack_location
+        from .models import Rack
+        self.assertEqual(parse_rack_location('AB12-07'), ('AB12', 'AB', 7))
+        self.assertEqual(parse_rack_location('GUDANG'), ('GUDANG', 'GUDANG', None))
+        rack = self.racks[0]
+        self.assertEqual((rack.zone, rack.row, rack.level), ('A1', 'A', 1))
+        rack.rack_location = 'C2-05'
+        rack.save(update_fields=['rack_location'])
+        rack.refresh_from_db()
+        self.assertEqual((rack.zone, rack.row, rack.level), ('C2', 'C', 5))
+
+        grid = rack_map.grid()
+        self.assertEqual(list(grid), ['A', 'C'])
+        self.assertEqual([tile.rack_location for tile in grid['A']], ['A1-02', 'A1-03'])
+        self.assertEqual(grid['A'][0].sku_id, 'M-1')
+        # Layout is cached; only the occupancy overlay hits the database
+        with self.assertNumQueries(1):
+            rack_map.grid()
+        with self.captureOnCommitCallbacks(execute=True):
+            Rack.objects.create(rack_location='A1-04')
+        self.assertEqual(len(rack_map.get_layout()), 4)
+
+
+class DocumentRenderTest(TestCase):
+    def setUp(self):
+        import tempfile
+        from django.contrib.auth.models import Group, User
+        from .models import PurchaseOrder, Quotation, SalesOrder, SKU
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.settings_override = self.settings(MEDIA_ROOT=media.name, DOCUMENT_RENDER_WORKERS=0)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        self.media_root = media.name
+        from . import documents
+        documents.reset_resources()
+        self.addCleanup(documents.reset_resources)
+
+        self.sales = User.objects.create_user('sales', password='secret')
+        self.sales.groups.add(Group.objects.create(name='Sales'))
+        self.client.force_login(self.sales)
+        po = PurchaseOrder.objects.create(po_number='PO-DOC')
+        sku = SKU.objects.create(sku_id='SKU-DOC', name='Mesin Kopi', po_number=po, status='Booked')
+        self.order = SalesOrder.objects.create(
+            customer_name='Budi Santoso', customer_address='Jl. Mawar No. 1, Jakarta', customer_phone='0812',
+            sku=sku, price=1500000, sales_person=self.sales,
+        )
+        self.quotation = Quotation.objects.create(
+            customer_name='Sari', customer_address='Jl. Melati', customer_phone='0813',
+            sku=sku, price=1500000, sales_person=self.sales,
+        )
+
+    def cached_files(self, doc_type, object_id):
+        import os
+        directory = os.path.join(self.media_root, 'documents', doc_type, str(object_id))
+        return sorted(os.listdir(directory)) if os.path.isdir(directory) else []
+
+    def test_pdf_is_cached_until_inputs_change(self):
+        from unittest import mock
+        from . import documents
+        url = reverse('print_invoice_a4', args=[self.order.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+        self.assertIn('INVOICE_ORDER_', response['Content-Disposition'])
+        first = self.cached_files('invoice', self.order.pk)
+        self.assertEqual(len(first), 1)
+
+        with mock.patch.object(documents, '_render_to_cache', side_effect=AssertionError('re-rendered')):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+        self.order.customer_address = 'Jl. Kenanga No. 2'
+        self.order.save()
+        self.client.get(url)
+        # The old version stays during the grace period (a parallel request may be opening it)
+        second = self.cached_files('invoice', self.order.pk)
+        self.assertEqual(len(second), 2)
+        self.assertIn(first[0], second)
+
+        import os
+        import time
+        directory = os.path.join(self.media_root, 'documents', 'invoice', str(self.order.pk))
+        old = time.time() - 3600
+        for name in second:
+            os.utime(os.path.join(directory, name), (old, old))
+        self.order.customer_address = 'Jl. Anggrek No. 3'
+        self.order.save()
+        self.client.get(url)
+        third = self.cached_files('invoice', self.order.pk)
+        self.assertEqual(len(third), 1)
+        self.assertNotIn(third[0], second)
+
+    def test_pdf_streamed_from_disk_with_etag(self):
+        url = reverse('print_invoice_a4', args=[self.order.pk])
+        response = self.client.get(url)
+        self.assertTrue(response.streaming)
+        self.assertEqual(int(response['Content-Length']), len(b''.join(response.streaming_content)))
+        etag = response['ETag']
+        self.assertIn('private', response['Cache-Control'])
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.order.customer_name = 'Budi S.'
+        self.order.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_label_and_quotation(self):
+        response = self.client.get(reverse('print_order_label', args=[self.order.pk]))
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertIn('attachment', response['Content-Disposition'])
+        response = self.client.get(reverse('print_quotation_a4', args=[self.quotation.pk]))
+        self.assertIn('inline', response['Content-Disposition'])
+        self.assertEqual(len(self.cached_files('quotation', self.quotation.pk)), 1)
+
+    def test_logo_and_metrics_loaded_once_per_process(self):
+        from unittest import mock
+        from . import documents
+        with mock.patch.object(documents, 'find_static', wraps=documents.find_static) as finder, \
+                mock.patch.object(documents, 'ImageReader', wraps=documents.ImageReader) as reader:
+            self.client.get(reverse('print_order_label', args=[self.order.pk]))
+            self.client.get(reverse('print_invoice_a4', args=[self.order.pk]))
+            self.client.get(reverse('print_quotation_a4', args=[self.quotation.pk]))
+        self.assertEqual(finder.call_count, 1)
+        self.assertLessEqual(reader.call_count, 1)
+        resources = documents.get_resources()
+        self.assertIsNotNone(resources.logo)
+
+    def test_layout_plan_compiled_once_and_shared(self):
+        import io
+        from types import SimpleNamespace
+        from unittest import mock
+        from . import documents
+        documents._plans.clear()
+        with mock.patch.object(documents, 'compile_layout', wraps=documents.compile_layout) as compile_layout:
+            self.client.get(reverse('print_invoice_a4', args=[self.order.pk]))
+            self.client.get(reverse('print_order_label', args=[self.order.pk]))
+            plan = documents.get_plan('invoice')
+        self.assertEqual(compile_layout.call_count, 2)
+
+        # One compiled plan renders a multi-page bulk run
+        data = SimpleNamespace(**documents.collect_invoice(self.order))
+        target = io.BytesIO()
+        plan.render(target, [data, data, data], documents.get_resources().logo)
+        self.assertEqual(target.getvalue().count(b'/Type /Page\n'), 3)
+
+    def test_pending_render_answers_202(self):
+        import threading
+        from unittest import mock
+        from . import documents
+        release = threading.Event()
+        original = documents._render_to_cache
+
+        def slow_render(document):
+            release.wait(5)
+            return original(document)
+
+        with self.settings(DOCUMENT_RENDER_WORKERS=1, DOCUMENT_RENDER_WAIT=0.05), \
+                mock.patch.object(documents, '_render_to_cache', side_effect=slow_render):
+            document = documents.prepare('order_label', self.order)
+            self.assertIsNone(documents.get_pdf(document))
+            # The same document is queued only once
+            self.assertIs(documents.submit(document), documents.submit(document))
+            release.set()
+            self.assertTrue(documents.submit(document).result(5).endswith('.pdf'))
+
+    def test_file_removed_after_lookup_answers_202(self):
+        from unittest import mock
+        from . import documents
+        with mock.patch.object(documents, 'get_pdf', return_value='/nonexistent/removed.pdf'):
+            response = self.client.get(reverse('print_order_label', args=[self.order.pk]))
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response['Refresh'], '2')
+
+    def test_batch_labels_one_pdf(self):
+        from unittest import mock
+        from . import documents
+        from .models import SalesOrder, SKU
+        other = SalesOrder.objects.create(
+            customer_name='Sari', customer_address='Jl. Melati', customer_phone='0813',
+            sku=SKU.objects.create(sku_id='SKU-DOC-2', name='Grinder', po_number=self.order.sku.po_number),
+            price=500000, sales_person=self.sales, status='Sold',
+        )
+        url = reverse('print_order_labels')
+        with mock.patch.object(documents, 'ImageReader', wraps=documents.ImageReader) as reader:
+            response = self.client.get(url, {'ids': f'{self.order.pk},{other.pk}'})
+        pdf = b''.join(response.streaming_content)
+        self.assertEqual(pdf.count(b'/Type /Page\n'), 2)
+        # The logo is decoded once for the whole batch
+        self.assertLessEqual(reader.call_count, 1)
+
+        response = self.client.get(url, {'filter': 'unshipped'})
+        self.assertEqual(b''.join(response.streaming_content).count(b'/Type /Page\n'), 1)
+        self.assertEqual(self.client.get(url, {'ids': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get(url).status_code, 400)
+
+
+class InstallationPhotoPipelineTest(TestCase):
+    def setUp(self):
+        import tempfile
+        from django.contrib.auth.models import User
+        from .models import PurchaseOrder, QCForm, SKU
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings_override = self.settings(MEDIA_ROOT=media.name, IMAGE_PROCESS_WORKERS=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        tech = User.objects.create_user('tech', password='secret')
+        po = PurchaseOrder.objects.create(po_number='PO-IMG')
+        sku = SKU.objects.create(sku_id='SKU-IMG', name='Mesin', po_number=po, assigned_technician=tech)
+        self.qc_form = QCForm.objects.create(sku=sku, technician=tech, condition_notes='OK')
+
+    def upload(self, name, content, photo_type='before'):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from .models import InstallationPhoto
+        with self.captureOnCommitCallbacks(execute=True):
+            photo = InstallationPhoto.objects.create(
+                qc_form=self.qc_form, image=SimpleUploadedFile(name, content), photo_type=photo_type,
+            )
+        photo.refresh_from_db()
+        return photo
+
+    def test_derivatives_are_small_rotated_and_exif_free(self):
+        import io
+        from PIL import Image
+        source = Image.new('RGB', (2400, 1200), 'red')
+        exif = source.getexif()
+        exif[0x0112] = 6  # Orientation: rotate 90 (portrait phone photo)
+        exif[0x010F] = 'PhoneMaker'
+        buffer = io.BytesIO()
+        source.save(buffer, 'JPEG', exif=exif)
+
+        photo = self.upload('phone.jpg', buffer.getvalue())
+        self.assertTrue(photo.thumbnail and photo.preview)
+        with photo.thumbnail.open('rb') as file, Image.open(file) as thumbnail:
+            self.assertLessEqual(max(thumbnail.size), 320)
+            self.assertGreater(thumbnail.height, thumbnail.width)
+            self.assertEqual(len(thumbnail.getexif()), 0)
+        with photo.preview.open('rb') as file, Image.open(file) as preview:
+            self.assertLessEqual(max(preview.size), 1600)
+        # The original is kept untouched
+        self.assertEqual(photo.image.size, len(buffer.getvalue()))
+
+    def test_non_image_upload_is_skipped_and_gallery_falls_back(self):
+        from django.template.loader import render_to_string
+        video = self.upload('clip.mp4', b'\x00\x00\x00\x18ftypmp42', photo_type='after')
+        self.assertFalse(video.thumbnail)
+
+        import io
+        from PIL import Image
+        buffer = io.BytesIO()
+        Image.new('RGB', (800, 600)).save(buffer, 'PNG')
+        photo = self.upload('after.png', buffer.getvalue(), photo_type='after')
+        html = render_to_string('app/_includes/final_check_details.html', {
+            'qc_form': self.qc_form, 'photo_groups': [('Sesudah', [photo, video])],
+        })
+        self.assertIn(photo.thumbnail.url, html)
+        self.assertIn('loading="lazy"', html)
+        self.assertIn(video.image.url, html)
+        self.assertIn('Pratinjau belum tersedia', html)
+
+    def test_replaced_image_is_reprocessed_and_skips_are_recorded(self):
+        import io
+        from unittest import mock
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from PIL import Image
+        from . import images
+
+        def png(size):
+            buffer = io.BytesIO()
+            Image.new('RGB', size, 'blue').save(buffer, 'PNG')
+            return buffer.getvalue()
+
+        photo = self.upload('first.png', png((800, 600)))
+        old_preview, old_thumbnail = photo.preview.name, photo.thumbnail.name
+        storage = photo.thumbnail.storage
+        self.assertEqual(photo.derived_from, photo.image.name)
+
+        # Re-saving without a new image does not queue anything
+        with mock.patch.object(images, 'submit') as submit, self.captureOnCommitCallbacks(execute=True):
+            photo.remarks = 'Dicek ulang'
+            photo.save()
+        submit.assert_not_called()
+
+        # Replacing the image (e.g. through admin) regenerates and removes the old files
+        photo.image = SimpleUploadedFile('second.png', png((600, 900)))
+        with self.captureOnCommitCallbacks(execute=True):
+            photo.save()
+        photo.refresh_from_db()
+        self.assertEqual(photo.derived_from, photo.image.name)
+        self.assertNotEqual(photo.thumbnail.name, old_thumbnail)
+        with photo.thumbnail.open('rb') as file, Image.open(file) as thumbnail:
+            self.assertGreater(thumbnail.height, thumbnail.width)
+        self.assertFalse(storage.exists(old_preview))
+        self.assertFalse(storage.exists(old_thumbnail))
+
+        # A non-image file is recorded as processed and not queued again on every save
+        video = self.upload('clip.mp4', b'\x00\x00\x00\x18ftypmp42', photo_type='after')
+        self.assertFalse(video.thumbnail)
+        self.assertEqual(video.derived_from, video.image.name)
+        with mock.patch.object(images, 'submit') as submit, self.captureOnCommitCallbacks(execute=True):
+            video.save()
+        submit.assert_not_called()
+
+        # Replacing an image with a non-image drops the stale derivatives
+        current_thumbnail = photo.thumbnail.name
+        photo.image = SimpleUploadedFile('clip2.mp4', b'\x00\x00\x00\x18ftypmp42')
+        with self.captureOnCommitCallbacks(execute=True):
+            photo.save()
+        photo.refresh_from_db()
+        self.assertFalse(photo.thumbnail or photo.preview)
+        self.assertFalse(storage.exists(current_thumbnail))
+
+
+class ChunkedUploadTest(TestCase):
+    def setUp(self):
+        import tempfile
+        from django.contrib.auth.models import Group, User
+        from .models import PurchaseOrder, SalesOrder, SKU
+        media, chunks = tempfile.TemporaryDirectory(), tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.addCleanup(chunks.cleanup)
+        self.chunk_dir = chunks.name
+        settings_override = self.settings(
+            MEDIA_ROOT=media.name, CHUNKED_UPLOAD_DIR=chunks.name, CHUNKED_UPLOAD_CHUNK_SIZE=4,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.sales = User.objects.create_user('sales', password='secret')
+        self.sales.groups.add(Group.objects.create(name='Sales'))
+        po = PurchaseOrder.objects.create(po_number='PO-UPLOAD')
+        self.order = SalesOrder.objects.create(
+            customer_name='Budi', customer_address='Jl. Mawar', customer_phone='0812',
+            sku=SKU.objects.create(sku_id='SKU-UPLOAD', name='Mesin', po_number=po, status='Shop'),
+            price=500, sales_person=self.sales,
+        )
+        self.client.force_login(self.sales)
+
+    def patch(self, url, data, offset):
+        return self.client.patch(url, data, content_type='application/octet-stream', HTTP_UPLOAD_OFFSET=str(offset))
+
+    def test_resumable_upload_is_moved_into_payment(self):
+        content = b'0123456789'
+        response = self.client.post(reverse('upload_start'), {
+            'filename': '../proof.pdf', 'size': len(content), 'field': 'proof_of_transfer',
+        })
+        self.assertEqual(response.status_code, 201)
+        state = response.json()
+        url = state['url']
+        self.assertEqual((state['offset'], state['chunk_size']), (0, 4))
+
+        self.assertEqual(self.patch(url, content[:4], 0).json()['offset'], 4)
+        # A retried (duplicate) chunk is rejected with the server offset
+        conflict = self.patch(url, content[:4], 0)
+        self.assertEqual((conflict.status_code, conflict.json()['offset']), (409, 4))
+        self.assertEqual(self.patch(url, content[4:9], 4).status_code, 413)
+        self.patch(url, content[4:8], 4)
+        self.assertEqual(self.client.get(url).json(), {
+            'upload_id': state['upload_id'], 'offset': 8, 'size': 10, 'complete': False,
+        })
+        self.assertTrue(self.patch(url, content[8:], 8).json()['complete'])
+
+        # Other users cannot see or use the upload
+        from django.contrib.auth.models import User
+        self.client.force_login(User.objects.create_user('other', password='secret'))
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.client.force_login(self.sales)
+
+        from unittest import mock
+        from . import uploads
+        assembled = []
+
+        def get_completed(*args):
+            assembled.append(original(*args))
+            return assembled[-1]
+
+        original = uploads.get_completed
+        with mock.patch.object(uploads, 'get_completed', side_effect=get_completed):
+            self.client.post(reverse('add_payment', args=[self.order.pk]), {
+                'amount': 500, 'proof_of_transfer__upload': state['upload_id'],
+            })
+        # Storage renamed the .part file without opening it, so no descriptor is left behind
+        self.assertEqual(len(assembled), 1)
+        self.assertTrue(assembled[0].closed)
+        payment = self.order.payments.get()
+        self.assertTrue(payment.proof_of_transfer.name.startswith('sales/payment_proofs/proof'))
+        with payment.proof_of_transfer.open('rb') as file:
+            self.assertEqual(file.read(), content)
+        # The temporary file was moved, so the upload cannot be reused
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_incomplete_upload_is_ignored_and_cleaned_up(self):
+        import os
+        import time
+        from io import StringIO
+        from django.core.management import call_command
+        state = self.client.post(reverse('upload_start'), {
+            'filename': 'proof.pdf', 'size': 10, 'field': 'proof_of_transfer',
+        }).json()
+        self.patch(state['url'], b'0123', 0)
+        self.client.post(reverse('add_payment', args=[self.order.pk]), {
+            'amount': 500, 'proof_of_transfer__upload': state['upload_id'],
+        })
+        self.assertFalse(self.order.payments.exists())
+        self.assertEqual(self.client.post(reverse('upload_start'), {
+            'filename': 'x.pdf', 'size': 10, 'field': 'password',
+        }).status_code, 400)
+
+        call_command('cleanup_chunked_uploads', stdout=StringIO())
+        self.assertEqual(self.client.get(state['url']).status_code, 200)
+        old = time.time() - 25 * 3600
+        for root, _, files in os.walk(self.chunk_dir):
+            for name in files:
+                os.utime(os.path.join(root, name), (old, old))
+        out = StringIO()
+        call_command('cleanup_chunked_uploads', stdout=out)
+        self.assertIn('1 upload dihapus', out.getvalue())
+        self.assertEqual(self.client.get(state['url']).status_code, 404)
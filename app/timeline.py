@@ -0,0 +1,414 @@
+"""
+Timeline siklus hidup SKU (penerimaan -> QC -> spare part -> instalasi ->
+rak -> movement -> penjualan).
+
+Sumber utama history adalah log `SKUEvent` yang ditulis oleh view saat status
+berubah (`record_sku_event`). Untuk SKU yang belum punya log lengkap (belum
+punya log, atau lognya baru dimulai di tengah jalan) event lama direkonstruksi
+dari kolom timestamp: `fetch_sku_graph()` mengambil SKU beserta seluruh
+relasinya dengan jumlah query tetap (select_related + prefetch `to_attr`), lalu
+`build_sku_timeline()` menyusun event tanpa query tambahan. Rekonstruksi yang
+sama dipakai command `backfill_sku_events`.
+
+Fragment HTML modal history di-cache per SKU dengan nomor versi; versi dinaikkan
+oleh signal (signals.py) setiap ada perubahan QC, part, movement, order,
+pembayaran atau event SKU tersebut. Gunakan backend cache bersama (file/DB)
+jika ada lebih dari satu worker.
+"""
+import hashlib
+import time
+from datetime import timedelta
+from typing import NamedTuple
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import Prefetch
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+
+from .models import MovementRequest, Payment, SalesOrder, SKU, SKUEvent, SparePartRequest
+
+# Batas atas umur fragment di cache (detik), sebagai pengaman invalidasi
+HISTORY_CACHE_TIMEOUT = getattr(settings, 'SKU_HISTORY_CACHE_TIMEOUT', 3600)
+
+# Event log dan event rekonstruksi dengan tipe sama dalam rentang ini dianggap sama
+DUPLICATE_WINDOW = timedelta(minutes=1)
+
+# Tipe event (dipakai template untuk ikon & label)
+RECEIVING = 'Receiving'
+QC_SUBMIT = 'QC Submit'
+QC_APPROVE = 'QC Approve'
+QC_REJECT = 'QC Reject'
+SPARE_PART = 'Spare Part'
+INSTALL_SUBMIT = 'Install Submit'
+INSTALL_APPROVE = 'Install Approve'
+INSTALL_REJECT = 'Install Reject'
+SHELVING = 'Shelving'
+MOVEMENT = 'Movement'
+SALES_ORDER = 'Sales Order'
+PAYMENT = 'Payment'
+SHIPPING = 'Shipping'
+COMPLETED = 'Completed'
+
+
+class TimelineEvent(NamedTuple):
+    date: object
+    type: str
+    actor: str
+    details: str            # Teks biasa (di-escape oleh template), bukan HTML
+    user: User = None       # User pelaku jika ada (untuk SKUEvent.actor)
+    links: tuple = ()       # Link file bukti, lihat _link()
+
+
+def _link(file, label, icon):
+    """Link ke file bukti untuk template ({'url', 'label', 'icon'}), None jika file kosong."""
+    if not file:
+        return None
+    return {'url': file.url, 'label': label, 'icon': icon}
+
+
+def _links(*links):
+    return tuple(link for link in links if link is not None)
+
+
+# --- Event per transisi (dipakai view saat mencatat & saat rekonstruksi) ---
+def receiving_event(sku, user=None):
+    approver = user or sku.po_number.approved_by_wm
+    return TimelineEvent(
+        sku.created_at, RECEIVING,
+        approver.username if approver else 'Sistem',
+        f"Diterima dari PO: {sku.po_number.po_number} dan ditugaskan ke {sku.assigned_technician.username}.",
+        approver,
+    )
+
+
+def qc_submit_event(qc_form):
+    return TimelineEvent(
+        qc_form.submitted_at, QC_SUBMIT, qc_form.technician.username,
+        f"QC disubmit. Catatan: '{qc_form.condition_notes}'", qc_form.technician,
+        _links(_link(qc_form.qc_document_file, 'Download QC Form', 'bi-file-earmark-arrow-down')),
+    )
+
+
+def qc_decision_event(qc_form, user=None):
+    """Approve / reject QC oleh Lead, None jika belum diputuskan."""
+    if not qc_form.managed_at:
+        return None
+    if qc_form.is_approved_by_lead:
+        return TimelineEvent(
+            qc_form.managed_at, QC_APPROVE, 'Lead Tech',
+            f"QC Disetujui. Komentar: '{qc_form.lead_technician_comments}'", user,
+        )
+    if qc_form.lead_technician_comments:
+        return TimelineEvent(
+            qc_form.managed_at, QC_REJECT, 'Lead Tech',
+            f"QC Ditolak. Komentar: '{qc_form.lead_technician_comments}'", user,
+        )
+    return None
+
+
+def part_request_event(part, technician):
+    return TimelineEvent(
+        part.created_at, SPARE_PART, technician.username,
+        f"Request part: {part.quantity_needed}x {part.part_name}. Status: {part.get_status_display()}",
+        technician,
+    )
+
+
+def part_managed_event(part):
+    return TimelineEvent(
+        part.managed_at, SPARE_PART,
+        part.warehouse_manager.username if part.warehouse_manager else 'Warehouse',
+        f"Part {part.part_name} di-manage. Status: {part.get_status_display()}",
+        part.warehouse_manager,
+    )
+
+
+def part_receipt_event(part):
+    return TimelineEvent(
+        part.lead_receipt_at, SPARE_PART,
+        part.lead_receipt_approver.username if part.lead_receipt_approver else 'Lead Tech',
+        f"Part {part.part_name} dikonfirmasi penerimaannya oleh Lead. Status: {part.get_status_display()}",
+        part.lead_receipt_approver,
+    )
+
+
+def part_receipt_rejected_event(part, user):
+    return TimelineEvent(
+        timezone.now(), SPARE_PART, user.username,
+        f"Penerimaan part {part.part_name} ditolak Lead, dikembalikan ke Warehouse.",
+        user,
+    )
+
+
+def install_submit_event(qc_form):
+    return TimelineEvent(
+        qc_form.installation_submitted_at, INSTALL_SUBMIT, qc_form.technician.username,
+        f"Form instalasi (B/A) disubmit. Catatan: '{qc_form.installation_notes}'", qc_form.technician,
+        _links(
+            _link(qc_form.photo_before_install, 'Lihat Foto Before', 'bi-camera'),
+            _link(qc_form.photo_after_install, 'Lihat Foto After', 'bi-camera-reels'),
+        ),
+    )
+
+
+def install_decision_event(qc_form, user=None):
+    """Approve / reject instalasi (final check), None jika belum diputuskan."""
+    if not qc_form.final_managed_at:
+        return None
+    if qc_form.final_approval_at:
+        return TimelineEvent(
+            qc_form.final_managed_at, INSTALL_APPROVE, 'Lead Tech',
+            f"Instalasi disetujui. Komentar: '{qc_form.final_lead_comments}'", user,
+        )
+    return TimelineEvent(
+        qc_form.final_managed_at, INSTALL_REJECT, 'Lead Tech',
+        f"Instalasi ditolak. Komentar: '{qc_form.final_lead_comments}'", user,
+    )
+
+
+def shelving_event(sku, user=None):
+    return TimelineEvent(sku.shelved_at, SHELVING, 'Warehouse', f"Ditempatkan di rak: {sku.shelf_location}", user)
+
+
+def movement_sent_event(move, user=None):
+    return TimelineEvent(
+        move.created_at, MOVEMENT, 'Warehouse', f"Dikirim ke {move.requested_by_store}.", user,
+        _links(_link(move.delivery_form, 'Lihat Form DO', 'bi-file-earmark-text')),
+    )
+
+
+def movement_received_event(move):
+    return TimelineEvent(
+        move.received_at, MOVEMENT, 'Warehouse', f"Dikonfirmasi diterima di {move.requested_by_store}.",
+        move.received_by_sales,
+        _links(_link(move.receipt_form, 'Lihat Bukti Terima', 'bi-file-earmark-check')),
+    )
+
+
+def sales_order_event(sales_order):
+    return TimelineEvent(
+        sales_order.created_at, SALES_ORDER, sales_order.sales_person.username,
+        f"Order dibuat untuk: {sales_order.customer_name}. Status: {sales_order.get_status_display()}",
+        sales_order.sales_person,
+    )
+
+
+def payment_event(payment, sales_order):
+    amount_formatted = "{:,.0f}".format(payment.amount).replace(",", ".")
+    return TimelineEvent(
+        payment.payment_date, PAYMENT, sales_order.sales_person.username,
+        f"Pembayaran diterima Rp {amount_formatted}.", sales_order.sales_person,
+        _links(_link(payment.proof_of_transfer, 'Lihat Bukti Transfer', 'bi-receipt')),
+    )
+
+
+def shipping_event(sales_order):
+    details_shipping = f"Dikirim ke {sales_order.customer_name}."
+    if sales_order.shipping_type:
+        details_shipping += f" Tipe: {sales_order.shipping_type}."
+    return TimelineEvent(
+        sales_order.shipped_at, SHIPPING, sales_order.sales_person.username, details_shipping, sales_order.sales_person,
+        _links(_link(sales_order.shipping_receipt, 'Lihat Resi', 'bi-truck')),
+    )
+
+
+def completed_event(sales_order):
+    # Aktornya adalah customer
+    return TimelineEvent(
+        sales_order.completed_at, COMPLETED, sales_order.customer_name, "Diterima oleh customer.",
+        links=_links(_link(sales_order.proof_of_receipt, 'Lihat Bukti Terima', 'bi-house-check')),
+    )
+
+
+# --- Log SKUEvent ---
+def record_sku_event(sku, event):
+    """
+    Tulis satu event ke log SKUEvent. Panggil di dalam transaksi view yang
+    mengubah status, setelah objek terkait disimpan. Waktu event = sekarang
+    (bukan timestamp di model, yang bisa tertimpa saat re-submit).
+    """
+    if event is None:
+        return None
+    return SKUEvent.objects.create(
+        sku=sku,
+        event_type=event.type,
+        actor=event.user,
+        actor_name=event.actor,
+        details=event.details,
+        links=list(event.links),
+        occurred_at=timezone.now(),
+    )
+
+
+def missing_events(logged, reconstructed):
+    """
+    Event hasil rekonstruksi yang belum ada di log, untuk SKU yang sudah berjalan
+    sebelum log SKUEvent dipakai: hanya yang lebih lama dari event log pertama
+    dan bukan duplikat (tipe sama, selisih waktu <= DUPLICATE_WINDOW) dari event log.
+    """
+    if not logged:
+        return list(reconstructed)
+    first = min(event.date for event in logged)
+    unmatched = list(logged)
+    missing = []
+    for event in reconstructed:
+        if event.date is None or event.date >= first:
+            continue
+        # Satu event log hanya menutup satu event rekonstruksi (misal dua pembayaran berdekatan)
+        match = next((
+            other for other in unmatched
+            if other.type == event.type and abs(other.date - event.date) <= DUPLICATE_WINDOW
+        ), None)
+        if match is None:
+            missing.append(event)
+        else:
+            unmatched.remove(match)
+    return missing
+
+
+def is_complete(events):
+    """Log lengkap selalu diawali event penerimaan; tanpa itu history lama belum di-backfill."""
+    return any(event.type == RECEIVING for event in events)
+
+
+def load_sku_history(sku_id):
+    """
+    (sku, events) untuk halaman/modal history: satu range scan di index
+    SKUEvent. Untuk SKU yang lognya belum lengkap (belum di-backfill), event
+    lama direkonstruksi dari relasinya lalu digabung dengan log.
+    """
+    sku = get_object_or_404(SKU.objects.select_related('shelf_location'), id=sku_id)
+    rows = SKUEvent.objects.filter(sku=sku).order_by('-occurred_at', '-id').values_list(
+        'occurred_at', 'event_type', 'actor_name', 'details', 'links'
+    )
+    events = [TimelineEvent(date, type_, actor, details, links=links) for date, type_, actor, details, links in rows]
+    if not is_complete(events):
+        older = missing_events(events, build_sku_timeline(fetch_sku_graph(sku_id)))
+        if events:
+            events = sorted(events + older, key=lambda event: event.date, reverse=True)
+        else:
+            events = older
+    return sku, events
+
+
+# --- Cache fragment history ---
+def _version_key(sku_id):
+    return f'app:sku_history_version:{sku_id}'
+
+
+def get_history_version(sku_id):
+    key = _version_key(sku_id)
+    version = cache.get(key)
+    if version is None:
+        # Mulai dari waktu sekarang (bukan 1) supaya fragment lama tidak terpakai
+        # lagi jika kunci versi sempat hilang dari cache
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def invalidate_sku_history(*sku_ids):
+    for sku_id in sku_ids:
+        if sku_id is None:
+            continue
+        try:
+            cache.incr(_version_key(sku_id))
+        except ValueError:
+            pass  # Belum pernah di-cache
+
+
+def history_fragment_key(sku_id, base_url):
+    """Kunci fragment: SKU + versi + host (URL QR code bergantung host request)."""
+    host = hashlib.md5(base_url.encode()).hexdigest()[:12]
+    return f'app:sku_history_modal:{sku_id}:{get_history_version(sku_id)}:{host}'
+
+
+# --- Rekonstruksi dari kolom timestamp ---
+def sku_graph_queryset():
+    """SKU beserta QC form, part request, movement, order dan pembayarannya (5 query)."""
+    return SKU.objects.select_related(
+        'po_number__approved_by_wm',
+        'assigned_technician',
+        'shelf_location',
+        'qc_form__technician',
+    ).prefetch_related(
+        Prefetch(
+            'qc_form__part_requests',
+            queryset=SparePartRequest.objects.select_related('warehouse_manager', 'lead_receipt_approver'),
+            to_attr='timeline_parts',
+        ),
+        Prefetch(
+            'movements',
+            queryset=MovementRequest.objects.select_related('requested_by_store', 'received_by_sales'),
+            to_attr='timeline_movements',
+        ),
+        Prefetch(
+            'sales_orders',
+            queryset=SalesOrder.objects.select_related('sales_person').prefetch_related(
+                Prefetch('payments', queryset=Payment.objects.order_by('payment_date'), to_attr='timeline_payments')
+            ).order_by('-created_at'),
+            to_attr='timeline_orders',
+        ),
+    )
+
+
+def fetch_sku_graph(sku_id):
+    return get_object_or_404(sku_graph_queryset(), id=sku_id)
+
+
+def _get_qc_form(sku):
+    try:
+        return sku.qc_form
+    except SKU.qc_form.RelatedObjectDoesNotExist:
+        return None
+
+
+def _reconstruct_events(sku):
+    if sku.po_number and sku.assigned_technician:
+        yield receiving_event(sku)
+
+    qc_form = _get_qc_form(sku)
+    if qc_form is not None:
+        yield qc_submit_event(qc_form)
+        yield qc_decision_event(qc_form)
+        for part in qc_form.timeline_parts:
+            yield part_request_event(part, qc_form.technician)
+            if part.managed_at:
+                yield part_managed_event(part)
+                if part.lead_receipt_at:
+                    yield part_receipt_event(part)
+        if qc_form.installation_submitted_at:
+            yield install_submit_event(qc_form)
+        yield install_decision_event(qc_form)
+
+    if sku.shelved_at:
+        yield shelving_event(sku)
+
+    for move in sku.timeline_movements:
+        yield movement_sent_event(move)
+        if move.received_at:
+            yield movement_received_event(move)
+
+    # Hanya order paling baru yang terkait dengan SKU ini
+    if sku.timeline_orders:
+        sales_order = sku.timeline_orders[0]
+        yield sales_order_event(sales_order)
+        for payment in sales_order.timeline_payments:
+            yield payment_event(payment, sales_order)
+        if sales_order.shipped_at:
+            yield shipping_event(sales_order)
+        if sales_order.completed_at:
+            yield completed_event(sales_order)
+
+
+def build_sku_timeline(sku):
+    """
+    Susun event timeline dari SKU hasil fetch_sku_graph(), terbaru di atas.
+    Tidak menjalankan query.
+    """
+    events = [event for event in _reconstruct_events(sku) if event is not None]
+    now = timezone.now()
+    events.sort(key=lambda event: event.date or now, reverse=True)
+    return events
@@ -0,0 +1,254 @@
+"""
+Upload bertahap (chunked, bisa dilanjutkan) untuk file bukti: delivery
+receipt, dokumen QC, form pengiriman (DO), bukti transfer, bukti penerimaan.
+
+Alur (script di base.html, untuk <input type="file" data-chunked-upload>):
+1. POST /uploads/ (filename, size, field) -> upload_id + chunk_size.
+2. PATCH /uploads/<id>/ dengan header Upload-Offset dan body potongan mentah.
+   Body dibaca bertahap dari stream request langsung ke file .part di disk,
+   tidak pernah utuh di memori. Offset yang tidak cocok dijawab 409 + offset
+   server dan klien melanjutkan dari situ. Potongan yang terputus di tengah
+   tetap tersimpan sampai byte terakhir yang diterima.
+3. GET /uploads/<id>/ -> offset saat ini (lanjut setelah koneksi/halaman putus).
+4. Form dikirim dengan `<field>__upload=<id>` sebagai ganti file. `get_file()` /
+   `collect_files()` mengubahnya menjadi UploadedFile ber-`temporary_file_path`,
+   sehingga FileSystemStorage memindahkan (rename) file ke FileField tanpa
+   menyalin isinya.
+
+File sementara disimpan per user di settings.CHUNKED_UPLOAD_DIR (default
+folder temp sistem, bukan MEDIA_ROOT agar tidak ikut tersaji). Upload yang
+tidak selesai/tidak dipakai dibersihkan oleh `manage.py cleanup_chunked_uploads`.
+"""
+import json
+import mimetypes
+import os
+import re
+import tempfile
+import time
+import uuid
+
+from django.conf import settings
+from django.core.files import locks
+from django.core.files.uploadedfile import UploadedFile
+from django.http import UnreadablePostError
+from django.utils.datastructures import MultiValueDict
+from django.utils.text import get_valid_filename
+
+# Field form yang boleh memakai upload bertahap
+FIELDS = {
+    'delivery_receipt_file',  # receiving_detail
+    'qc_document_file',       # qc_form
+    'delivery_form',          # movement_process
+    'proof_of_transfer',      # add_payment
+    'receipt_form_file',      # sales_receive_sku
+}
+FIELD_SUFFIX = '__upload'
+COPY_BUFFER = 64 * 1024
+
+_UPLOAD_ID = re.compile(r'^[0-9a-f]{32}$')
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+def upload_root():
+    return getattr(settings, 'CHUNKED_UPLOAD_DIR', None) or os.path.join(tempfile.gettempdir(), 'chunked_uploads')
+
+
+def chunk_size():
+    return getattr(settings, 'CHUNKED_UPLOAD_CHUNK_SIZE', 1024 * 1024)
+
+
+def max_size():
+    return getattr(settings, 'CHUNKED_UPLOAD_MAX_SIZE', 100 * 1024 * 1024)
+
+
+def _paths(user_id, upload_id):
+    if not _UPLOAD_ID.match(upload_id or ''):
+        raise UploadError("Upload tidak ditemukan.", 404)
+    base = os.path.join(upload_root(), str(user_id), upload_id)
+    return f"{base}.part", f"{base}.json"
+
+
+def _load(user_id, upload_id):
+    part_path, meta_path = _paths(user_id, upload_id)
+    try:
+        with open(meta_path) as file:
+            meta = json.load(file)
+    except (FileNotFoundError, ValueError):
+        raise UploadError("Upload tidak ditemukan.", 404)
+    if not os.path.exists(part_path):
+        # Sudah dipakai (dipindah ke FileField) atau dibersihkan
+        raise UploadError("Upload tidak ditemukan.", 404)
+    return part_path, meta
+
+
+def _state(upload_id, meta, offset):
+    return {
+        'upload_id': upload_id,
+        'offset': offset,
+        'size': meta['size'],
+        'complete': offset == meta['size'],
+    }
+
+
+def start(user_id, filename, size, field):
+    if field not in FIELDS:
+        raise UploadError("Field upload tidak dikenal.")
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        raise UploadError("Ukuran file tidak valid.")
+    if size <= 0:
+        raise UploadError("File kosong.")
+    if size > max_size():
+        raise UploadError(f"File melebihi batas {max_size() // (1024 * 1024)} MB.", 413)
+    filename = get_valid_filename(os.path.basename(filename or '')) or 'upload'
+
+    upload_id = uuid.uuid4().hex
+    part_path, meta_path = _paths(user_id, upload_id)
+    os.makedirs(os.path.dirname(part_path), exist_ok=True)
+    open(part_path, 'xb').close()
+    meta = {'filename': filename, 'size': size, 'field': field, 'created': time.time()}
+    with open(meta_path, 'w') as file:
+        json.dump(meta, file)
+    return dict(_state(upload_id, meta, 0), chunk_size=chunk_size())
+
+
+def status(user_id, upload_id):
+    part_path, meta = _load(user_id, upload_id)
+    return _state(upload_id, meta, os.path.getsize(part_path))
+
+
+def append(user_id, upload_id, offset, length, stream):
+    """Tulis `length` byte dari `stream` di posisi `offset` (harus = ukuran file .part saat ini)."""
+    part_path, meta = _load(user_id, upload_id)
+    try:
+        offset, length = int(offset), int(length)
+    except (TypeError, ValueError):
+        raise UploadError("Header Upload-Offset / Content-Length wajib diisi.")
+    if length > chunk_size():
+        raise UploadError("Potongan terlalu besar.", 413)
+
+    with open(part_path, 'r+b') as file:
+        if not locks.lock(file, locks.LOCK_EX | locks.LOCK_NB):
+            raise UploadError("Potongan lain sedang ditulis.", 409, offset=os.path.getsize(part_path))
+        try:
+            current = file.seek(0, os.SEEK_END)
+            if offset != current:
+                raise UploadError("Offset tidak cocok.", 409, offset=current)
+            if current + length > meta['size']:
+                raise UploadError("Data melebihi ukuran file.", 413, offset=current)
+            remaining = length
+            while remaining:
+                try:
+                    data = stream.read(min(COPY_BUFFER, remaining))
+                except (OSError, UnreadablePostError):
+                    break  # Koneksi putus: simpan yang sudah diterima
+                if not data:
+                    break
+                file.write(data)
+                remaining -= len(data)
+            file.flush()
+            current = file.tell()
+        finally:
+            locks.unlock(file)
+    return _state(upload_id, meta, current)
+
+
+class AssembledUpload(UploadedFile):
+    """
+    File hasil upload bertahap; storage memindahkannya lewat temporary_file_path().
+    File .part baru dibuka saat isinya benar-benar dibaca (FileSystemStorage
+    cukup rename), jadi tidak ada descriptor yang tertinggal setelah dipindah.
+    """
+
+    def __init__(self, path, name, size):
+        self.path = path
+        self._file = None
+        content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        super().__init__(None, name, content_type, size)
+
+    @property
+    def file(self):
+        if self._file is None:
+            self._file = open(self.path, 'rb')
+        return self._file
+
+    @file.setter
+    def file(self, value):
+        self._file = value
+
+    @property
+    def closed(self):
+        return self._file is None or self._file.closed
+
+    def open(self, mode=None):
+        if self.closed:
+            self._file = open(self.path, mode or 'rb')
+        else:
+            self._file.seek(0)
+        return self
+
+    def temporary_file_path(self):
+        return self.path
+
+
+def get_completed(user_id, upload_id, field):
+    """AssembledUpload untuk upload yang sudah lengkap milik user ini, atau None."""
+    try:
+        part_path, meta = _load(user_id, upload_id)
+    except UploadError:
+        return None
+    if meta['field'] != field or os.path.getsize(part_path) != meta['size']:
+        return None
+    return AssembledUpload(part_path, meta['filename'], meta['size'])
+
+
+def collect_files(request, *fields):
+    """request.FILES + upload bertahap yang dikirim sebagai `<field>__upload`."""
+    files = request.FILES.copy() if request.FILES else MultiValueDict()
+    for field in fields:
+        upload_id = request.POST.get(field + FIELD_SUFFIX)
+        if upload_id and field not in files:
+            upload = get_completed(request.user.pk, upload_id, field)
+            if upload is not None:
+                files[field] = upload
+    return files
+
+
+def get_file(request, field):
+    return collect_files(request, field).get(field)
+
+
+def cleanup(max_age_hours=24):
+    """Hapus upload yang sudah dipakai atau lebih tua dari `max_age_hours`. Return jumlah yang dihapus."""
+    root = upload_root()
+    if not os.path.isdir(root):
+        return 0
+    cutoff = time.time() - max_age_hours * 3600
+    removed = 0
+    for user_dir in os.scandir(root):
+        if not user_dir.is_dir():
+            continue
+        for entry in os.scandir(user_dir.path):
+            if not entry.name.endswith('.json'):
+                continue
+            part_path = entry.path[:-len('.json')] + '.part'
+            try:
+                if os.path.getmtime(part_path) >= cutoff:
+                    continue  # Masih aktif (potongan terakhir belum lama)
+            except FileNotFoundError:
+                pass  # Sudah dipakai
+
+            for path in (part_path, entry.path):
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+            removed += 1
+    return removed
@@ -13,12 +13,17 @@ urlpatterns = [
     # 3. Proses Logout
     path('logout/', auth_views.LogoutView.as_view(), name='logout'),
     
+    # History dashboard (keyset pagination / infinite scroll)
+    path('dashboard/history/po/', views.history_pos_page, name='history_pos_page'),
+    path('dashboard/history/sku/', views.tech_history_page, name='tech_history_page'),
+
     # URLs Receiving (WM)
     path('receiving/', views.receiving_list, name='receiving_list'),
     path('receiving/<int:po_id>/', views.receiving_detail, name='receiving_detail'),
     
     # URLs PO Approval (Purchasing & WM) 
     path('po/create/', views.po_create, name='po_create'),
+    path('po/import/', views.po_import, name='po_import'),
     path('po/approve/', views.po_approve_list, name='po_approve_list'),
     path('po/approve/<int:po_id>/', views.po_approve_detail, name='po_approve_detail'),
     
@@ -46,6 +51,11 @@ urlpatterns = [
     path('sku/history/modal/<int:sku_id>/', views.get_sku_history_modal, name='sku_history_modal'),
     path('inventory/history/<str:part_name>/', views.get_part_usage_history, name='part_usage_history'),
     path('inventory/api/search/', views.inventory_search_api, name='inventory_search_api'),
+    path('sku/api/search/', views.sku_search_api, name='sku_search_api'),
+    path('export/<str:dataset>/', views.export_data, name='export_data'),
+    # Upload bertahap (chunked/resumable) untuk file bukti, lihat uploads.py
+    path('uploads/', views.upload_start, name='upload_start'),
+    path('uploads/<str:upload_id>/', views.upload_chunk, name='upload_chunk'),
 
     path('master-role/', views.master_role_dashboard, name='master_role_dashboard'),
     
@@ -70,6 +80,7 @@ urlpatterns = [
     path('sales/quotation/<int:quotation_id>/convert/', views.convert_quotation_to_order, name='convert_to_order'),
     path('sales/quotation/<int:quotation_id>/', views.quotation_detail, name='quotation_detail'),
     path('sales/order/<int:order_id>/print_label/', views.print_order_label, name='print_order_label'),
+    path('sales/order/print_labels/', views.print_order_labels, name='print_order_labels'),
     path('sales/order/<int:order_id>/print_invoice/', views.print_invoice_a4, name='print_invoice_a4'),
     path('sales/quotation/<int:quotation_id>/print_a4/', views.print_quotation_a4, name='print_quotation_a4'),
     path('sales/order/<int:order_id>/print_label/', views.print_order_label, name='print_order_label'),
@@ -80,4 +91,5 @@ urlpatterns = [
     path('rack/edit/<int:rack_id>/', views.rack_edit, name='rack_edit'),
     path('rack/delete/<int:rack_id>/', views.rack_delete, name='rack_delete'),
     path('rack/view/', views.rack_grid_view, name='rack_grid_view'),
+    path('rack/api/map/', views.rack_map_api, name='rack_map_api'),
 ]
\ No newline at end of file
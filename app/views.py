@@ -1,70 +1,60 @@
 ﻿from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.models import User
-from django.contrib.humanize.templatetags.humanize import intcomma
 from django.contrib import messages
-from django.contrib.staticfiles.finders import find as find_static 
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import urlencode
 from django.views import generic
 from django.db.models import Count, Q, Sum 
 from django.db import transaction
 from django.db import IntegrityError
 from django.utils import timezone
 from django.http import JsonResponse
-from django.http import HttpResponse
-from django.conf import settings
-from reportlab.lib.units import cm
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib.utils import ImageReader
-from reportlab.platypus import Table, TableStyle, Paragraph
-from reportlab.pdfgen import canvas
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, StreamingHttpResponse
+from django.core.cache import cache
 from django.template.loader import render_to_string
 from .models import (
     PurchaseOrder, SKUDetailPO, SKU, QCForm, SparePartRequest, 
-    TechnicianAnalytics, MovementRequest, PurchasingNotification, SparePartInventory, StockAdjustment, ReturnedPart, InstallationPhoto, SalesOrder, Payment, Quotation, Rack
+    TechnicianAnalytics, MovementRequest, PurchasingNotification, SparePartInventory, StockAdjustment, ReturnedPart, InstallationPhoto, SalesOrder, Quotation, Rack
 )
 from .models import Store, SalesAssignment, User, Group
-from .forms import CustomUserCreationForm, PurchaseOrderForm, SKUDetailPOForm, PORejectionForm, SparePartInventoryForm, StockAdjustmentForm, StockAdjustmentRejectForm, SalesOrderForm, PaymentForm, ShippingFileForm, QuotationForm, StoreForm, SalesAssignmentForm, MovementRequestForm, RackSelectionForm, RackForm
-import textwrap
-import os
+from . import documents, exports, queries, uploads
+from . import po_import as po_import_service
+from . import rack_map, receiving, slotting
+from .counters import get_counts
+from .documents import intcomma
+from .pagination import get_page_size, keyset_paginate
+from .roles import has_role
+from .search import SEARCH_CACHE_TIMEOUT, normalize_text, cache_key as search_cache_key
+from . import timeline
+from .forms import CustomUserCreationForm, PurchaseOrderForm, PurchaseOrderImportForm, SKUDetailPOForm, PORejectionForm, SparePartInventoryForm, StockAdjustmentForm, StockAdjustmentRejectForm, SalesOrderForm, PaymentForm, ShippingFileForm, QuotationForm, StoreForm, SalesAssignmentForm, MovementRequestForm, RackSelectionForm, RackForm
+from decimal import Decimal
 from functools import wraps
 
 
-styles = getSampleStyleSheet()
-styleN = styles['Normal']
-styleN.fontName = 'Helvetica'
-styleN.fontSize = 9
-styleN.leading = 11
-
 # --- Cek Role ---
+# Semua pengecekan role membaca dari get_role_names() (lihat roles.py), sehingga
+# nama grup user hanya dimuat sekali per request (atau diambil dari cache).
 def is_master_role(user):
     """Cek apakah user adalah anggota grup 'Master Role'."""
-    return user.groups.filter(name='Master Role').exists()
+    return has_role(user, 'Master Role')
 def is_warehouse_manager(user):
-    return user.groups.filter(name='Warehouse Manager').exists()
+    return has_role(user, 'Warehouse Manager')
 def is_technician(user):
-    return user.groups.filter(name='Technician').exists()
+    return has_role(user, 'Technician')
 def is_lead_technician(user):
-    return user.groups.filter(name='Lead Technician').exists()
+    return has_role(user, 'Lead Technician')
 def is_purchasing(user):
-    return user.groups.filter(name='Purchasing').exists()
+    return has_role(user, 'Purchasing')
 def is_sales(user): 
-    return user.groups.filter(name='Sales').exists()
-def intcomma(value):
-    """Format an integer with commas."""
-    if isinstance(value, (float, int)):
-        return f"{int(value):,}".replace(",", ".")
-    return str(value)
+    return has_role(user, 'Sales')
 def has_permission_or_is_master(user, required_group_name):
     """
     Mengembalikan True jika user adalah Master Role ATAU user adalah 
     anggota dari grup yang diwajibkan (required_group_name).
     """
-    if is_master_role(user):
-        return True
-    return user.groups.filter(name=required_group_name).exists()
+    return has_role(user, 'Master Role', required_group_name)
 
 
 @login_required
@@ -246,26 +236,37 @@ def rack_manager_required(function=None):
 def rack_grid_view(request):
     """Menampilkan grid rak seperti pemilihan kursi bioskop."""
     
-    # Ambil semua data rack. Grouping berdasarkan prefiks (cth: 'A', 'B', ...)
-    racks = Rack.objects.all().order_by('rack_location')
-    
-    # Membuat struktur data untuk grid view: {'A': [RackObj1, RackObj2], 'B': [...], ...}
-    rack_grid = {}
-    for rack in racks:
-        # Asumsi format rack_location adalah A1-01, A2-01, dll. atau hanya A, B, C...
-        # Kita ambil huruf pertama sebagai "Baris/Area" (A, B, C...)
-        prefix = rack.rack_location[0].upper()
-        if prefix not in rack_grid:
-            rack_grid[prefix] = []
-        rack_grid[prefix].append(rack)
+    # Layout rak per lorong (A, B, ...) dari cache proses, ditumpangi okupansi
+    # terkini (satu query rak terisi): {'A': [RackTile, ...], 'B': [...], ...}
+    cursor = rack_map.current_cursor()
+    rack_grid = rack_map.grid()
     is_master = is_master_role(request.user)
     context = {
         'rack_grid': rack_grid,
-        'rack_rows': sorted(rack_grid.keys()),
+        'rack_rows': list(rack_grid),
+        'rack_total': sum(len(group) for group in rack_grid.values()),
+        # Untuk polling rack_map_api?since=<cursor>
+        'rack_cursor': cursor,
+        'rack_states': rack_map.STATES,
         'is_master': is_master,
     }
     return render(request, 'app/rack_grid_view.html', context)
 
+@login_required
+@rack_manager_required
+def rack_map_api(request):
+    """
+    Peta rak ringkas (JSON). Tanpa parameter: snapshot penuh. Dengan ?since=<cursor>:
+    hanya rak yang berubah sejak cursor tersebut (untuk polling grid).
+    """
+    since = request.GET.get('since')
+    if not since:
+        return JsonResponse(rack_map.snapshot())
+    try:
+        return JsonResponse(rack_map.changes(since))
+    except rack_map.InvalidCursor as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
 @login_required
 @rack_manager_required
 def rack_list(request):
@@ -356,6 +357,16 @@ def rack_delete(request, rack_id):
     context = {'rack': rack}
     return render(request, 'app/rack_confirm_delete.html', context)
 
+def _get_ready_list_context():
+    """List SKU Ready Gudang & Ready Store untuk sidebar. Jumlahnya diambil dari DashboardCounter."""
+    counts = get_counts('sku.status.Ready', 'sku.status.Shop')
+    return {
+        'ready_skus_list': queries.ready_skus(),
+        'shop_skus_list': queries.shop_skus(),
+        'ready_skus_count': counts['sku.status.Ready'],
+        'shop_skus_count': counts['sku.status.Shop'],
+    }
+
 @login_required(login_url='login') 
 def dashboard(request):
     user = request.user 
@@ -364,131 +375,95 @@ def dashboard(request):
             'total_users': User.objects.count(), 
         }
         return master_role_dashboard(request)
-    # Data Umum Sidebar (untuk semua role kecuali Teknisi)
-    skus_under_tech = SKU.objects.filter(
-        assigned_technician__isnull=False
-    ).select_related('assigned_technician').order_by('assigned_technician__username')
-    sidebar_context = {
-        'sidebar_skus_under_tech': skus_under_tech,
-    }
-    ready_skus_list = SKU.objects.filter(status='Ready').order_by('name')
-    shop_skus_list = SKU.objects.filter(status='Shop').order_by('name')
-    
-    # Kumpulkan dalam satu konteks
-    ready_list_context = {
-        'ready_skus_list': ready_skus_list,
-        'shop_skus_list': shop_skus_list
-    }
+    # Semua queryset dashboard (beserta join-nya) didefinisikan di queries.py.
+    # List SKU di sidebar diambil lewat sku_search_api saat user mengetik.
+    ready_list_context = _get_ready_list_context()
     if is_warehouse_manager(user):
-        pending_part_requests = SparePartRequest.objects.filter(status='Pending')
-        skus_need_shelving = SKU.objects.filter(
-            status='Ready', 
-            shelf_location__isnull=True 
-        )
-        # Notifikasi PO yang perlu di-approve
-        pending_po_approvals = PurchaseOrder.objects.filter(status='Pending_Approval').count()
+        pending_part_requests = queries.wm_pending_part_requests()
+        skus_need_shelving = queries.wm_skus_need_shelving()
+        # Notifikasi PO yang perlu di-approve (dibaca dari DashboardCounter)
+        pending_po_approvals = get_counts('po.status.Pending_Approval')['po.status.Pending_Approval']
         
         context = {
             'pending_parts': pending_part_requests,
             'skus_need_shelving': skus_need_shelving,
             'pending_po_approvals': pending_po_approvals 
         }
-        context.update(sidebar_context) 
         context.update(ready_list_context)
         return render(request, 'app/dashboards/wm_dashboard.html', context)
 
     elif is_technician(user):
-        my_assigned_skus_current = SKU.objects.filter(
-            assigned_technician=user, 
-            status='QC'
-        )
-        my_skus_to_install = SKU.objects.filter(
-            assigned_technician=user,
-            status='AWAITING_INSTALL'
-        )
+        my_assigned_skus_current = queries.tech_current_skus(user)
+        my_skus_to_install = queries.tech_skus_to_install(user)
 
-        my_assigned_skus_history = SKU.objects.filter(
-            assigned_technician=user
-        ).exclude(
-            status__in=['QC', 'QC_PENDING', 'AWAITING_INSTALL'] 
-        ).order_by('-id')
+        # History dipaginasi (keyset), halaman berikutnya via tech_history_page
+        my_assigned_skus_history = keyset_paginate(
+            queries.tech_history(user), page_size=get_page_size(request)
+        )
         
         context = { 
             'my_skus': my_assigned_skus_current,
             'my_skus_to_install': my_skus_to_install, 
-            'my_skus_history': my_assigned_skus_history
+            'my_skus_history': my_assigned_skus_history,
+            'tech_history_url': reverse('tech_history_page'),
         }
         # Teknisi tidak perlu sidebar umum
         return render(request, 'app/dashboards/tech_dashboard.html', context)
 
     elif is_lead_technician(user):
-        pending_qc_forms = QCForm.objects.filter(
-            sku__status='QC_PENDING'
-        ).select_related('sku', 'technician')
-        pending_final_checks = QCForm.objects.filter(
-            sku__status='PENDING_FINAL_CHECK',
-            installation_submitted_at__isnull=False, # Pastikan teknisi sudah submit
-            final_approval_at__isnull=True # Pastikan belum di-approve
-        ).select_related('sku', 'technician')
-        parts_awaiting_receipt_approval = SparePartRequest.objects.filter(
-            status='PENDING_LEAD_RECEIPT'
-        ).select_related('qc_form__sku', 'qc_form__technician')
+        pending_qc_forms = queries.lead_pending_qc_forms()
+        pending_final_checks = queries.lead_pending_final_checks()
+        parts_awaiting_receipt_approval = queries.lead_parts_awaiting_receipt()
         context = { 
             'pending_forms': pending_qc_forms,
             'pending_final_checks': pending_final_checks,
             'parts_awaiting_receipt_approval': parts_awaiting_receipt_approval 
         }
-        context.update(sidebar_context)
         return render(request, 'app/dashboards/lead_dashboard.html', context)
 
     elif is_purchasing(user):
-        parts_to_buy = SparePartRequest.objects.filter(status='Approved_Buy')
-        po_notifications = PurchasingNotification.objects.filter(is_resolved=False)
+        parts_to_buy = queries.purchasing_parts_to_buy()
+        po_notifications = queries.purchasing_notifications()
         # Notifikasi PO yang ditolak WM
-        rejected_pos = PurchaseOrder.objects.filter(status='Rejected')
-        pending_adjustments = StockAdjustment.objects.filter(
-            status='Pending'
-        ).select_related('spare_part', 'requested_by')
-        history_pos = PurchaseOrder.objects.exclude(status='Pending_Approval').order_by('-created_at')
+        rejected_pos = queries.purchasing_rejected_pos()
+        pending_adjustments = queries.purchasing_pending_adjustments()
         search_query = request.GET.get('po_search', '')
+        # History dipaginasi (keyset), halaman berikutnya via history_pos_page
+        history_pos = keyset_paginate(
+            queries.purchasing_history_pos(search_query), page_size=get_page_size(request)
+        )
+        history_pos_url = reverse('history_pos_page')
         if search_query:
-            history_pos = history_pos.filter(po_number__icontains=search_query)
+            history_pos_url += '?' + urlencode({'po_search': search_query})
         context = {
             'parts_to_buy': parts_to_buy,
             'po_notifications': po_notifications,
             'rejected_pos': rejected_pos,
             'pending_adjustments': pending_adjustments,
             'history_pos': history_pos, 
+            'history_pos_url': history_pos_url,
             'search_query': search_query 
         }
-        context.update(sidebar_context) 
         context.update(ready_list_context)
         return render(request, 'app/dashboards/purchasing_dashboard.html', context)
     elif is_sales(user):
         try:
-            sales_assignment = SalesAssignment.objects.get(sales_person=user)
+            sales_assignment = SalesAssignment.objects.select_related('assigned_store').get(sales_person=user)
             my_store = sales_assignment.assigned_store
         except SalesAssignment.DoesNotExist:
             my_store = None
             messages.warning(request, "Anda belum ditugaskan ke Store manapun oleh Master Role.")
 
         # Ambil semua order dan quotation (tetap)
-        my_orders = SalesOrder.objects.filter(
-            sales_person=user
-        ).select_related('sku').prefetch_related('payments').order_by('-created_at')
+        my_orders = queries.sales_orders(user)
 
-        my_quotations = Quotation.objects.filter(
-            sales_person=user
-        ).select_related('sku').order_by('-created_at')
+        my_quotations = queries.sales_quotations(user)
 
         add_order_form = SalesOrderForm()
         add_quotation_form = QuotationForm()
 
         # REVISI 1 & 2: Ambil Movement yang ditujukan ke Store Sales ini dan statusnya 'Delivering'
-        movements_in_transit = MovementRequest.objects.filter(
-            requested_by_store=my_store,
-            status='Delivering'
-        ).select_related('sku_to_move', 'requested_by_store').order_by('-created_at')
+        movements_in_transit = queries.sales_movements_in_transit(my_store)
 
         context = {
             'my_orders': my_orders,
@@ -499,16 +474,39 @@ def dashboard(request):
             'movements_in_transit': movements_in_transit, # Daftar SKU yang harus diterima
         }
         # Sales juga bisa melihat list SKU Ready dan Ready Store
-        context.update(sidebar_context) 
         context.update(ready_list_context) 
         return render(request, 'app/dashboards/sales_dashboard.html', context)
 
     # Fallback jika tidak punya role
     return render(request, 'app/dashboard.html')
 
+@login_required(login_url='login')
+@user_passes_test(is_technician)
+def tech_history_page(request):
+    """Halaman berikutnya history teknisi (infinite scroll di tech_dashboard)."""
+    page = keyset_paginate(
+        queries.tech_history(request.user),
+        cursor=request.GET.get('cursor'),
+        page_size=get_page_size(request),
+    )
+    html_content = render_to_string('app/_includes/history_sku_rows.html', {'my_skus_history': page})
+    return JsonResponse({'html': html_content, 'next_cursor': page.next_cursor})
+
+@login_required(login_url='login')
+@user_passes_test(is_purchasing)
+def history_pos_page(request):
+    """Halaman berikutnya riwayat PO (infinite scroll di purchasing_dashboard)."""
+    page = keyset_paginate(
+        queries.purchasing_history_pos(request.GET.get('po_search', '')),
+        cursor=request.GET.get('cursor'),
+        page_size=get_page_size(request),
+    )
+    html_content = render_to_string('app/_includes/history_po_rows.html', {'history_pos': page})
+    return JsonResponse({'html': html_content, 'next_cursor': page.next_cursor})
+
 def sales_or_master_required(function=None):
     def check_user(user):
-        return is_master_role(user) or user.groups.filter(name='Sales').exists()
+        return is_master_role(user) or is_sales(user)
     actual_decorator = user_passes_test(check_user, login_url='login')
     if function:
         return actual_decorator(function)
@@ -524,26 +522,22 @@ def sales_order_add(request):
             order = form.save(commit=False)
             order.sales_person = request.user
             order.status = 'Pending' # Status awal, belum ada pembayaran
-            order.save()
+            with transaction.atomic():
+                order.save()
+                timeline.record_sku_event(order.sku, timeline.sales_order_event(order))
             
             messages.success(request, f"Order untuk {order.customer_name} berhasil dibuat. Invoice akan dicetak otomatis.")
             return redirect(f"{reverse('sales_order_detail', args=[order.id])}?print=true")
         else:
             # Jika form tidak valid, kembali ke dashboard dan tampilkan error
             # Kita perlu re-fetch data dashboard
-            my_orders = SalesOrder.objects.filter(sales_person=request.user).select_related('sku').prefetch_related('payments').order_by('-created_at')
+            my_orders = queries.sales_orders(request.user)
             
-            # Ambil data sidebar lagi
-            skus_under_tech = SKU.objects.filter(assigned_technician__isnull=False).select_related('assigned_technician').order_by('assigned_technician__username')
-            ready_skus_list = SKU.objects.filter(status='Ready').order_by('name')
-            shop_skus_list = SKU.objects.filter(status='Shop').order_by('name')
             context = {
                 'my_orders': my_orders,
                 'add_order_form': form,
-                'sidebar_skus_under_tech': skus_under_tech,
-                'ready_skus_list': ready_skus_list,
-                'shop_skus_list': shop_skus_list
             }
+            context.update(_get_ready_list_context())
             messages.error(request, "Gagal menambahkan order. Cek error di bawah form.")
             return render(request, 'app/dashboards/sales_dashboard.html', context)
             
@@ -572,23 +566,17 @@ def quotation_add(request):
 
         else:
             # Jika form tidak valid, kembali ke dashboard dan tampilkan error
-            my_orders = SalesOrder.objects.filter(sales_person=request.user).select_related('sku').prefetch_related('payments').order_by('-created_at')
-            my_quotations = Quotation.objects.filter(sales_person=request.user).select_related('sku').order_by('-created_at')
-            
-            skus_under_tech = SKU.objects.filter(assigned_technician__isnull=False).select_related('assigned_technician').order_by('assigned_technician__username')
-            ready_skus_list = SKU.objects.filter(status='Ready').order_by('name')
-            shop_skus_list = SKU.objects.filter(status='Shop').order_by('name')
+            my_orders = queries.sales_orders(request.user)
+            my_quotations = queries.sales_quotations(request.user)
 
             context = {
                 'my_orders': my_orders,
                 'my_quotations': my_quotations, 
                 'add_order_form': SalesOrderForm(), # Form Order yang valid
                 'add_quotation_form': form, # Kirim form Quotation yang tidak valid agar error terlihat
-                'sidebar_skus_under_tech': skus_under_tech,
-                'ready_skus_list': ready_skus_list,
-                'shop_skus_list': shop_skus_list,
                 'show_quotation_modal': True # Trigger modal di template
             }
+            context.update(_get_ready_list_context())
             messages.error(request, "Gagal menambahkan Quotation. Cek error di bawah form.")
             return render(request, 'app/dashboards/sales_dashboard.html', context)
             
@@ -640,6 +628,7 @@ def convert_quotation_to_order(request, quotation_id):
                     status='Pending', # Status awal pending payment
                     sales_person=request.user
                 )
+                timeline.record_sku_event(new_order.sku, timeline.sales_order_event(new_order))
 
                 # 4. Update status Quotation
                 quotation.status = 'Converted'
@@ -690,14 +679,18 @@ def add_payment(request, order_id):
     order = get_object_or_404(SalesOrder, id=order_id, sales_person=request.user)
     
     if request.method == 'POST':
-        form = PaymentForm(request.POST, request.FILES)
+        form = PaymentForm(request.POST, uploads.collect_files(request, 'proof_of_transfer'))
         if form.is_valid():
-            payment = form.save(commit=False)
-            payment.sales_order = order
-            payment.save()
-            
-            # Panggil fungsi untuk update status SKU
-            order.update_status_based_on_payment()
+            with transaction.atomic():
+                # Kunci baris order supaya pembayaran bersamaan tidak balapan update status
+                order = SalesOrder.objects.select_for_update().select_related('sku').get(pk=order.pk)
+                payment = form.save(commit=False)
+                payment.sales_order = order
+                payment.save()
+
+                # Panggil fungsi untuk update status SKU
+                order.update_status_based_on_payment()
+                timeline.record_sku_event(order.sku, timeline.payment_event(payment, order))
             
             messages.success(request, f"Pembayaran sebesar {payment.amount} berhasil ditambahkan.")
         else:
@@ -721,7 +714,16 @@ def upload_shipping_files(request, order_id):
                 order.completed_at = timezone.now()
                 order.status = 'Completed'
 
-            form.save() 
+            with transaction.atomic():
+                order = form.save(commit=False)
+                # Hanya kolom pengiriman: total_paid bisa sedang di-increment oleh pembayaran lain
+                order.save(update_fields=[
+                    *form.changed_data, 'status', 'shipped_at', 'completed_at', 'updated_at',
+                ])
+                if 'shipping_receipt' in form.changed_data:
+                    timeline.record_sku_event(order.sku, timeline.shipping_event(order))
+                if 'proof_of_receipt' in form.changed_data:
+                    timeline.record_sku_event(order.sku, timeline.completed_event(order))
 
             messages.success(request, "File pengiriman berhasil di-update.")
         else:
@@ -749,13 +751,15 @@ def process_shipping(request, order_id):
                 # 1. Update status SalesOrder
                 order.status = 'Shipped'
                 order.shipped_at = timezone.now() # Opsi: Catat waktu pengiriman
-                order.save()
+                # update_fields: jangan timpa total_paid yang diubah pembayaran bersamaan
+                order.save(update_fields=['status', 'shipped_at', 'updated_at'])
                 
                 # 2. Update status SKU terkait
                 # Asumsi: SalesOrder memiliki relasi ForeignKey ke SKU
                 if order.sku:
                     order.sku.status = 'Delivering' 
                     order.sku.save()
+                    timeline.record_sku_event(order.sku, timeline.shipping_event(order))
                 
             messages.success(request, f"Order {order.id} berhasil diubah status menjadi Shipped.")
         except Exception as e:
@@ -788,7 +792,7 @@ def sales_receive_sku(request, movement_id):
         return redirect('dashboard')
     
     if request.method == 'POST':
-        receipt_file = request.FILES.get('receipt_form_file') 
+        receipt_file = uploads.get_file(request, 'receipt_form_file')
         
         if not receipt_file:
             messages.error(request, "Bukti penerimaan wajib diupload.")
@@ -809,6 +813,7 @@ def sales_receive_sku(request, movement_id):
                 sku.location = 'Shop' 
                 sku.current_store = assigned_store # Konfirmasi lokasi akhir di Store
                 sku.save()
+                timeline.record_sku_event(sku, timeline.movement_received_event(movement))
                 
             messages.success(request, f"SKU {sku.sku_id} berhasil diterima dan kini berstatus 'Ready Store' di {assigned_store.name}.")
         except Exception as e:
@@ -975,186 +980,8 @@ def inventory_edit(request, part_id):
     return render(request, 'app/inventory_form.html', context)
 
 def _get_sku_history_context(sku_id):
-    sku = get_object_or_404(SKU, id=sku_id)
-    history_items = []
-    if sku.po_number and sku.assigned_technician:
-        history_items.append({
-            'date': sku.created_at, 
-            'type': 'Receiving',
-            'actor': sku.po_number.approved_by_wm.username if sku.po_number.approved_by_wm else 'Sistem',
-            'details': f"Diterima dari PO: {sku.po_number.po_number} dan ditugaskan ke {sku.assigned_technician.username}."
-        })
-    
-    # 2. Info QC
-    try:
-        qc_form = QCForm.objects.get(sku=sku)
-        details_qc = f"QC disubmit. Catatan: '{qc_form.condition_notes}'"
-        if qc_form.qc_document_file:
-            details_qc += f' <br><a href="{qc_form.qc_document_file.url}" target="_blank" class="fw-normal text-decoration-none"><i class="bi bi-file-earmark-arrow-down"></i> Download QC Form</a>'
-        
-        history_items.append({
-            'date': qc_form.submitted_at, 
-            'type': 'QC Submit',
-            'actor': qc_form.technician.username,
-            'details': details_qc 
-        })
-        
-        # QC Approve / Reject
-        if qc_form.managed_at: 
-            if qc_form.is_approved_by_lead:
-                history_items.append({
-                    'date': qc_form.managed_at, 
-                    'type': 'QC Approve',
-                    'actor': 'Lead Tech' , 
-                    'details': f"QC Disetujui. Komentar: '{qc_form.lead_technician_comments}'"
-                })
-            elif qc_form.lead_technician_comments:
-                history_items.append({
-                    'date': qc_form.managed_at, 
-                    'type': 'QC Reject',
-                    'actor': 'Lead Tech',
-                    'details': f"QC Ditolak. Komentar: '{qc_form.lead_technician_comments}'"
-                })
-
-        # 3. Info Spare Part
-        parts = SparePartRequest.objects.filter(qc_form=qc_form)
-        for part in parts:
-            history_items.append({
-                'date': part.created_at, 
-                'type': 'Spare Part',
-                'actor': part.qc_form.technician.username,
-                'details': f"Request part: {part.quantity_needed}x {part.part_name}. Status: {part.get_status_display()}"
-            })
-            if part.managed_at:
-                actor_name = part.warehouse_manager.username if part.warehouse_manager else 'Warehouse'
-                history_items.append({
-                    'date': part.managed_at,
-                    'type': 'Spare Part',
-                    'actor': actor_name,
-                    'details': f"Part {part.part_name} di-manage. Status: {part.get_status_display()}"
-                })
-                if part.lead_receipt_at:
-                    actor_name = part.lead_receipt_approver.username if part.lead_receipt_approver else 'Lead Tech'
-                    history_items.append({
-                        'date': part.lead_receipt_at,
-                        'type': 'Spare Part', # Anda bisa buat tipe baru 'Lead Receipt' jika mau
-                        'actor': actor_name,
-                        'details': f"Part {part.part_name} dikonfirmasi penerimaannya oleh Lead. Status: {part.get_status_display()}"
-                    })
-            if qc_form.installation_submitted_at:
-                details_install = f"Form instalasi (B/A) disubmit. Catatan: '{qc_form.installation_notes}'"
-                if qc_form.photo_before_install:
-                    details_install += f' <br><a href="{qc_form.photo_before_install.url}" target="_blank" class="fw-normal text-decoration-none"><i class="bi bi-camera"></i> Lihat Foto Before</a>'
-                if qc_form.photo_after_install:
-                    details_install += f' <br><a href="{qc_form.photo_after_install.url}" target="_blank" class="fw-normal text-decoration-none"><i class="bi bi-camera-reels"></i> Lihat Foto After</a>'
-            
-                history_items.append({
-                    'date': qc_form.installation_submitted_at,
-                    'type': 'Install Submit',
-                    'actor': qc_form.technician.username,
-                    'details': details_install # Gunakan variabel details_install yang baru
-                })
-            if qc_form.final_managed_at:
-                if qc_form.final_approval_at: 
-                    history_items.append({
-                        'date': qc_form.final_managed_at,
-                        'type': 'Install Approve',
-                        'actor': 'Lead Tech', 
-                        'details': f"Instalasi disetujui. Komentar: '{qc_form.final_lead_comments}'"
-                    })
-                else: 
-                    history_items.append({
-                        'date': qc_form.final_managed_at,
-                        'type': 'Install Reject',
-                        'actor': 'Lead Tech',
-                        'details': f"Instalasi ditolak. Komentar: '{qc_form.final_lead_comments}'"
-                    })
-    except QCForm.DoesNotExist:
-        pass # Belum ada QC
-
-    # 4. Info Penempatan Rak
-    if sku.shelved_at: 
-        history_items.append({
-            'date': sku.shelved_at, 
-            'type': 'Shelving',
-            'actor': 'Warehouse',
-            'details': f"Ditempatkan di rak: {sku.shelf_location}"
-        })
-
-    # 5. Info Movement
-    movements = MovementRequest.objects.filter(sku_to_move=sku)
-    for move in movements:
-        details_kirim = f"Dikirim ke {move.requested_by_shop}."
-        if move.delivery_form:
-            details_kirim += f' <a href="{move.delivery_form.url}" target="_blank" class="fw-normal text-decoration-none">(Lihat Form DO)</a>'
-
-        history_items.append({
-            'date': move.created_at, 
-            'type': 'Movement',
-            'actor': 'Warehouse',
-            'details': details_kirim # Menggunakan string baru
-        })
-        if move.received_at:
-            details_terima = f"Dikonfirmasi diterima di {move.requested_by_shop}."
-            if move.receipt_form:
-                details_terima += f' <a href="{move.receipt_form.url}" target="_blank" class="fw-normal text-decoration-none">(Lihat Bukti Terima)</a>'
-
-            history_items.append({
-                'date': move.received_at,
-                'type': 'Movement',
-                'actor': 'Warehouse',
-                'details': details_terima # Menggunakan string baru
-            })
-    # 6. Info Penjualan (Sales)
-    # Ambil order paling baru yang terkait dengan SKU ini
-    sales_order = SalesOrder.objects.filter(sku=sku).order_by('-created_at').first()
-    
-    if sales_order:
-        history_items.append({
-            'date': sales_order.created_at,
-            'type': 'Sales Order',
-            'actor': sales_order.sales_person.username,
-            'details': f"Order dibuat untuk: <strong>{sales_order.customer_name}</strong>. Status: {sales_order.get_status_display()}"
-        })
-
-        # 7. Info Pembayaran
-        payments = Payment.objects.filter(sales_order=sales_order).order_by('payment_date')
-        for payment in payments:
-            # Format angka dengan koma
-            amount_formatted = "{:,.0f}".format(payment.amount).replace(",", ".")
-            history_items.append({
-                'date': payment.payment_date,
-                'type': 'Payment',
-                'actor': sales_order.sales_person.username,
-                'details': ( f"Pembayaran diterima <strong>Rp {amount_formatted}</strong>. <a href='{payment.proof_of_transfer.url}' target='_blank' class='fw-normal text-decoration-none text-info'> <i class='bi bi-receipt'></i> Lihat Bukti Transfer </a>")
-            })
-
-        # 8. Info Pengiriman (Shipping)
-        if sales_order.shipped_at:
-            details_shipping = f"Dikirim ke {sales_order.customer_name}."
-            if sales_order.shipping_type:
-                details_shipping += f" Tipe: {sales_order.shipping_type}."
-            if sales_order.shipping_receipt:
-                 details_shipping += f" <a href='{sales_order.shipping_receipt.url}' target='_blank' class='fw-normal text-decoration-none'>(Lihat Resi)</a>"
-            
-            history_items.append({
-                'date': sales_order.shipped_at,
-                'type': 'Shipping',
-                'actor': sales_order.sales_person.username,
-                'details': details_shipping
-            })
-        
-        # 9. Info Penerimaan (Completed)
-        if sales_order.completed_at:
-            history_items.append({
-                'date': sales_order.completed_at,
-                'type': 'Completed',
-                'actor': sales_order.customer_name, # Aktornya adalah customer
-                'details': f"Diterima oleh customer. <a href='{sales_order.proof_of_receipt.url}' target='_blank' class='fw-normal text-decoration-none'>(Lihat Bukti Terima)</a>"
-            })
-    if history_items:
-        history_items.sort(key=lambda x: x['date'] or timezone.now(), reverse=True)
-
+    # Dibaca dari log SKUEvent (lihat timeline.py)
+    sku, history_items = timeline.load_sku_history(sku_id)
     return {
         'sku': sku,
         'history_items': history_items
@@ -1167,9 +994,15 @@ def sku_history(request, sku_id):
 
 @login_required(login_url='login')
 def get_sku_history_modal(request, sku_id):
-    context = _get_sku_history_context(sku_id)
-    # Render template parsial yang baru kita buat
-    return render(request, 'app/_includes/sku_history_modal_content.html', context)
+    # Fragment di-cache per SKU + versi; versi naik saat data terkait berubah
+    cache_key = timeline.history_fragment_key(sku_id, f"{request.scheme}://{request.get_host()}")
+    html = cache.get(cache_key)
+    if html is None:
+        context = _get_sku_history_context(sku_id)
+        # Render template parsial yang baru kita buat
+        html = render_to_string('app/_includes/sku_history_modal_content.html', context, request=request)
+        cache.set(cache_key, html, timeline.HISTORY_CACHE_TIMEOUT)
+    return HttpResponse(html)
 
 @login_required(login_url='login')
 @user_passes_test(is_purchasing)
@@ -1198,8 +1031,18 @@ def po_create(request):
                     messages.error(request, "Detail SKU Mesin tidak lengkap atau tidak sesuai dengan Jumlah SKU Diharapkan.")
                     return render_error_context(request, form, rack_grid) 
 
-            calculated_total_po_price = sum(float(item['po_price']) for item in sku_details_list)
-            if calculated_total_po_price != form.cleaned_data.get('total_po_price', 0):
+            # Validasi semua detail dulu, baru tulis sekaligus dengan bulk_create
+            sku_details = []
+            for index, item_data in enumerate(sku_details_list, start=1):
+                sku_detail_form = SKUDetailPOForm(item_data)
+                if not sku_detail_form.is_valid():
+                    messages.error(request, f"Detail SKU ke-{index} tidak valid: {sku_detail_form.errors.as_text()}")
+                    return render_error_context(request, form, rack_grid)
+                sku_details.append(sku_detail_form.save(commit=False))
+
+            # Decimal, bukan float: harga Rupiah besar tidak boleh kehilangan presisi
+            calculated_total_po_price = sum((detail.po_price for detail in sku_details), Decimal(0))
+            if calculated_total_po_price != (form.cleaned_data.get('total_po_price') or Decimal(0)):
                 messages.error(request, "Terjadi ketidaksesuaian antara Total PO yang dikirim dan perhitungan detail SKU. Harap ulangi proses.")
                 return render_error_context(request, form, rack_grid)
 
@@ -1210,14 +1053,9 @@ def po_create(request):
                     po.status = 'Pending_Approval'
                     po.save()
                     
-                    for item_data in sku_details_list:
-                        sku_detail_form = SKUDetailPOForm(item_data)
-                        if sku_detail_form.is_valid():
-                            sku_detail = sku_detail_form.save(commit=False)
-                            sku_detail.purchase_order = po
-                            sku_detail.save()
-                        else:
-                            raise IntegrityError(f"Detail SKU ke-{sku_detail_form.errors}")
+                    for sku_detail in sku_details:
+                        sku_detail.purchase_order = po
+                    SKUDetailPO.objects.bulk_create(sku_details)
                     messages.success(request, f"PO {po.po_number} berhasil dibuat dan menunggu approval WM.")
                     return redirect('dashboard')
             
@@ -1240,6 +1078,50 @@ def po_create(request):
     }
     return render(request, 'app/po_create.html', context)
 
+@login_required(login_url='login')
+@user_passes_test(is_purchasing)
+def po_import(request):
+    """
+    Buat PO dari file CSV/XLSX berisi detail SKU mesin (lihat po_import.py).
+    Semua baris divalidasi sekaligus; jika ada error, tidak ada yang disimpan
+    dan daftar error per baris ditampilkan.
+    """
+    row_errors = []
+    if request.method == 'POST':
+        form = PurchaseOrderImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            try:
+                rows = po_import_service.read_rows(form.cleaned_data['file'])
+                details, total_price, row_errors = po_import_service.validate_rows(rows)
+            except po_import_service.ImportFileError as e:
+                form.add_error('file', str(e))
+            else:
+                if row_errors:
+                    messages.error(request, f"Import dibatalkan: {len(row_errors)} kesalahan ditemukan. Perbaiki file lalu upload ulang.")
+                else:
+                    try:
+                        po = po_import_service.create_purchase_order(form.cleaned_data['po_number'], details, total_price)
+                    except po_import_service.ImportFileError as e:
+                        form.add_error(None, str(e))
+                    except IntegrityError:
+                        form.add_error('po_number', "Nomor PO sudah terdaftar.")
+                    else:
+                        messages.success(
+                            request,
+                            f"PO {po.po_number} berhasil diimport ({len(details)} SKU, total Rp {intcomma(total_price)}) dan menunggu approval WM."
+                        )
+                        return redirect('dashboard')
+    else:
+        form = PurchaseOrderImportForm()
+
+    context = {
+        'form': form,
+        'row_errors': row_errors,
+        'columns': po_import_service.FIELDS,
+        'required_columns': po_import_service.REQUIRED_FIELDS,
+    }
+    return render(request, 'app/po_import.html', context)
+
 def render_error_context(request, form, rack_grid):
     context = {
         'form': form,
@@ -1318,7 +1200,7 @@ def po_approve_detail(request, po_id):
 
 def can_view_po_detail(user):
     """Fungsi baru untuk mengizinkan WM DAN Purchasing."""
-    return user.groups.filter(name__in=['Warehouse Manager', 'Purchasing']).exists()
+    return has_role(user, 'Warehouse Manager', 'Purchasing')
 
 # --- Receiving ---
 @login_required(login_url='login')
@@ -1375,7 +1257,6 @@ def receiving_detail(request, po_id):
                     assigned_technician = User.objects.get(id=technician_id)
 
                     with transaction.atomic():
-                        
                         # Cek duplikasi SKU ID
                         if SKU.objects.filter(po_number=po, sku_id=machine_sku_id_from_post).exists():
                             messages.warning(request, f"SKU ID {machine_sku_id_from_post} sudah didaftarkan.")
@@ -1389,14 +1270,13 @@ def receiving_detail(request, po_id):
                             assigned_technician=assigned_technician,
                             status='QC', # Status awal setelah diterima
                             location='Warehouse',
-                            shelf_location=selected_rack, 
-                            shelved_at=timezone.now()
                         )
                         
-                        # 2. Update status Rack
-                        selected_rack.status = 'Used'
-                        selected_rack.occupied_by_sku = new_sku
-                        selected_rack.save()
+                        # 2. Tempatkan di rak (rak dikunci & dicek ulang, kedua sisi relasi diisi)
+                        selected_rack, _ = slotting.place_sku(new_sku, selected_rack.pk)
+
+                        timeline.record_sku_event(new_sku, timeline.receiving_event(new_sku, user=request.user))
+                        timeline.record_sku_event(new_sku, timeline.shelving_event(new_sku, user=request.user))
                     
                         messages.success(request, f"SKU {new_sku.sku_id} diterima, ditempatkan di rak **{selected_rack.rack_location}**, dan ditugaskan ke {assigned_technician.username}.")
 
@@ -1413,14 +1293,43 @@ def receiving_detail(request, po_id):
 
                 except User.DoesNotExist:
                     messages.error(request, "Penerimaan Gagal: Teknisi tidak valid.")
+                except slotting.SlottingError as e:
+                    messages.error(request, f"Penerimaan Gagal: {e} Pilih rak lain.")
+                    return redirect('receiving_detail', po_id=po.id)
                 except Exception as e:
                     # Menangkap semua error lain (misal IntegrityError)
                     messages.error(request, f"Penerimaan Gagal (Internal Error): {e}")
                     return redirect('receiving_detail', po_id=po.id)
             
+        # --- A2. TERIMA BANYAK SKU SEKALIGUS (batch receiving, lihat receiving.py) ---
+        elif 'receive_batch' in request.POST or 'receive_all_auto' in request.POST:
+            if 'receive_all_auto' in request.POST:
+                detail_ids = receiving.pending_details(po).values_list('id', flat=True)
+                assignments = [{'detail': detail_id, 'technician': receiving.AUTO, 'rack': receiving.AUTO} for detail_id in detail_ids]
+            else:
+                assignments = [
+                    {
+                        'detail': detail_id,
+                        'technician': request.POST.get(f'batch_technician_{detail_id}'),
+                        'rack': request.POST.get(f'batch_rack_{detail_id}'),
+                    }
+                    for detail_id in request.POST.getlist('batch_detail')
+                ]
+            try:
+                plan = receiving.validate_assignments(po, assignments)
+                new_skus = receiving.receive_batch(po, plan, user=request.user)
+            except receiving.ReceivingError as e:
+                for error in e.errors:
+                    messages.error(request, f"Penerimaan Gagal: {error}")
+            except IntegrityError:
+                messages.error(request, "Penerimaan Gagal: sebagian SKU baru saja didaftarkan user lain. Muat ulang halaman.")
+            else:
+                messages.success(request, f"{len(new_skus)} SKU diterima dan ditempatkan di rak.")
+            return redirect('receiving_detail', po_id=po.id)
+
         # --- B. LOGIKA UPLOAD DR & PACKING LIST NOT OK (tetap) ---
         elif 'upload_dr' in request.POST:
-             dr_file = request.FILES.get('delivery_receipt_file')
+             dr_file = uploads.get_file(request, 'delivery_receipt_file')
              if dr_file:
                  po.delivery_receipt = dr_file
                  po.save()
@@ -1451,6 +1360,7 @@ def receiving_detail(request, po_id):
         'po': po,
         'skus_in_po': skus_in_po,
         'technicians': technicians,
+        'batch_racks': list(slotting.available_racks().order_by('rack_location').values_list('rack_location', flat=True)),
         'rack_selection_form': RackSelectionForm(), # Pastikan ini selalu baru
         'sku_details_to_receive': sku_details_to_receive, 
     }
@@ -1464,14 +1374,7 @@ def qc_form(request, sku_id):
     # 1. Kosongkan rak jika SKU berada di rak (ini adalah proses sebelum QC)
     if sku.status == 'QC' and sku.shelf_location:
         try:
-            with transaction.atomic():
-                rack = sku.shelf_location
-                rack.occupied_by_sku = None
-                rack.status = 'Available' 
-                rack.save()
-                sku.shelf_location = None
-                sku.shelved_at = None
-                sku.save()
+            for rack in slotting.release_sku(sku):
                 messages.info(request, f"Lokasi rak {rack.rack_location} berhasil dikosongkan.")
         except Exception as e:
             messages.error(request, f"Gagal mengosongkan rak: {e}")
@@ -1481,31 +1384,18 @@ def qc_form(request, sku_id):
     except QCForm.DoesNotExist:
         existing_form = None
 
-    # --- BARU: Ambil data Grid Rak untuk Modal (Sesuai permintaan "kursi bioskop") ---
-    # Ambil semua rak, filter hanya yang available atau yang sedang ditempati
-    all_racks = Rack.objects.select_related('occupied_by_sku').order_by('rack_location')
-    rack_grid = {}
-    
-    # Kelompokkan berdasarkan prefix (misal 'A1', 'B2')
-    for rack in all_racks:
-        # Hanya tampilkan rack yang Available (Hijau)
-        if rack.status == 'Available' or rack.occupied_by_sku == sku:
-             # Asumsi format rack_location adalah A1-01. Kita ambil A1 sebagai grouping.
-             prefix = rack.rack_location.split('-')[0] 
-             if prefix not in rack_grid:
-                 rack_grid[prefix] = []
-             rack_grid[prefix].append(rack)
-             
-    # --- END Grid Rak preparation ---
+    # Grid rak kosong per zona ("kursi bioskop") + rekomendasi engine slotting
+    rack_grid = slotting.free_slot_grid()
+    suggested_rack = slotting.propose(sku=sku, stage='qc')
 
     if request.method == 'POST':
         notes = request.POST.get('condition_notes')
         needs_spare_part = request.POST.get('needs_spare_part') == 'on'
         part_name = request.POST.get('part_name', '')
         part_qty = request.POST.get('part_qty', 1)
-        qc_file = request.FILES.get('qc_document_file')
+        qc_file = uploads.get_file(request, 'qc_document_file')
         
-        # --- AMBIL ID RAK DARI FIELD HIDDEN ---
+        # --- AMBIL ID RAK DARI FIELD HIDDEN ('auto' = rekomendasi engine slotting) ---
         selected_rack_id = request.POST.get('selected_rack_id') 
         
         # 2. VALIDASI RAK
@@ -1517,56 +1407,58 @@ def qc_form(request, sku_id):
                 'sku': sku,
                 'existing_form': existing_form,
                 'rack_grid': rack_grid, # Menggunakan data grid
+                'suggested_rack': suggested_rack,
             }
             return render(request, 'app/qc_form.html', context)
-        
-        try:
-            # Pastikan rak yang dipilih benar-benar Available
-            selected_rack = Rack.objects.get(id=selected_rack_id, status='Available')
-        except Rack.DoesNotExist:
-            messages.error(request, "Rak yang dipilih tidak valid atau sudah terisi.")
-            return redirect('qc_form', sku_id=sku_id)
-
-        # 3. Proses QC Form
-        qc_obj, created = QCForm.objects.get_or_create(
-            sku=sku, 
-            defaults={'technician': request.user, 'condition_notes': notes}
-        )
-        
-        if not created:
-            # Logika re-submit form QC yang ditolak (Logika tetap sama)
-            qc_obj.condition_notes = notes
-            qc_obj.is_approved_by_lead = False
-            qc_obj.lead_technician_comments = None 
-        if qc_file:
-            qc_obj.qc_document_file = qc_file
-        qc_obj.save()
-        
-        # 4. Proses Spare Part Request (Logika tetap sama)
-        old_requests = SparePartRequest.objects.filter(
-            qc_form=qc_obj, 
-            status__in=['Pending', 'Rejected'] 
-        )
-        old_requests.delete()
-
-        if needs_spare_part and part_name:
-            SparePartRequest.objects.create(
-                qc_form=qc_obj,
-                part_name=part_name,
-                quantity_needed=part_qty,
-                status='Pending'
-            )
 
-        # 5. UPDATE RACK STATUS DAN SKU LOCATION
-        with transaction.atomic():
-            selected_rack.status = 'Used'
-            selected_rack.occupied_by_sku = sku
-            selected_rack.save()
+        try:
+            with transaction.atomic():
+                # Rak dikunci (select_for_update) dan dicek ulang, jadi dua teknisi
+                # tidak bisa menempati slot yang sama
+                selected_rack, _ = slotting.place_sku(sku, selected_rack_id, stage='qc')
+
+                # 3. Proses QC Form
+                qc_obj, created = QCForm.objects.get_or_create(
+                    sku=sku, 
+                    defaults={'technician': request.user, 'condition_notes': notes}
+                )
+                
+                if not created:
+                    # Logika re-submit form QC yang ditolak (Logika tetap sama)
+                    qc_obj.condition_notes = notes
+                    qc_obj.is_approved_by_lead = False
+                    qc_obj.lead_technician_comments = None 
+                if qc_file:
+                    qc_obj.qc_document_file = qc_file
+                qc_obj.save()
+                
+                # 4. Proses Spare Part Request (Logika tetap sama)
+                old_requests = SparePartRequest.objects.filter(
+                    qc_form=qc_obj, 
+                    status__in=['Pending', 'Rejected'] 
+                )
+                old_requests.delete()
+
+                new_part_request = None
+                if needs_spare_part and part_name:
+                    new_part_request = SparePartRequest.objects.create(
+                        qc_form=qc_obj,
+                        part_name=part_name,
+                        quantity_needed=part_qty,
+                        status='Pending'
+                    )
+
+                # 5. UPDATE STATUS SKU (rak sudah ditempati di langkah 2)
+                sku.status = 'QC_PENDING' 
+                sku.save()
 
-            sku.shelf_location = selected_rack
-            sku.shelved_at = timezone.now()
-            sku.status = 'QC_PENDING' 
-            sku.save()
+                timeline.record_sku_event(sku, timeline.qc_submit_event(qc_obj))
+                if new_part_request:
+                    timeline.record_sku_event(sku, timeline.part_request_event(new_part_request, request.user))
+                timeline.record_sku_event(sku, timeline.shelving_event(sku, user=request.user))
+        except slotting.SlottingError as e:
+            messages.error(request, str(e))
+            return redirect('qc_form', sku_id=sku_id)
         
         messages.success(request, f"Form QC disubmit. SKU {sku.sku_id} ditempatkan di rak **{selected_rack.rack_location}** dan menunggu verifikasi Lead.")
 
@@ -1577,6 +1469,7 @@ def qc_form(request, sku_id):
         'sku': sku,
         'existing_form': existing_form,
         'rack_grid': rack_grid, # Menggunakan data grid
+        'suggested_rack': suggested_rack,
     }
     return render(request, 'app/qc_form.html', context)
 
@@ -1590,17 +1483,12 @@ def qc_verify(request, qc_id):
     has_pending_parts = part_requests.exists()
     
     rack_grid = {}
+    suggested_rack = None
 
     # --- MEMUAT DATA GRID RAK HANYA JIKA TIDAK ADA SPARE PART PENDING ---
     if not has_pending_parts:
-        all_racks = Rack.objects.select_related('occupied_by_sku').order_by('rack_location')
-        for rack in all_racks:
-            # Tampilkan rack yang Available (Hijau)
-            if rack.status == 'Available':
-                 prefix = rack.rack_location.split('-')[0]
-                 if prefix not in rack_grid:
-                     rack_grid[prefix] = []
-                 rack_grid[prefix].append(rack)
+        rack_grid = slotting.free_slot_grid()
+        suggested_rack = slotting.propose(sku=sku, stage='ready')
 
     if request.method == 'POST':
         comments = request.POST.get('comments', '')
@@ -1626,44 +1514,36 @@ def qc_verify(request, qc_id):
                         'sku': sku,
                         'part_requests': part_requests,
                         'rack_grid': rack_grid,
+                        'suggested_rack': suggested_rack,
                     }
                     return render(request, 'app/qc_verify.html', context)
 
                 try:
-                    selected_rack = Rack.objects.get(id=selected_rack_id, status='Available')
-                except Rack.DoesNotExist:
-                    messages.error(request, "Persetujuan Gagal: Rak yang dipilih tidak valid atau sudah terisi.")
-                    return redirect('qc_verify', qc_id=qc_id)
-
-                with transaction.atomic():
-                    try:
-                        old_rack = Rack.objects.get(occupied_by_sku=sku)
-                        if old_rack.id != selected_rack.id:
-                            old_rack.occupied_by_sku = None
-                            old_rack.status = 'Available'
-                            old_rack.save()
+                    with transaction.atomic():
+                        # A. Pindah rak: rak baru dikunci & dicek ulang ('auto' = rekomendasi
+                        # engine slotting), rak lama dikosongkan, kedua sisi relasi diisi
+                        selected_rack, released = slotting.place_sku(sku, selected_rack_id, stage='ready')
+                        for old_rack in released:
                             messages.warning(request, f"Rak lama {old_rack.rack_location} dikosongkan.")
-                    except Rack.DoesNotExist:
-                        pass
-
-                    # B. Update SKU
-                    sku.status = 'Ready'
-                    sku.shelf_location = selected_rack # Set relasi ForeignKey
-                    sku.shelved_at = timezone.now()
-                    sku.save()
 
-                    # C. Update Rack BARU (Ini yang menyebabkan error sebelumnya)
-                    selected_rack.status = 'Used'
-                    selected_rack.occupied_by_sku = sku # Set relasi OneToOne
-                    selected_rack.save()
+                        # B. Update SKU
+                        sku.status = 'Ready'
+                        sku.save()
         
-                    qc_form.save()
-                    messages.success(request, f"QC disetujui. SKU {sku.sku_id} kini READY dan ditempatkan di rak {selected_rack.rack_location}.")
+                        qc_form.save()
+                        timeline.record_sku_event(sku, timeline.qc_decision_event(qc_form, user=request.user))
+                        timeline.record_sku_event(sku, timeline.shelving_event(sku, user=request.user))
+                        messages.success(request, f"QC disetujui. SKU {sku.sku_id} kini READY dan ditempatkan di rak {selected_rack.rack_location}.")
+                except slotting.SlottingError as e:
+                    messages.error(request, f"Persetujuan Gagal: {e}")
+                    return redirect('qc_verify', qc_id=qc_id)
 
             else:
-                sku.status = 'AWAITING_INSTALL' 
-                sku.save()
-                qc_form.save()
+                with transaction.atomic():
+                    sku.status = 'AWAITING_INSTALL' 
+                    sku.save()
+                    qc_form.save()
+                    timeline.record_sku_event(sku, timeline.qc_decision_event(qc_form, user=request.user))
                 messages.info(request, "QC disetujui. Permintaan Spare Part diteruskan ke Warehouse Manager (WM).")
             
             return redirect('dashboard')
@@ -1677,22 +1557,25 @@ def qc_verify(request, qc_id):
             qc_form.is_approved_by_lead = False
             qc_form.lead_technician_comments = comments
             qc_form.managed_at = timezone.now()
-            qc_form.save()
-
-            # Ubah status spare part request yang pending menjadi 'Rejected'
-            pending_parts = SparePartRequest.objects.filter(qc_form=qc_form, status='Pending')
-            for part in pending_parts:
-                part.status = 'Rejected'
-                part.save()
-
-            # Reset analytics count
-            technician_user = qc_form.technician
-            analytics, created = TechnicianAnalytics.objects.get_or_create(technician=technician_user)
-            analytics.wrong_qc_count += 1
-            analytics.save()
-
-            sku.status = 'QC'
-            sku.save()
+            with transaction.atomic():
+                qc_form.save()
+                # Setiap reject tercatat, walau komentar di QCForm tertimpa reject berikutnya
+                timeline.record_sku_event(sku, timeline.qc_decision_event(qc_form, user=request.user))
+
+                # Ubah status spare part request yang pending menjadi 'Rejected'
+                pending_parts = SparePartRequest.objects.filter(qc_form=qc_form, status='Pending')
+                for part in pending_parts:
+                    part.status = 'Rejected'
+                    part.save()
+
+                # Reset analytics count
+                technician_user = qc_form.technician
+                analytics, created = TechnicianAnalytics.objects.get_or_create(technician=technician_user)
+                analytics.wrong_qc_count += 1
+                analytics.save()
+
+                sku.status = 'QC'
+                sku.save()
             messages.warning(request, f"QC ditolak. SKU {sku.sku_id} dikembalikan ke Teknisi.")
 
             return redirect('dashboard')
@@ -1703,6 +1586,7 @@ def qc_verify(request, qc_id):
         'sku': sku,
         'part_requests': part_requests,
         'rack_grid': rack_grid, # Kirim data grid (mungkin kosong jika ada pending part)
+        'suggested_rack': suggested_rack,
     }
     return render(request, 'app/qc_verify.html', context)
 @login_required(login_url='login')
@@ -1748,14 +1632,15 @@ def manage_sparepart(request, request_id):
                 elif inventory_item.quantity_in_stock > 0 and inventory_item.status != 'Ready':
                     inventory_item.status = 'Ready'
                     
-                inventory_item.save()
-                
                 # 4. Update Part Request (KONEKSI RELASI FOREINGKEY)
                 part_request.issued_spare_part = inventory_item # <<< INI PENTING
                 part_request.status = 'PENDING_LEAD_RECEIPT' 
                 part_request.warehouse_manager = request.user
                 part_request.managed_at = timezone.now()
-                part_request.save()
+                with transaction.atomic():
+                    inventory_item.save()
+                    part_request.save()
+                    timeline.record_sku_event(sku, timeline.part_managed_event(part_request))
                 
                 messages.success(request, f"Part '{inventory_item.part_name}' berhasil dikeluarkan. Menunggu konfirmasi Lead Tech.")
             else:
@@ -1765,7 +1650,9 @@ def manage_sparepart(request, request_id):
             part_request.status = 'Approved_Buy'
             part_request.warehouse_manager = request.user
             part_request.managed_at = timezone.now()
-            part_request.save()
+            with transaction.atomic():
+                part_request.save()
+                timeline.record_sku_event(sku, timeline.part_managed_event(part_request))
             messages.info(request, "Request pembelian telah diteruskan ke Purchasing.")
 
         return redirect('dashboard')
@@ -1792,7 +1679,7 @@ def movement_process(request):
     if request.method == 'POST':
         # --- Hanya proses 'create_movement' ---
         if 'create_movement' in request.POST:
-            form = MovementRequestForm(request.POST, request.FILES)
+            form = MovementRequestForm(request.POST, uploads.collect_files(request, 'delivery_form'))
             if form.is_valid():
                 movement = form.save(commit=False)
                 sku_to_move = movement.sku_to_move
@@ -1803,12 +1690,13 @@ def movement_process(request):
                     return redirect('movement_process')
 
                 movement.status = 'Delivering'
-                movement.save()
-
                 sku_to_move.status = 'Delivering'
                 sku_to_move.location = 'Shop' # Update lokasi sementara
                 sku_to_move.current_store = movement.requested_by_store # Set Store Tujuan
-                sku_to_move.save()
+                with transaction.atomic():
+                    movement.save()
+                    sku_to_move.save()
+                    timeline.record_sku_event(sku_to_move, timeline.movement_sent_event(movement, user=request.user))
 
                 messages.success(request, f"Pengiriman SKU {sku_to_move.sku_id} ke {movement.requested_by_store.name} berhasil dibuat. Menunggu penerimaan Sales.")
             else:
@@ -1889,18 +1777,21 @@ def approve_part_receipt(request, part_id):
             part_request.status = 'Issued' # Sekarang resmi 'Issued'
             part_request.lead_receipt_approver = request.user
             part_request.lead_receipt_at = timezone.now()
-            part_request.save()
+            with transaction.atomic():
+                part_request.save()
+                timeline.record_sku_event(sku, timeline.part_receipt_event(part_request))
 
-            # 2. Cek apakah ada part lain yang masih 'Pending' untuk SKU ini
-            other_pending_parts = SparePartRequest.objects.filter(
-                qc_form=qc_form, 
-                status__in=['Pending', 'Approved_Buy', 'Received', 'PENDING_LEAD_RECEIPT']
-            ).exists()
+                # 2. Cek apakah ada part lain yang masih 'Pending' untuk SKU ini
+                other_pending_parts = SparePartRequest.objects.filter(
+                    qc_form=qc_form, 
+                    status__in=['Pending', 'Approved_Buy', 'Received', 'PENDING_LEAD_RECEIPT']
+                ).exists()
 
-            # 3. Jika TIDAK ADA part lain, baru ubah status SKU
+                # 3. Jika TIDAK ADA part lain, baru ubah status SKU
+                if not other_pending_parts:
+                    sku.status = 'AWAITING_INSTALL'
+                    sku.save()
             if not other_pending_parts:
-                sku.status = 'AWAITING_INSTALL'
-                sku.save()
                 messages.success(request, f"Penerimaan part {part_request.part_name} disetujui. Tugas instalasi telah diteruskan ke teknisi.")
             else:
                 messages.success(request, f"Penerimaan part {part_request.part_name} disetujui. Masih menunggu part lain.")
@@ -1910,7 +1801,9 @@ def approve_part_receipt(request, part_id):
         elif 'reject' in request.POST:
             # Jika ditolak, kembalikan ke WM
             part_request.status = 'Pending' 
-            part_request.save()
+            with transaction.atomic():
+                part_request.save()
+                timeline.record_sku_event(sku, timeline.part_receipt_rejected_event(part_request, request.user))
             messages.error(request, f"Penerimaan part ditolak. Request dikembalikan ke Warehouse Manager.")
             return redirect('dashboard')
 
@@ -1935,47 +1828,49 @@ def installation_form(request, qc_id):
         qc_form.installation_notes = request.POST.get('installation_notes')
         qc_form.installation_submitted_at = timezone.now()
         qc_form.final_lead_comments = None
-        qc_form.save()
+        with transaction.atomic():
+            qc_form.save()
 
-        # --- LOGIKA BARU: MULTIPLE UPLOAD BEFORE ---
-        before_images = request.FILES.getlist('before_photos')
-        before_remarks = request.POST.getlist('before_remarks')
+            # --- LOGIKA BARU: MULTIPLE UPLOAD BEFORE ---
+            before_images = request.FILES.getlist('before_photos')
+            before_remarks = request.POST.getlist('before_remarks')
         
-        # Menggunakan zip untuk memasangkan foto dengan remarks-nya
-        for img, remark in zip(before_images, before_remarks):
-            InstallationPhoto.objects.create(
-                qc_form=qc_form,
-                image=img,
-                photo_type='before',
-                remarks=remark
-            )
+            # Menggunakan zip untuk memasangkan foto dengan remarks-nya
+            for img, remark in zip(before_images, before_remarks):
+                InstallationPhoto.objects.create(
+                    qc_form=qc_form,
+                    image=img,
+                    photo_type='before',
+                    remarks=remark
+                )
 
-        # --- LOGIKA BARU: MULTIPLE UPLOAD AFTER ---
-        after_images = request.FILES.getlist('after_photos')
-        after_remarks = request.POST.getlist('after_remarks')
+            # --- LOGIKA BARU: MULTIPLE UPLOAD AFTER ---
+            after_images = request.FILES.getlist('after_photos')
+            after_remarks = request.POST.getlist('after_remarks')
 
-        for img, remark in zip(after_images, after_remarks):
-            InstallationPhoto.objects.create(
-                qc_form=qc_form,
-                image=img,
-                photo_type='after',
-                remarks=remark
-            )
-        has_old_part = request.POST.get('has_old_part') == 'on'
-        old_part_name = request.POST.get('old_part_name', '')
+            for img, remark in zip(after_images, after_remarks):
+                InstallationPhoto.objects.create(
+                    qc_form=qc_form,
+                    image=img,
+                    photo_type='after',
+                    remarks=remark
+                )
+            has_old_part = request.POST.get('has_old_part') == 'on'
+            old_part_name = request.POST.get('old_part_name', '')
 
-        # Hapus data part lama sebelumnya jika ada (untuk re-submit)
-        ReturnedPart.objects.filter(qc_form=qc_form, status='Pending_Lead').delete()
+            # Hapus data part lama sebelumnya jika ada (untuk re-submit)
+            ReturnedPart.objects.filter(qc_form=qc_form, status='Pending_Lead').delete()
 
-        if has_old_part and old_part_name:
-            ReturnedPart.objects.create(
-                qc_form=qc_form,
-                part_name_reported=old_part_name,
-                status='Pending_Lead'
-            )
-        # Update status SKU
-        sku.status = 'PENDING_FINAL_CHECK'
-        sku.save()
+            if has_old_part and old_part_name:
+                ReturnedPart.objects.create(
+                    qc_form=qc_form,
+                    part_name_reported=old_part_name,
+                    status='Pending_Lead'
+                )
+            # Update status SKU
+            sku.status = 'PENDING_FINAL_CHECK'
+            sku.save()
+            timeline.record_sku_event(sku, timeline.install_submit_event(qc_form))
         
         messages.success(request, f"Form instalasi untuk SKU {sku.sku_id} telah disubmit.")
         return redirect('dashboard')
@@ -2039,14 +1934,6 @@ def final_check(request, qc_id):
                 }
                 return render(request, 'app/final_check.html', context)
             
-            selected_rack = None
-            if selected_rack_id:
-                try:
-                    selected_rack = Rack.objects.get(id=selected_rack_id)
-                except Rack.DoesNotExist:
-                    messages.error(request, "Rak yang dipilih tidak valid.")
-                    return redirect('final_check', qc_id=qc_id)
-
             # 3. Validasi SKU Part Lama (Jika ada part yang dikembalikan)
             if returned_part and not lead_assigned_sku:
                 messages.error(request, "APPROVAL GAGAL: Anda wajib mengisi Nomor SKU untuk sparepart lama yang dikembalikan.")
@@ -2072,26 +1959,19 @@ def final_check(request, qc_id):
                     sku.status = 'Ready'
                     
                     # 5. Logika Penempatan Rack (Hijau -> Merah)
-                    if selected_rack:
-                        # Jika SKU sebelumnya ada di rak manapun, lepaskan dulu
-                        if sku.shelf_location:
-                            old_rack = sku.shelf_location
-                            old_rack.occupied_by_sku = None
-                            old_rack.status = 'Available'
-                            old_rack.save()
-
-                        # Set rak baru
-                        selected_rack.status = 'Used'
-                        selected_rack.occupied_by_sku = sku
-                        selected_rack.save()
-                        
-                        sku.shelf_location = selected_rack
-                        sku.shelved_at = timezone.now()
+                    # Rak baru dikunci & dicek ulang ('auto' = rekomendasi engine slotting),
+                    # rak lama dilepas, kedua sisi relasi diisi dalam transaksi ini
+                    selected_rack = None
+                    if selected_rack_id:
+                        selected_rack, _ = slotting.place_sku(sku, selected_rack_id, stage='ready')
                         messages.success(request, f"Instalasi SKU {sku.sku_id} disetujui. SKU sekarang 'Ready' dan ditempatkan di rak **{selected_rack.rack_location}**.")
                     else:
                         messages.success(request, f"Instalasi SKU {sku.sku_id} disetujui. SKU sekarang 'Ready'.")
                         
                     sku.save()
+                    timeline.record_sku_event(sku, timeline.install_decision_event(qc_form, user=request.user))
+                    if selected_rack:
+                        timeline.record_sku_event(sku, timeline.shelving_event(sku, user=request.user))
                     
                     # 6. Logika Part Lama (Jika ada)
                     if returned_part:
@@ -2118,6 +1998,9 @@ def final_check(request, qc_id):
                             part_inventory.save()
                             
                     return redirect('dashboard')
+            except slotting.SlottingError as e:
+                messages.error(request, f"APPROVAL GAGAL: {e}")
+                return redirect('final_check', qc_id=qc_id)
             except Exception as e:
                 messages.error(request, f"Gagal memproses approval SKU: {e}")
                 return redirect('final_check', qc_id=qc_id)
@@ -2136,19 +2019,14 @@ def final_check(request, qc_id):
             # Hapus SKU dari rak jika ada
             if sku.shelf_location:
                 try:
-                    with transaction.atomic():
-                        rack = sku.shelf_location
-                        rack.occupied_by_sku = None
-                        rack.status = 'Available' 
-                        rack.save()
-                        sku.shelf_location = None
-                        sku.shelved_at = None
+                    for rack in slotting.release_sku(sku):
                         messages.warning(request, f"Rak {rack.rack_location} dikosongkan.")
                 except Exception as e:
                     messages.error(request, f"Gagal mengosongkan rak: {e}")
             
             sku.status = 'AWAITING_INSTALL'
             sku.save()
+            timeline.record_sku_event(sku, timeline.install_decision_event(qc_form, user=request.user))
             
             if returned_part:
                 returned_part.status = 'Rejected' 
@@ -2159,29 +2037,85 @@ def final_check(request, qc_id):
             return redirect('dashboard')
 
     # GET Request atau POST gagal (setelah validasi form non-database)
+    # Satu query untuk semua foto; galeri memakai thumbnail (lihat images.py)
+    photos = list(InstallationPhoto.objects.filter(qc_form=qc_form).order_by('created_at', 'pk'))
+    photos_before = [photo for photo in photos if photo.photo_type == 'before']
+    photos_after = [photo for photo in photos if photo.photo_type == 'after']
     context = {
         'qc_form': qc_form,
         'sku': sku,
         'returned_part': returned_part,
         'rack_form': rack_form, # Kirim form rak untuk modal
+        'suggested_rack': slotting.propose(sku=sku, stage='ready') if is_pending_final_check else None,
         'is_pending_final_check': is_pending_final_check,
-        'installation_photos_before': InstallationPhoto.objects.filter(qc_form=qc_form, photo_type='before'),
-        'installation_photos_after': InstallationPhoto.objects.filter(qc_form=qc_form, photo_type='after'),
+        'installation_photos_before': photos_before,
+        'installation_photos_after': photos_after,
+        'photo_groups': [('Foto Sebelum Instalasi', photos_before), ('Foto Sesudah Instalasi', photos_after)],
     }
     return render(request, 'app/final_check.html', context)
 
 @login_required(login_url='login')
-def inventory_search_api(request):
-    query = request.GET.get('q', '')
+def sku_search_api(request):
+    """Cari SKU (sku_id / nama) untuk sidebar, dipanggil saat user mengetik."""
+    query = request.GET.get('q', '').strip()
     results = []
-    
+
     if query:
-        parts = SparePartInventory.objects.filter(
-            Q(part_name__icontains=query) | 
-            Q(part_sku__icontains=query)
-        ).order_by('-quantity_in_stock')[:10]
-        
-        for part in parts:
+        for sku in queries.search_skus(query)[:20]:
+            results.append({
+                'id': sku.id,
+                'sku_id': sku.sku_id,
+                'name': sku.name,
+                'technician': sku.assigned_technician.username,
+                'status': sku.status,
+                'status_display': sku.get_status_display(),
+            })
+
+    return JsonResponse(results, safe=False)
+
+@login_required(login_url='login')
+def export_data(request, dataset):
+    """
+    Export dataset (lihat exports.EXPORTS) sebagai CSV atau XLSX yang di-stream.
+    Query string: format=csv|xlsx, columns=a,b,c, status=..., date_from/date_to=YYYY-MM-DD.
+    """
+    spec = exports.EXPORTS.get(dataset)
+    if spec is None:
+        raise Http404("Dataset export tidak dikenal.")
+    is_master = is_master_role(request.user)
+    if not (is_master or has_role(request.user, *spec['roles'])):
+        return HttpResponseForbidden("Anda tidak memiliki akses untuk export data ini.")
+
+    try:
+        header, rows = exports.build_export(dataset, request.GET, owner=None if is_master else request.user)
+    except exports.ExportError as e:
+        return HttpResponseBadRequest(str(e))
+
+    filename = f"{dataset}_{timezone.localdate():%Y%m%d}"
+    if request.GET.get('format') == 'xlsx':
+        response = StreamingHttpResponse(
+            exports.stream_xlsx(header, rows, sheet_name=spec['title']),
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        )
+        filename += '.xlsx'
+    else:
+        response = StreamingHttpResponse(exports.stream_csv(header, rows), content_type='text/csv; charset=utf-8')
+        filename += '.csv'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+@login_required(login_url='login')
+def inventory_search_api(request):
+    query = normalize_text(request.GET.get('q', ''))
+    if not query:
+        return JsonResponse([], safe=False)
+
+    # Cache pendek per query ternormalisasi: ketikan berulang tidak ke DB lagi
+    cache_key = search_cache_key('spare_part', query)
+    results = cache.get(cache_key)
+    if results is None:
+        results = []
+        for part in queries.search_spare_parts(query)[:10]:
             results.append({
                 'id': part.id, 
                 'name': part.part_name,
@@ -2190,889 +2124,137 @@ def inventory_search_api(request):
                 'sku_part': part.part_sku or '-',
                 'supplier': part.primary_supplier or '-'
             })
+        cache.set(cache_key, results, SEARCH_CACHE_TIMEOUT)
             
     return JsonResponse(results, safe=False)
 
-def get_logo_path():
-    """Mencoba menemukan logo di direktori statis."""
-    # Pastikan file logo Anda ada di direktori static: 'app/images/bringco.png'
-    static_path = find_static('app/images/bringco.png')
-    if static_path and os.path.exists(static_path):
-        return static_path
-        
-    # Fallback jika tidak ditemukan
-    try:
-        if settings.STATICFILES_DIRS:
-            logo_path_manual = os.path.join(settings.STATICFILES_DIRS[0], 'app/images/bringco.png')
-            if os.path.exists(logo_path_manual):
-                return logo_path_manual
-    except (AttributeError, IndexError):
-        pass
+def document_response(request, doc_type, obj, object_id=None):
+    """
+    Sajikan PDF dari cache dokumen (lihat documents.py); render di pool jika
+    belum ada. Jika render belum selesai, jawab 202 dan browser memuat ulang.
 
-    return None
+    File dikirim bertahap langsung dari disk (FileResponse -> wsgi.file_wrapper
+    / sendfile), tidak pernah dibaca utuh ke memori worker. ETag = hash konten,
+    jadi browser yang sudah punya versi yang sama mendapat 304 tanpa file dibuka.
+    """
+    document = documents.prepare(doc_type, obj, object_id=object_id)
+    etag = f'"{document.digest}"'
+    if documents.cached_path(document):
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+    path = documents.get_pdf(document)
+    try:
+        file = open(path, 'rb') if path else None
+    except FileNotFoundError:
+        # Versi ini dihapus proses lain (_remove_stale) setelah dipilih: muat ulang
+        file = None
+    if file is None:
+        response = HttpResponse("Dokumen sedang dibuat, halaman akan dimuat ulang otomatis...", status=202)
+        response['Refresh'] = '2'
+        response['Retry-After'] = '2'
+        return response
+    response = FileResponse(
+        file, content_type='application/pdf',
+        as_attachment=document.as_attachment, filename=document.filename,
+    )
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
 @login_required(login_url='login')
 @user_passes_test(is_sales)
 def print_order_label(request, order_id):
-    """
-    Menghasilkan label/faktur mini dalam format PDF ukuran 10x15 cm.
-    Mengatasi masalah alamat yang terpotong dan harga yang bertabrakan, 
-    serta memastikan layout terstruktur dan menarik.
-    """
+    """Label/faktur mini PDF 10x15 cm (documents.render_order_label)."""
     try:
-        order = get_object_or_404(SalesOrder, id=order_id, sales_person=request.user)
+        order = SalesOrder.objects.select_related('sku', 'sales_person').get(id=order_id, sales_person=request.user)
     except SalesOrder.DoesNotExist:
         # Menghandle kasus jika order tidak ditemukan atau sales_person tidak cocok
         return HttpResponse("Order not found or access denied.", status=404)
+    return document_response(request, 'order_label', order)
 
-    # --- Pengaturan Ukuran Halaman ---
-    LABEL_WIDTH = 10 * cm
-    LABEL_HEIGHT = 15 * cm
-    
-    # --- Persiapan Canvas PDF ---
-    response = HttpResponse(content_type='application/pdf')
-    filename = f'Order_Label_{order.id}_{order.customer_name.replace(" ", "_")}.pdf'
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    p = canvas.Canvas(response, pagesize=(LABEL_WIDTH, LABEL_HEIGHT))
-    
-    # --- Margin dan Posisi Awal ---
-    x_margin = 0.5 * cm
-    # Lebar efektif untuk konten
-    content_width = LABEL_WIDTH - 2 * x_margin
-    # Posisi Y awal (dari atas)
-    y_position = LABEL_HEIGHT - x_margin
-    LINE_HEIGHT = 0.4 * cm # Jarak antar baris standar
-    
-    # Lebar per kolom untuk alamat (4.5 cm)
-    COL_WIDTH = 4.5 * cm
-    MAX_ADDR_CHARS = int(COL_WIDTH / (p.stringWidth('W', 'Helvetica', 9) / 1.0))
-    ADDR_LINE_SPACING = 0.35 * cm # Spasi rapat untuk alamat
-
-    # --- Bagian 1: Header (Logo & Judul) 📦 ---
-    p.setLineWidth(1)
-    
-    logo_path = get_logo_path()
-    y_header_start = y_position
-    
-    if logo_path:
-        try:
-            logo = ImageReader(logo_path)
-            logo_width = 2.5 * cm
-            aspect_ratio = logo.getSize()[1] / logo.getSize()[0]
-            logo_height = logo_width * aspect_ratio
-            
-            # Draw Logo (Kiri)
-            p.drawImage(logo, x_margin, y_header_start - logo_height, width=logo_width, height=logo_height)
-            
-            # Draw Judul (Kanan)
-            p.setFont('Helvetica-Bold', 14)
-            p.drawRightString(LABEL_WIDTH - x_margin, y_header_start - 0.7 * cm, "INVOICE PENGIRIMAN")
-            p.setFont('Helvetica', 9)
-            p.drawRightString(LABEL_WIDTH - x_margin, y_header_start - 1.2 * cm, "BringCo - Official Shipping Label")
-            
-            y_position = y_header_start - max(logo_height, 1.5 * cm) - 0.2 * cm
-            
-        except Exception:
-            # Jika logo gagal dimuat
-            p.setFont('Helvetica-Bold', 14)
-            p.drawString(x_margin, y_position, "INVOICE/LABEL PENGIRIMAN")
-            y_position -= 0.6 * cm
-            p.setFont('Helvetica', 9)
-            p.drawString(x_margin, y_position, "BringCo - Official Shipping Label")
-            y_position -= 0.5 * cm
-    else:
-        # Jika tidak ada path logo
-        p.setFont('Helvetica-Bold', 14)
-        p.drawString(x_margin, y_position, "INVOICE/LABEL PENGIRIMAN")
-        y_position -= 0.6 * cm
-        p.setFont('Helvetica', 9)
-        p.drawString(x_margin, y_position, "BringCo - Official Shipping Label")
-        y_position -= 0.5 * cm
-            
-    # Garis pemisah Header
-    p.line(x_margin, y_position, LABEL_WIDTH - x_margin, y_position)
-    y_position -= 0.4 * cm
-    
-    # --- Bagian 2: Informasi Umum Order (2 Kolom) 📅 ---
-    col1_x = x_margin
-    col2_x = LABEL_WIDTH / 2.0
-    
-    p.setFont('Helvetica', 9)
-    
-    # Kiri: Order ID & Tanggal
-    p.drawString(col1_x, y_position, f"Order ID:")
-    p.setFont('Helvetica-Bold', 9)
-    p.drawString(col1_x + 1.8 * cm, y_position, f"{order.id}") 
-    p.setFont('Helvetica', 9) # Reset
-    y_position -= LINE_HEIGHT
-    
-    p.drawString(col1_x, y_position, f"Tgl Order:")
-    p.drawString(col1_x + 1.8 * cm, y_position, f"{order.created_at.strftime('%d-%m-%Y')}")
-    
-    # Kanan: Pengiriman & Status
-    temp_y = y_position + LINE_HEIGHT # Atur agar sejajar dengan Tgl Order
-    
-    p.drawString(col2_x, temp_y, f"Pengiriman:")
-    p.setFont('Helvetica-Bold', 9)
-    p.drawString(col2_x + 2.0 * cm, temp_y, f"{order.shipping_type or '-'}") 
-    temp_y -= LINE_HEIGHT
-    p.setFont('Helvetica', 9) # Reset
-    
-    p.drawString(col2_x, temp_y, f"Status:")
-    p.drawString(col2_x + 2.0 * cm, temp_y, f"{order.get_status_display()}")
-    
-    # Ambil posisi Y terendah dan beri jarak
-    y_position = min(y_position, temp_y) - 0.4 * cm
-    p.setLineWidth(2) # Garis lebih tebal untuk pemisah utama
-    p.line(x_margin, y_position, LABEL_WIDTH - x_margin, y_position)
-    p.setLineWidth(1) # Reset line width
-    y_position -= 0.5 * cm
-    
-    # --- Bagian 3: Data Customer & Alamat (Area Utama) 👤🏠 ---
-    current_y = y_position
-    col1_x = x_margin
-    col2_x = LABEL_WIDTH / 2.0
-
-    # Judul Kiri (PENERIMA)
-    p.setFont('Helvetica-Bold', 10)
-    p.setFillColorRGB(0.1, 0.1, 0.5) # Warna biru gelap
-    p.drawString(col1_x, current_y, "PENERIMA:")
-    
-    # Judul Kanan (PENGIRIM)
-    p.setFillColorRGB(0.5, 0.1, 0.1) # Warna merah gelap
-    p.drawString(col2_x, current_y, "PENGIRIM:")
-    p.setFillColorRGB(0, 0, 0) # Reset warna ke hitam
-    current_y -= 0.5 * cm
-    
-    # --- Kolom PENERIMA ---
-    current_y_col1 = current_y
-    p.setFont('Helvetica', 9)
-    
-    # Nama Penerima (Bold)
-    p.drawString(col1_x, current_y_col1, f"Nama: ") 
-    p.setFont('Helvetica-Bold', 9)
-    p.drawString(col1_x + 1.2 * cm, current_y_col1, f"{order.customer_name}")
-    p.setFont('Helvetica', 9) # Reset
-    current_y_col1 -= LINE_HEIGHT
-    
-    # Telp Penerima
-    p.drawString(col1_x, current_y_col1, f"Telp: {order.customer_phone}")
-    current_y_col1 -= 0.5 * cm
-    
-    # Alamat Penerima (Wrapping)
-    p.setFont('Helvetica-Bold', 9)
-    p.drawString(col1_x, current_y_col1, "Alamat:")
-    current_y_col1 -= ADDR_LINE_SPACING
-    
-    p.setFont('Helvetica', 9)
-    textobject_addr = p.beginText(col1_x, current_y_col1)
-    textobject_addr.setFont('Helvetica', 9)
-    
-    wrapped_address = textwrap.wrap(order.customer_address, width=MAX_ADDR_CHARS)
-    
-    for line in wrapped_address:
-        textobject_addr.textLine(line)
-        current_y_col1 -= ADDR_LINE_SPACING
-        
-    p.drawText(textobject_addr)
-    # Tambahkan sedikit jarak setelah alamat
-    current_y_col1 -= 0.1 * cm 
-    
-    # --- Kolom PENGIRIM ---
-    current_y_col2 = current_y
-    p.setFont('Helvetica', 9)
-    
-    # Nama Pengirim
-    p.drawString(col2_x, current_y_col2, f"Nama: BringCo")
-    current_y_col2 -= LINE_HEIGHT
-    
-    # Telp Pengirim
-    p.drawString(col2_x, current_y_col2, f"Telp: +62-812-1414-4787")
-    current_y_col2 -= 0.5 * cm
-    
-    # Alamat Pengirim (Wrapping)
-    p.setFont('Helvetica-Bold', 9)
-    p.drawString(col2_x, current_y_col2, "Alamat:")
-    current_y_col2 -= ADDR_LINE_SPACING
-    
-    p.setFont('Helvetica', 9)
-    sender_address_text = "Jl. Tebet Timur Dalam II No.7 Kec. Tebet, Jakarta Selatan 12820"
-    
-    textobject_addr_sender = p.beginText(col2_x, current_y_col2)
-    textobject_addr_sender.setFont('Helvetica', 9)
-    
-    wrapped_sender_address = textwrap.wrap(sender_address_text, width=MAX_ADDR_CHARS) 
-    
-    for line in wrapped_sender_address:
-        textobject_addr_sender.textLine(line)
-        current_y_col2 -= ADDR_LINE_SPACING
-        
-    p.drawText(textobject_addr_sender)
-    current_y_col2 -= 0.1 * cm 
-
-    # Tentukan batas bawah area alamat (Ambil posisi Y terendah)
-    y_position = min(current_y_col1, current_y_col2) - 0.4 * cm
-    p.setLineWidth(2) # Garis lebih tebal untuk pemisah utama
-    p.line(x_margin, y_position, LABEL_WIDTH - x_margin, y_position)
-    p.setLineWidth(1) # Reset line width
-    y_position -= 0.5 * cm
-    
-    # --- Bagian 4: Detail Barang & Harga (Faktur Mini) 💵 ---
-    
-    # Kiri: SKU ID & Nama Barang (Jika ada)
-    p.setFont('Helvetica-Bold', 10)
-    p.drawString(x_margin, y_position, "SKU ID & Nama Barang:")
-    y_position -= 0.5 * cm
-    
-    p.setFont('Helvetica', 9)
-    
-    # SKU ID
-    p.drawString(x_margin, y_position, f"SKU ID:")
-    p.setFont('Helvetica-Bold', 10) # Lebih besar untuk SKU ID
-    p.drawString(x_margin + 2.0 * cm, y_position, f"{order.sku.sku_id if order.sku else 'N/A'}") 
-    p.setFont('Helvetica', 9) # Reset
-    y_position -= LINE_HEIGHT
-
-    # Nama Barang
-    p.drawString(x_margin, y_position, f"Barang:")
-    p.drawString(x_margin + 2.0 * cm, y_position, f"{order.sku.name if order.sku and order.sku.name else 'Detail Barang'}") 
-    
-    # Kanan: Harga (Stacked & Menarik)
-    harga_formatted = intcomma(order.price)
-    temp_y = y_position + LINE_HEIGHT # Sejajar dengan SKU ID
-    
-    # Baris 1: Label "TOTAL HARGA JUAL" (Right Aligned, Highlighted)
-    p.setFont('Helvetica-Bold', 9)
-    p.setFillColorRGB(0.5, 0.0, 0.5) # Warna ungu/magenta
-    p.drawRightString(LABEL_WIDTH - x_margin, temp_y, f"TOTAL HARGA JUAL:")
-    
-    temp_y -= LINE_HEIGHT
-    
-    # Baris 2: Nilai Harga (Bold, Lebih Besar, Right Aligned)
-    p.setFont('Helvetica-Bold', 12)
-    p.setFillColorRGB(0.0, 0.5, 0.0) # Warna hijau
-    p.drawRightString(LABEL_WIDTH - x_margin, temp_y, f"Rp {harga_formatted}")
-    
-    p.setFont('Helvetica', 9) # Reset
-    p.setFillColorRGB(0, 0, 0) # Reset warna ke hitam
-    
-    # Tentukan posisi Y terendah
-    y_position = min(y_position, temp_y) - 0.5 * cm
-    
-    p.line(x_margin, y_position, LABEL_WIDTH - x_margin, y_position)
-    y_position -= 0.3 * cm
-    
-    # --- Bagian 5: Footer 📝 ---
-    p.setFont('Helvetica-Oblique', 7)
-    
-    # Kiri: Pesan Terima Kasih
-    p.drawString(x_margin, y_position, "Terima kasih telah berbelanja.")
-    
-    # Kanan: Info Cetak
-    p.drawRightString(LABEL_WIDTH - x_margin, y_position, 
-                      f"Dicetak oleh Sales: {request.user.username} | {timezone.now().strftime('%d/%m/%Y %H:%M')}")
-    
-    p.showPage()
-    p.save()
-    return response
+# Batas label per batch (satu PDF)
+MAX_BATCH_LABELS = 500
 
-# --- VIEW: PRINT INVOICE A4 ---
-
-def draw_header(p, width, margin_x, header_start_y, company_info_x, order):
-    """Menggambar logo, info perusahaan, dan judul invoice."""
-    
-    # 1. Logo (Kiri)
-    logo_x = margin_x
-    logo_y = header_start_y - 1.5 * cm
-    
-    logo_path = get_logo_path()
-    if logo_path:
+@login_required(login_url='login')
+@user_passes_test(is_sales)
+def print_order_labels(request):
+    """
+    Banyak label pengiriman dalam satu PDF multi-halaman (10x15 cm per halaman).
+    ?ids=1,2,3 (atau ids berulang) untuk order tertentu, atau ?filter=unshipped
+    untuk semua order 'Sold' yang belum dikirim.
+    """
+    orders = SalesOrder.objects.filter(sales_person=request.user).select_related('sku', 'sales_person').order_by('id')
+    raw_ids = [value for item in request.GET.getlist('ids') for value in item.split(',') if value.strip()]
+    if raw_ids:
         try:
-            logo = ImageReader(logo_path)
-            p.drawImage(logo, logo_x, logo_y, width=3.5*cm, height=3.5*cm, mask='auto')
-        except Exception:
-            p.setFont('Helvetica-Bold', 12)
-            p.drawString(logo_x, logo_y + 0.5*cm, "BringCO (Logo Error)")
+            orders = orders.filter(id__in=[int(value) for value in raw_ids])
+        except ValueError:
+            return HttpResponseBadRequest("Parameter ids harus berupa daftar angka.")
+    elif request.GET.get('filter') == 'unshipped':
+        orders = orders.filter(status='Sold')
     else:
-        p.setFont('Helvetica-Bold', 14)
-        p.drawString(logo_x, logo_y + 0.5*cm, "BRINGCO")
-
-    # 2. Info Perusahaan (Detail)
-    company_y = logo_y + 1.5 * cm
-    p.setFont('Helvetica-Bold', 10)
-    p.drawString(company_info_x, company_y, "BRINGCO HEADQUARTERS")
-    company_y -= 0.4 * cm
-    p.setFont('Helvetica', 8)
-    p.drawString(company_info_x, company_y, "Jl. Tebet Timur Dalam II No.7 Kec. Tebet, Jakarta Selatan 12820")
-    company_y -= 0.4 * cm
-    p.drawString(company_info_x, company_y, "Telp: +62-812-1414-4787 | Email: bringco.hq@gmail.com")
-
-    # 3. Judul Invoice & Nomor (Kanan)
-    p.setFont('Helvetica-Bold', 24)
-    p.setFillColor(colors.HexColor('#004d99')) # Darker Corporate Blue
-    p.drawRightString(width - margin_x, header_start_y, "INVOICE")
-    p.setFillColor(colors.black)
-    
-    p.setFont('Helvetica-Bold', 10)
-    p.drawRightString(width - margin_x, header_start_y - 1.0 * cm, "INVOICE NO:")
-    p.setFont('Helvetica', 10)
-    p.drawRightString(width - margin_x, header_start_y - 1.4 * cm, f"INV/{order.created_at.strftime('%Y%m')}/{order.id}")
-    
-    return header_start_y - 3.5 * cm # Posisi Y setelah header
-
-def draw_transaction_info(p, order, request_user, width, margin_x, current_y):
-    """Menggambar detail pelanggan dan info transaksi."""
-    
-    LINE_HEIGHT = 0.45 * cm
-    
-    # --- POSISI X UNTUK PELURUSAN TITIK DUA ---
-    COLON_X_BILL_TO = margin_x + 2.5 * cm # Cukup ruang untuk "Telepon"
-    RIGHT_COL_X = width / 2 + 1 * cm
-    COLON_X_RIGHT = RIGHT_COL_X + 3.0 * cm # Cukup ruang untuk "Sales Person" (3.0 cm)
-
-    # Kolom Kiri (Bill To)
-    current_y_temp = current_y
-    p.setFont('Helvetica-Bold', 11)
-    p.drawString(margin_x, current_y_temp, "BILL TO:")
-    current_y_temp -= 0.6 * cm
-    
-    p.setFont('Helvetica', 10)
-    
-    # Nama
-    p.drawString(margin_x, current_y_temp, "Nama")
-    p.drawString(COLON_X_BILL_TO, current_y_temp, ":")
-    p.drawString(COLON_X_BILL_TO + 0.2 * cm, current_y_temp, f"{order.customer_name}")
-    current_y_temp -= LINE_HEIGHT
-    
-    # Telepon
-    p.drawString(margin_x, current_y_temp, "Telepon")
-    p.drawString(COLON_X_BILL_TO, current_y_temp, ":")
-    p.drawString(COLON_X_BILL_TO + 0.2 * cm, current_y_temp, f"{order.customer_phone}")
-    current_y_temp -= LINE_HEIGHT
-    
-    # Alamat
-    p.drawString(margin_x, current_y_temp, "Alamat")
-    p.drawString(COLON_X_BILL_TO, current_y_temp, ":")
-    
-    # Alamat (wrapping) - Lebar efektif kolom kiri sekitar 7 cm.
-    ADDRESS_WRAP_WIDTH = 40 # Estimasi 40 karakter agar tidak bertabrakan dengan kolom kanan
-    address_x = COLON_X_BILL_TO + 0.2 * cm
-    textobject_addr = p.beginText(address_x, current_y_temp)
-    textobject_addr.setFont('Helvetica', 10)
-    
-    wrapped_addr = textwrap.wrap(order.customer_address, width=ADDRESS_WRAP_WIDTH) 
-    
-    temp_y_addr = current_y_temp
-    addr_line_spacing = 0.4 * cm 
-    for line in wrapped_addr:
-        textobject_addr.textLine(line)
-        temp_y_addr -= addr_line_spacing
-        
-    p.drawText(textobject_addr)
-    current_y_temp = temp_y_addr # Update posisi Y kolom kiri
-
-    # Kolom Kanan (Transaction Info)
-    current_y_right = current_y
-    
-    p.setFont('Helvetica-Bold', 11)
-    p.drawString(RIGHT_COL_X, current_y_right, "TRANSACTION INFO:")
-    current_y_right -= 0.6 * cm
-
-    p.setFont('Helvetica', 10)
-    
-    # Tanggal Invoice
-    p.drawString(RIGHT_COL_X, current_y_right, "Tanggal Invoice")
-    p.drawString(COLON_X_RIGHT, current_y_right, ":")
-    p.drawRightString(width - margin_x, current_y_right, f"{order.created_at.strftime('%d %B %Y')}")
-    current_y_right -= LINE_HEIGHT
-    
-    # Sales Person
-    p.drawString(RIGHT_COL_X, current_y_right, "Sales Person")
-    p.drawString(COLON_X_RIGHT, current_y_right, ":")
-    p.drawRightString(width - margin_x, current_y_right, f"{request_user.username}")
-    current_y_right -= LINE_HEIGHT
-
-    # Pengiriman
-    p.drawString(RIGHT_COL_X, current_y_right, "Pengiriman")
-    p.drawString(COLON_X_RIGHT, current_y_right, ":")
-    p.drawRightString(width - margin_x, current_y_right, f"{order.shipping_type or 'N/A'}")
-    
-    # Kembalikan posisi Y terendah untuk memulai tabel
-    return min(current_y_temp, current_y_right)
+        return HttpResponseBadRequest("Gunakan parameter ids atau filter=unshipped.")
 
-def create_item_table(order, width, margin_x, quantity, total_price_int):
-    """Membuat objek tabel detail item."""
-    content_width = width - 2 * margin_x
-    
-    table_data = [
-        ["NO.", "DESCRIPTION (SKU ID)", "QTY", "UNIT PRICE (RP)", "LINE TOTAL (RP)"],
-        [
-            "1.",
-            f"{order.sku.name}\n(ID: {order.sku.sku_id})",
-            f"{quantity}",
-            f"{intcomma(order.price)}",
-            f"{intcomma(total_price_int)}"
-        ]
-    ]
-    
-    # Penyesuaian lebar kolom agar lebih proporsional
-    col_widths = [
-        0.8 * cm,                   # NO.
-        content_width * 0.48,       # DESCRIPTION (Lebar diperbesar)
-        1.5 * cm,                   # QTY
-        content_width * 0.20,       # UNIT PRICE
-        content_width * 0.20,       # LINE TOTAL
-    ]
-    
-    item_table = Table(table_data, colWidths=col_widths)
-    table_style = TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#004d99')), # Darker Blue
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('ALIGN', (2, 1), (2, -1), 'CENTER'),
-        ('ALIGN', (3, 1), (4, -1), 'RIGHT'),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#999999')),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-    ])
-    item_table.setStyle(table_style)
-    return item_table
-
-# --- FUNGSI UTAMA YANG DIREVISI ---
+    orders = list(orders[:MAX_BATCH_LABELS + 1])
+    if not orders:
+        return HttpResponse("Tidak ada order untuk dicetak.", status=404)
+    if len(orders) > MAX_BATCH_LABELS:
+        return HttpResponseBadRequest(f"Maksimal {MAX_BATCH_LABELS} label per cetak.")
+    # Folder cache per user: batch baru menggantikan batch lama user tersebut
+    return document_response(request, 'order_labels', orders, object_id=f"user-{request.user.pk}")
 
 @login_required(login_url='login')
 @user_passes_test(is_sales)
 def print_invoice_a4(request, order_id):
-    """
-    Menghasilkan Invoice penjualan dalam format PDF A4 yang profesional.
-    Struktur kode diperbaiki dan posisi X diperhitungkan secara akurat.
-    """
+    """Invoice penjualan PDF A4 (documents.render_invoice_a4)."""
     try:
-        order = get_object_or_404(SalesOrder, id=order_id, sales_person=request.user)
-    except Exception:
+        order = SalesOrder.objects.select_related('sku', 'sales_person').get(id=order_id, sales_person=request.user)
+    except SalesOrder.DoesNotExist:
         return HttpResponse("Order not found or access denied.", status=404)
-
-    # --- Setup Canvas ---
-    response = HttpResponse(content_type='application/pdf')
-    filename = f"INVOICE_ORDER_{order.id}.pdf"
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'    
-
-    p = canvas.Canvas(response, pagesize=A4)
-    width, height = A4
-    margin_x = 2 * cm
-    current_y = height - 2 * cm
-    
-    # --- ZONA 1: HEADER PERUSAHAAN & JUDUL INVOICE ---
-    header_start_y = current_y
-    company_info_x = margin_x + 5 * cm
-    
-    current_y = draw_header(p, width, margin_x, header_start_y, company_info_x, order)
-    
-    p.line(margin_x, current_y, width - margin_x, current_y) # Garis Penuh
-    
-    # --- ZONA 2: DETAIL PELANGGAN & TANGGAL ---
-    current_y -= 0.8 * cm
-    
-    current_y = draw_transaction_info(p, order, request.user, width, margin_x, current_y)
-    
-    p.line(margin_x, current_y - 0.5 * cm, width - margin_x, current_y - 0.5 * cm) # Garis Penuh
-    current_y -= 1.0 * cm
-    
-    # --- ZONA 3: DETAIL ITEM TRANSAKSI ---
-    
-    quantity = 1
-    total_price_int = order.price * quantity
-    shipping_cost = 0 
-    
-    item_table = create_item_table(order, width, margin_x, quantity, total_price_int)
-    
-    # Hitung tinggi tabel
-    table_height = item_table.wrapOn(p, width, height)[1] 
-    current_y -= table_height 
-
-    # Gambar Tabel
-    item_table.drawOn(p, margin_x, current_y)
-    
-    current_y -= 0.5 * cm
-    
-    # --- ZONA 4: RINGKASAN KEUANGAN ---
-    SUMMARY_TABLE_WIDTH = (width - 2 * margin_x) * 0.45 # Diperbesar sedikit
-    SUMMARY_COL_WIDTHS = [SUMMARY_TABLE_WIDTH * 0.60, SUMMARY_TABLE_WIDTH * 0.40] 
-    summary_x = width - margin_x - SUMMARY_TABLE_WIDTH
-    
-    total_tagihan = total_price_int + shipping_cost
-    sisa_tagihan = order.get_remaining_balance() # Asumsi fungsi ini mengembalikan int/float
-    
-    summary_data = [
-        ["SUBTOTAL", f"Rp {intcomma(total_price_int)}"],
-        ["Biaya Pengiriman", f"Rp {intcomma(shipping_cost)}"],
-        ["TOTAL TAGIHAN", f"Rp {intcomma(total_tagihan)}"],
-        ["SUDAH TERBAYAR", f"Rp {intcomma(order.get_total_paid())}"],
-        ["SISA TAGIHAN", f"Rp {intcomma(sisa_tagihan)}"],
-    ]
-    
-    summary_table = Table(summary_data, colWidths=SUMMARY_COL_WIDTHS)
-    summary_style = TableStyle([
-        ('ALIGN', (0, 0), (0, -1), 'RIGHT'), 
-        ('ALIGN', (1, 0), (1, -1), 'RIGHT'), 
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-        ('FONTNAME', (0, 2), (-1, 2), 'Helvetica-Bold'), # Total Tagihan Bold
-        ('FONTNAME', (0, 4), (-1, 4), 'Helvetica-Bold'), # Sisa Tagihan Bold
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('TEXTCOLOR', (1, 2), (1, 2), colors.darkgreen),
-        ('TEXTCOLOR', (1, 4), (1, 4), colors.red),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#CCCCCC')),
-        ('BACKGROUND', (0, 2), (-1, 2), colors.HexColor('#E6FFE6')), # Total Tagihan Highlight
-        ('BACKGROUND', (0, 4), (-1, 4), colors.HexColor('#FFF2F2')), # Sisa Tagihan Highlight
-        ('RIGHTPADDING', (0, 0), (0, -1), 5), 
-    ])
-    summary_table.setStyle(summary_style)
-    summary_height = summary_table.wrapOn(p, width, height)[1]
-    
-    # Gambar Tabel Summary (Posisikan di pojok kanan bawah dari ZONA 3)
-    summary_table.drawOn(p, summary_x, current_y - summary_height)
-    
-    # Tentukan posisi Y final (karena catatan mungkin lebih rendah)
-    final_y_notes = current_y - summary_height - 0.5 * cm
-    
-    # --- ZONA 5: TERMS AND SIGNATURE ---
-    
-    # Catatan Tambahan (Kiri)
-    current_y_notes = current_y 
-    p.setFont('Helvetica-Bold', 10)
-    p.drawString(margin_x, current_y_notes, "CATATAN:")
-    current_y_notes -= 0.4 * cm
-    p.setFont('Helvetica', 9)
-    p.drawString(margin_x, current_y_notes, f"Sisa tagihan **Rp {intcomma(sisa_tagihan)}** jatuh tempo dalam 7 hari.")
-    current_y_notes -= 0.4 * cm
-    p.drawString(margin_x, current_y_notes, "Pembayaran dapat ditransfer ke Bank XYZ, A/N BRINGCO.")
-    
-    # Ambil posisi Y terendah dari notes
-    current_y_notes = min(current_y_notes, final_y_notes)
-    
-    # Tanda Tangan (Kanan Bawah)
-    ttd_x = width - margin_x - 5 * cm
-    
-    # Y position untuk tanda tangan (misal 3.5 cm dari bawah)
-    final_y_pos = 4 * cm 
-    
-    # Header Tanda Tangan
-    p.setFont('Helvetica-Bold', 10)
-    p.drawCentredString(ttd_x + 2.5 * cm, final_y_pos, "Hormat Kami,")
-    
-    # Garis Tanda Tangan
-    p.line(ttd_x, final_y_pos - 1 * cm, ttd_x + 5 * cm, final_y_pos - 1 * cm)
-    
-    # Nama dan Jabatan
-    p.setFont('Helvetica-Bold', 10)
-    # Gunakan nama lengkap jika ada, fallback ke username
-    signer_name = request.user.get_full_name() or request.user.username
-    p.drawCentredString(ttd_x + 2.5 * cm, final_y_pos - 1.5 * cm, f"{signer_name}")
-    p.setFont('Helvetica', 9)
-    p.drawCentredString(ttd_x + 2.5 * cm, final_y_pos - 1.9 * cm, "Sales Representative")
-    
-    # --- Footer ---
-    p.setFont('Helvetica-Oblique', 8)
-    p.drawCentredString(width / 2, 1.5 * cm, "Terima kasih atas kepercayaan Anda.")
-    
-    p.showPage()
-    p.save()
-    return response
+    return document_response(request, 'invoice', order)
 
 @login_required(login_url='login')
 @user_passes_test(is_sales)
 def print_quotation_a4(request, quotation_id):
-    # 1. Fetch Data
+    """Sales quotation PDF A4 (documents.render_quotation_a4)."""
     try:
-        quotation = get_object_or_404(Quotation, id=quotation_id, sales_person=request.user)
-    except Exception:
+        quotation = Quotation.objects.select_related('sku').get(id=quotation_id, sales_person=request.user)
+    except Quotation.DoesNotExist:
         return HttpResponse("Quotation not found or access denied.", status=404)
+    return document_response(request, 'quotation', quotation)
 
-    # 2. Setup Canvas
-    response = HttpResponse(content_type='application/pdf')
-    filename = f"QUOTATION_{quotation.quotation_number or quotation.id}.pdf"
-    response['Content-Disposition'] = f'inline; filename="{filename}"'
-
-    p = canvas.Canvas(response, pagesize=A4)
-    width, height = A4
-    margin_x = 2 * cm
-    
-    # --- ZONA 1: HEADER (LOGO & JUDUL) 🏷️ ---
-    
-    # Ukuran Logo dan Posisi
-    LOGO_WIDTH = 5.0 * cm
-    LOGO_HEIGHT = 3.8 * cm  
-    # Posisi Y untuk bagian bawah logo
-    LOGO_Y_BOTTOM = height - margin_x - LOGO_HEIGHT
-    
-    logo_path = get_logo_path()
-    
-    # 1. Gambar Logo (Pojok Kiri Atas)
-    if logo_path:
-        try:
-            p.drawImage(logo_path, margin_x, LOGO_Y_BOTTOM, 
-                        width=LOGO_WIDTH, height=LOGO_HEIGHT, 
-                        preserveAspectRatio=True)
-        except Exception:
-            p.setFont('Helvetica-Bold', 8)
-            p.setFillColor(colors.red)
-            p.drawString(margin_x, height - margin_x - 0.5 * cm, "LOGO ERROR!")
-    
-    # 2. Judul Utama (Sales Quotation) - Tengah Atas
-    p.setFont('Helvetica-Bold', 22)
-    p.setFillColor(colors.HexColor('#004d99')) # Darker Blue
-    
-    # REVISI BARIS RUSAK (Line 2081)
-    # Pusatkan Judul secara vertikal di tengah area Logo (0.4 cm adalah offset visual/perkiraan)
-    TITLE_Y = LOGO_Y_BOTTOM + (LOGO_HEIGHT / 2) - (0.4 * cm) 
-
-    p.drawCentredString(width / 2, TITLE_Y, "SALES QUOTATION")
-    
-    # 3. Garis Pemisah (di bawah logo dan judul)
-    LINE_SEPARATOR_Y = LOGO_Y_BOTTOM - 0.7 * cm
-    p.setLineWidth(1)
-    p.line(margin_x, LINE_SEPARATOR_Y, width - margin_x, LINE_SEPARATOR_Y)
-    
-    # Posisi Y Awal untuk Info Transaksi (di bawah Garis Pemisah)
-    current_y = LINE_SEPARATOR_Y - 0.5 * cm
-    
-    # --- ZONA INFO: QUOTATION NO, DATE, VALID UNTIL ---
-    
-    p.setFillColor(colors.black)
-    
-    # Konstanta Posisi Info
-    LINE_HEIGHT_INFO = 0.5 * cm
-    COL_LABEL_X = margin_x
-    COL_VALUE_X = margin_x + 3.8 * cm
-    RIGHT_LABEL_X = width - margin_x - 3.8 * cm
-    RIGHT_VALUE_X = width - margin_x
-
-    # Baris 1: QUOTATION NO (Kiri) & DATE (Kanan)
-    p.setFont('Helvetica-Bold', 10)
-    p.drawString(COL_LABEL_X, current_y, "QUOTATION NO:")
-    p.setFont('Helvetica', 10)
-    p.drawString(COL_VALUE_X, current_y, f"{quotation.quotation_number or 'DRAFT'}")
-    
-    p.setFont('Helvetica-Bold', 10)
-    p.drawString(RIGHT_LABEL_X, current_y, "DATE:")
-    p.setFont('Helvetica', 10)
-    p.drawRightString(RIGHT_VALUE_X, current_y, f"{quotation.date.strftime('%d %b %Y')}")
-    current_y -= LINE_HEIGHT_INFO
-
-    # Baris 2: VALID UNTIL (Kanan)
-    p.setFont('Helvetica-Bold', 10)
-    p.drawString(RIGHT_LABEL_X, current_y, "VALID UNTIL:")
-    p.setFont('Helvetica', 10)
-    valid_until_str = quotation.valid_until.strftime('%d %b %Y') if quotation.valid_until else 'N/A'
-    p.drawRightString(RIGHT_VALUE_X, current_y, valid_until_str)
-    current_y -= 1.0 * cm # Jarak sebelum ZONA 2
-    
-    # Garis pemisah sebelum ZONA 2
-    p.line(margin_x, current_y, width - margin_x, current_y)
-    current_y -= 0.8 * cm
-
-    # --- ZONA 2: BILL TO (Kiri) & FROM (Kanan) ---
-    
-    current_y_col1 = current_y
-    LEFT_COL_START = margin_x
-    LEFT_COL_WIDTH = width / 2 - 1.0 * cm 
-    
-    # Judul Bill To / From
-    p.setFont('Helvetica-Bold', 11)
-    p.setFillColor(colors.HexColor('#333333'))
-    p.drawString(LEFT_COL_START, current_y_col1, "BILL TO:")
-    p.drawString(width / 2 + 0.5 * cm, current_y_col1, "FROM: (BRING.CO)")
-    current_y_col1 -= 0.5 * cm
-
-    # ... (lanjutan ZONA 2, 3, 4, 5)
-    
-    # --- KOLOM KIRI (BILL TO) ---
-    p.setFont('Helvetica', 10)
-    p.drawString(LEFT_COL_START, current_y_col1, f"Contact Person: {quotation.customer_name}")
-    current_y_col1 -= 0.4 * cm
-    p.drawString(LEFT_COL_START, current_y_col1, f"Phone: {quotation.customer_phone}")
-    current_y_col1 -= 0.6 * cm 
-    
-    p.setFont('Helvetica-Bold', 10)
-    p.drawString(LEFT_COL_START, current_y_col1, "Address:")
-    current_y_col1 -= 0.4 * cm
-
-    addr_text = quotation.customer_address
-    addr_paragraph = Paragraph(addr_text, styleN) 
-    
-    addr_width = LEFT_COL_WIDTH
-    addr_height = addr_paragraph.wrapOn(p, addr_width, height)[1]
-    
-    addr_paragraph.drawOn(p, LEFT_COL_START, current_y_col1 - addr_height)
-    
-    current_y_col1 -= addr_height + 0.1 * cm 
-    
-    
-    # --- KOLOM KANAN (FROM) ---
-    current_y_col2 = current_y # Gunakan current_y yang asli sebelum di-deduct oleh Bill To Judul
-    right_x = width / 2 + 0.5 * cm
-    RIGHT_COL_WIDTH = width / 2 - margin_x - 0.5 * cm
-    
-    # Adjust y_col2 start position to align with Bill To details
-    current_y_col2 -= 0.5 * cm # Move down past 'FROM: (BRING.CO)' title
-    
-    p.setFont('Helvetica', 10)
-    
-    sender_text = (
-        "Jl. Tebet Timur Dalam II No.7 Kec. Tebet, Jakarta Selatan 12820<br/>"
-        "Email: bringco.hq@gmail.com<br/>"
-        "Phone: +62-812-1414-4787"
-    )
-    sender_paragraph = Paragraph(sender_text, styleN)
-    
-    sender_height = sender_paragraph.wrapOn(p, RIGHT_COL_WIDTH, height)[1]
-
-    sender_paragraph.drawOn(p, right_x, current_y_col2 - sender_height)
-    
-    current_y_col2 -= sender_height + 0.1 * cm
-
-    current_y = min(current_y_col1, current_y_col2) - 0.5 * cm
-
-    # --- ZONA 3: TABEL DETAIL ITEM ---
-    
-    p.setFont('Helvetica-Bold', 12)
-    p.setFillColor(colors.HexColor('#004d99'))
-    p.drawString(margin_x, current_y, "ITEMIZED QUOTATION DETAILS")
-    current_y -= 0.5 * cm
-    
-    p.setLineWidth(0.5)
-    p.line(margin_x, current_y, width - margin_x, current_y)
-    current_y -= 0.1 * cm
-
-    item_description_text = (
-        f"<b>{quotation.sku.name}</b><br/>" 
-        f"SKU ID: {quotation.sku.sku_id}<br/>"
-        f"Kondisi/Status: {quotation.sku.get_status_display() or 'Ready Stock'}."
-    )
-    
-    table_data = [
-        ["No.", "Item Description (SKU ID)", "Quantity", "Unit Price (Rp)", "Line Total (Rp)"],
-        [
-            "1.",
-            Paragraph(item_description_text, styleN), 
-            f"{quotation.quantity}",
-            f"{intcomma(quotation.price)}",
-            f"{intcomma(quotation.get_subtotal)}"
-        ]
-    ]
-
-    content_width = width - 2 * margin_x
-    col_widths = [1 * cm, content_width * 0.48, 1.5 * cm, content_width * 0.20, content_width * 0.19,]
-    
-    item_table = Table(table_data, colWidths=col_widths)
-
-    table_style = TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#004d99')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('ALIGN', (2, 1), (2, -1), 'CENTER'),
-        ('ALIGN', (3, 1), (4, -1), 'RIGHT'),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'), 
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
-        ('TOPPADDING', (0, 1), (-1, -1), 6),
-        ('BOTTOMPADDING', (0, 1), (-1, -1), 6),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#CCCCCC')),
-        ('FONTSIZE', (0, 0), (-1, -1), 9),
-    ])
-    item_table.setStyle(table_style)
-
-    table_height = item_table.wrapOn(p, width, height)[1]
-    current_y -= table_height
-
-    item_table.drawOn(p, margin_x, current_y)
-    
-    # --- ZONA 4: RINGKASAN TOTALS (Kanan Bawah) & TERMS (Kiri Bawah) ---
-    
-    total_width = (width - 2 * margin_x) * 0.45 
-    summary_x = width - margin_x - total_width
-    SUMMARY_COL_WIDTHS_QUOTE = [total_width * 0.6, total_width * 0.4]
-    
-    current_y -= 0.5 * cm
-    
-    summary_data = [
-        ["Subtotal:", f"Rp {intcomma(quotation.get_subtotal)}"],  
-        ["Extra Discount:", f"Rp {intcomma(quotation.extra_discount)}"],
-        ["TOTAL AMOUNT:", f"Rp {intcomma(quotation.get_total_quote)}"], 
-    ]
+# --- Upload bertahap (chunked/resumable) untuk file bukti, lihat uploads.py ---
+@login_required(login_url='login')
+def upload_start(request):
+    """Mulai upload bertahap (lihat uploads.py): POST filename, size, field."""
+    if request.method != 'POST':
+        return JsonResponse({'error': "Metode tidak didukung."}, status=405)
+    try:
+        state = uploads.start(
+            request.user.pk, request.POST.get('filename'), request.POST.get('size'), request.POST.get('field'),
+        )
+    except uploads.UploadError as e:
+        return JsonResponse({'error': str(e)}, status=e.status)
+    state['url'] = reverse('upload_chunk', args=[state['upload_id']])
+    return JsonResponse(state, status=201)
 
-    summary_table = Table(summary_data, colWidths=SUMMARY_COL_WIDTHS_QUOTE)
-
-    summary_style = TableStyle([
-        ('ALIGN', (0, 0), (-1, -1), 'RIGHT'),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('FONTNAME', (0, 0), (-1, -2), 'Helvetica'),
-        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -2), 10),
-        ('FONTSIZE', (0, -1), (-1, -1), 11),
-        ('TEXTCOLOR', (1, -1), (1, -1), colors.HexColor('#B8860B')), 
-        ('TOPPADDING', (0, -1), (-1, -1), 8),
-        ('BOTTOMPADDING', (0, -1), (-1, -1), 8),
-        ('LINEABOVE', (0, -1), (-1, -1), 1.5, colors.HexColor('#004d99')),
-        ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#F0F8FF')),
-    ])
-    summary_table.setStyle(summary_style)
-
-    summary_height = summary_table.wrapOn(p, width, height)[1]
-    
-    summary_table.drawOn(p, summary_x, current_y - summary_height)
-    
-    summary_bottom_y = current_y - summary_height
-    
-    # Terms and Conditions
-    terms_x = margin_x
-    TTD_RESERVED_Y = 5 * cm
-    terms_y_start = min(current_y - 0.5 * cm, summary_bottom_y - 0.5 * cm) 
-    
-    if terms_y_start < TTD_RESERVED_Y:
-        terms_y_start = TTD_RESERVED_Y
-        
-    p.setFont('Helvetica-Bold', 10)
-    p.drawString(terms_x, terms_y_start, "TERMS AND CONDITIONS:")
-    terms_y_start -= 0.5 * cm
-    
-    terms_list = [
-        "- Payment Terms: Down Payment is due within 7 days of the invoice date.",
-        "- Delivery Time: Estimated delivery time is 2-7 business days after order confirmation.",
-        f"- Validity: This quotation is valid until {quotation.valid_until.strftime('%d %B %Y') if quotation.valid_until else 'N/A'}.",
-        "- Warranty: All products come with a warranty. Details are available on request.",
-        "- Shipping: Shipping cost is calculated based on the delivery location."
-    ]
-    
-    p.setFont('Helvetica', 9)
-    current_y_terms = terms_y_start
-    line_spacing = 0.4 * cm
-    for line in terms_list:
-        p.drawString(terms_x, current_y_terms, line)
-        current_y_terms -= line_spacing
-        if current_y_terms < TTD_RESERVED_Y:
-            break
-            
-    # --- ZONA 5: Approval (Pojok Kanan Bawah) ---
-    
-    ttd_x = width - margin_x - 5 * cm
-    final_y_pos = 4 * cm 
-    
-    p.setFont('Helvetica-Bold', 10)
-    p.drawCentredString(ttd_x + 2.5 * cm, final_y_pos, "Authorized Signature")
-    
-    p.line(ttd_x, final_y_pos - 1.0 * cm, ttd_x + 5 * cm, final_y_pos - 1.0 * cm)
-    
-    p.setFont('Helvetica-Bold', 10)
-    p.drawCentredString(ttd_x + 2.5 * cm, final_y_pos - 1.5 * cm, "Approved by CEO") 
-    p.setFont('Helvetica', 9)
-    p.drawCentredString(ttd_x + 2.5 * cm, final_y_pos - 1.9 * cm, "CEO/Authorized Management")
-    
-    p.showPage()
-    p.save()
-    return response
\ No newline at end of file
+@login_required(login_url='login')
+def upload_chunk(request, upload_id):
+    """
+    GET: offset upload saat ini. PATCH (header Upload-Offset): tambahkan potongan;
+    body dibaca langsung dari stream request ke disk.
+    """
+    try:
+        if request.method == 'PATCH':
+            state = uploads.append(
+                request.user.pk, upload_id, request.headers.get('Upload-Offset'),
+                request.META.get('CONTENT_LENGTH'), request,
+            )
+        elif request.method == 'GET':
+            state = uploads.status(request.user.pk, upload_id)
+        else:
+            return JsonResponse({'error': "Metode tidak didukung."}, status=405)
+    except uploads.UploadError as e:
+        return JsonResponse({'error': str(e), 'offset': e.offset}, status=e.status)
+    return JsonResponse(state)